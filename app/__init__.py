@@ -1,7 +1,6 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
-from flask_migrate import Migrate
 from datetime import datetime
 import os
 from dotenv import load_dotenv
@@ -17,36 +16,74 @@ def load_user(id):
     from app.models.user import User
     return User.query.get(int(id))
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
     
     # Configuration
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev')
     
-    # Set up the SQLite database path
+    # Use DATABASE_URL (e.g. PostgreSQL) when set, otherwise the local SQLite file
+    from app.utils.database import database_settings_from_env, database_uri
     basedir = os.path.abspath(os.path.dirname(__file__))
     db_path = os.path.join(os.path.dirname(basedir), 'instance', 'dental_clinic.db')
-    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_uri(os.environ.get('DATABASE_URL'), db_path)
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+    # Pool and timeout tuning (DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+    # DB_POOL_PRE_PING, DB_STATEMENT_TIMEOUT); unset values use per-database defaults
+    app.config.update(database_settings_from_env())
+    
+    # 'thread' sends queued email from each web process; 'off' leaves it to 'flask outbox worker'
+    app.config['EMAIL_OUTBOX_WORKER'] = os.environ.get('EMAIL_OUTBOX_WORKER', 'thread')
+
+    # Processes rendering PDF reports in the background; 0 renders inside the request
+    app.config['REPORT_WORKERS'] = int(os.environ.get('REPORT_WORKERS', 2))
+
+    # Per-request SQL timing: Server-Timing header, log line and /debug/perf
+    app.config['SQL_PROFILER'] = os.environ.get('SQL_PROFILER', '').lower() in ('1', 'true', 'on')
+
+    # Bearer token required to scrape /metrics; signed-in users only when unset
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+
+    # 'wal' runs SQLite in WAL mode with BEGIN IMMEDIATE writes and busy retries,
+    # for several gunicorn workers sharing the file; 'default' keeps SQLite's defaults
+    app.config['SQLITE_PROFILE'] = os.environ.get('SQLITE_PROFILE', 'wal')
+
+    # Create missing tables on startup; off by default, as 'flask db upgrade' owns the schema
+    app.config['AUTO_CREATE_TABLES'] = os.environ.get('AUTO_CREATE_TABLES', '').lower() in ('1', 'true', 'on')
+
+    # Allow scripts and benchmarks to point the app at another database
+    if config:
+        app.config.update(config)
+
     # Initialize extensions
+    from app.utils.database import configure_engine, migrate_cli
+    from app.utils.sqlite_profile import init_sqlite
+    configure_engine(app)
     db.init_app(app)
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
-    
-    migrate = Migrate(app, db)
+
+    # 'flask db' loads Flask-Migrate (and Alembic) only when it is run
+    app.cli.add_command(migrate_cli)
 
     with app.app_context():
+        init_sqlite(app)
+
         # Import models
         from app.models.user import User
         from app.models.patient import Patient
         from app.models.prescription import Prescription, Medication
         from app.models.invoice import Invoice
+        from app.models.invoice_item import InvoiceItem
+        from app.models.receivable import ReceivableDay, PatientBalance
         from app.models.settings import Settings
         from app.models.appointment import Appointment
+        from app.models.email_outbox import EmailOutbox
+        from app.models.report_job import ReportJob
         
         # Import routes
-        from app.routes import auth, patients, appointments, prescriptions, invoices, settings, main, reports
+        from app.routes import auth, patients, appointments, prescriptions, invoices, settings, main, reports, search
         
         # Register blueprints
         app.register_blueprint(auth.bp)
@@ -57,12 +94,39 @@ def create_app():
         app.register_blueprint(settings.settings)
         app.register_blueprint(main.bp)
         app.register_blueprint(reports.reports)
+        app.register_blueprint(search.bp)
+
+        # Register CLI commands
+        from app.utils.search_index import search_cli
+        app.cli.add_command(search_cli)
+        from app.utils.invoice_items import invoice_items_cli
+        app.cli.add_command(invoice_items_cli)
+        from app.utils.receivables import receivables_cli
+        app.cli.add_command(receivables_cli)
+
+        # Outgoing email queue
+        from app.utils.email_outbox import init_outbox
+        init_outbox(app)
+        from app.utils.reminders import reminders_cli
+        app.cli.add_command(reminders_cli)
+        from app.utils.report_jobs import reports_cli
+        app.cli.add_command(reports_cli)
+        from app.utils.seed_data import seed_cli
+        app.cli.add_command(seed_cli)
+        from app.utils.statements import statements_cli
+        app.cli.add_command(statements_cli)
+
+        # Prometheus metrics and opt-in request profiling
+        from app.utils.metrics import init_metrics
+        init_metrics(app)
+        from app.utils.profiler import init_profiler
+        init_profiler(app)
 
         # Register template helpers
         from app.utils.template_helpers import update_url_query
         app.jinja_env.globals.update(update_url_query=update_url_query)
 
-        # Create database tables
-        db.create_all()
+        if app.config['AUTO_CREATE_TABLES']:
+            db.create_all()
         
         return app
@@ -11,6 +11,17 @@ class Appointment(db.Model):
     treatment_type = db.Column(db.String(100))
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    reminder_sent_at = db.Column(db.DateTime)  # set once the next-day reminder is queued
+    
+    # Each index matches a query shape: day/status lookups (dashboard, reminders),
+    # the list's date DESC, time, id order with and without a status filter,
+    # and a patient's history newest first
+    __table_args__ = (
+        db.Index('ix_appointment_date_status', 'date', 'status'),
+        db.Index('ix_appointment_date_time_id', date.desc(), time, id),
+        db.Index('ix_appointment_status_date_time_id', status, date.desc(), time, id),
+        db.Index('ix_appointment_patient_id_date_time', 'patient_id', 'date', 'time', 'id'),
+    )
     
     def __repr__(self):
         return f'<Appointment {self.date} {self.time} - {self.patient.full_name}>'
@@ -17,7 +17,23 @@ class Invoice(db.Model):
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # date/total_amount covers report revenue aggregation without touching the
+    # table; the others follow the list order (date, id), its status filter,
+    # overdue lookups and the patient foreign key
+    __table_args__ = (
+        db.Index('ix_invoice_date_total_amount', 'date', 'total_amount'),
+        db.Index('ix_invoice_date_id', 'date', 'id'),
+        db.Index('ix_invoice_status_date_id', 'status', 'date', 'id'),
+        db.Index('ix_invoice_status_due_date', 'status', 'due_date'),
+        db.Index('ix_invoice_patient_id', 'patient_id'),
+    )
+    
     @property
     def invoice_number(self):
         """Generate invoice number in format INV-YYYY-XXXXX"""
-        return f"INV-{self.date.year}-{str(self.id).zfill(5)}"
+        return self.format_number(self.id, self.date)
+
+    @staticmethod
+    def format_number(invoice_id, invoice_date):
+        """The invoice number for plain column values (bulk queries, statements)."""
+        return f"INV-{invoice_date.year}-{str(invoice_id).zfill(5)}"
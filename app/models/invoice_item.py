@@ -0,0 +1,22 @@
+from app import db
+
+class InvoiceItem(db.Model):
+    """One line of an invoice, mirrored from Invoice.items for SQL reporting.
+
+    Invoice.items stays the source of truth; app.utils.invoice_items rewrites
+    an invoice's rows whenever its items change.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    invoice_id = db.Column(db.Integer, db.ForeignKey('invoice.id'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)  # index in Invoice.items
+    description = db.Column(db.String(200), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    unit_price = db.Column(db.Float, nullable=False, default=0.0)
+    total = db.Column(db.Float, nullable=False, default=0.0)
+    treatment_code = db.Column(db.String(20))
+    
+    # Covers the per-item report aggregates, which reach the rows through
+    # the invoices in a date range, so they never read the table itself
+    __table_args__ = (
+        db.Index('ix_invoice_item_invoice_id_description', 'invoice_id', 'description', 'quantity', 'total'),
+    )
@@ -1,5 +1,17 @@
 from app import db
 from datetime import datetime
+from sqlalchemy.orm import validates
+
+
+def name_key(name):
+    """Case-folded form of a name for lookups, so non-ASCII letters fold too."""
+    return (name or '').casefold()
+
+
+def _name_key_default(column):
+    # Covers Core inserts (seeding, benchmarks) that bypass the ORM validator
+    return lambda context: name_key(context.get_current_parameters().get(column))
+
 
 class Patient(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -23,12 +35,31 @@ class Patient(db.Model):
     # Timestamps and other fields
     medical_history = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # Names case-folded in Python for the typeahead. SQLite's lower() only
+    # folds ASCII, so lookups compare these instead of lower(first_name).
+    first_name_key = db.Column(db.String(100), default=_name_key_default('first_name'))
+    last_name_key = db.Column(db.String(100), default=_name_key_default('last_name'))
+    
+    # Case-insensitive name prefix lookups (patient typeahead), the list's
+    # last name, first name, id order and new-patient counts
+    __table_args__ = (
+        db.Index('ix_patient_last_name_key_first_name_key', 'last_name_key', 'first_name_key'),
+        db.Index('ix_patient_first_name_key', 'first_name_key'),
+        db.Index('ix_patient_last_name_first_name_id', 'last_name', 'first_name', 'id'),
+        db.Index('ix_patient_created_at', 'created_at'),
+    )
     
     # Relationships
     appointments = db.relationship('Appointment', backref='patient', lazy=True)
     prescriptions = db.relationship('Prescription', backref='patient', lazy=True)
     invoices = db.relationship('Invoice', backref='patient', lazy=True)
 
+    @validates('first_name', 'last_name')
+    def _set_name_key(self, key, value):
+        setattr(self, f'{key}_key', name_key(value))
+        return value
+
     @property
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
@@ -9,6 +9,12 @@ class Prescription(db.Model):
     notes = db.Column(db.Text)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # List order, and a patient's prescriptions newest first
+    __table_args__ = (
+        db.Index('ix_prescription_date_id', 'date', 'id'),
+        db.Index('ix_prescription_patient_id_date_id', 'patient_id', 'date', 'id'),
+    )
+    
     # Relationships with cascade delete
     medications = db.relationship('Medication', backref='prescription', lazy=True, cascade='all, delete-orphan')
 
@@ -20,3 +26,7 @@ class Medication(db.Model):
     frequency = db.Column(db.String(50))
     duration = db.Column(db.String(50))
     instructions = db.Column(db.Text)
+
+    __table_args__ = (
+        db.Index('ix_medication_prescription_id', 'prescription_id'),
+    )
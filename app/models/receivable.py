@@ -0,0 +1,30 @@
+from app import db
+
+class ReceivableDay(db.Model):
+    """Invoice totals for one due date, kept current by app.utils.receivables.
+
+    A handful of rows per day of billing history, so the dashboard's invoice
+    figures and the aging buckets are sums over these instead of over every
+    invoice.
+    """
+    __tablename__ = 'receivable_day'
+
+    due_date = db.Column(db.Date, primary_key=True)
+    invoice_count = db.Column(db.Integer, nullable=False, default=0)
+    billed = db.Column(db.Float, nullable=False, default=0.0)       # sum of total_amount
+    paid = db.Column(db.Float, nullable=False, default=0.0)         # sum of paid_amount
+    open_count = db.Column(db.Integer, nullable=False, default=0)   # invoices still awaiting payment
+    outstanding = db.Column(db.Float, nullable=False, default=0.0)  # total_amount - paid_amount of those
+
+class PatientBalance(db.Model):
+    """Outstanding amount across one patient's open invoices."""
+    __tablename__ = 'patient_balance'
+
+    patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), primary_key=True)
+    open_count = db.Column(db.Integer, nullable=False, default=0)
+    outstanding = db.Column(db.Float, nullable=False, default=0.0)
+
+    # Largest balances first, for the report's list of patients who owe the most
+    __table_args__ = (
+        db.Index('ix_patient_balance_outstanding', 'outstanding'),
+    )
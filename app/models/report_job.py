@@ -0,0 +1,48 @@
+from app import db
+from datetime import datetime, timedelta
+
+class ReportJob(db.Model):
+    __tablename__ = 'report_job'
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex, also the spool file name
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'))
+    range_start = db.Column(db.Date, nullable=False)
+    range_end = db.Column(db.Date, nullable=False)  # exclusive
+
+    status = db.Column(db.String(20), default='queued')  # queued, running, done, failed
+    progress = db.Column(db.Integer, default=0)  # percent
+    file_size = db.Column(db.Integer)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_report_job_created_at', 'created_at'),
+    )
+
+    @property
+    def last_month(self):
+        return self.range_end - timedelta(days=1)
+
+    @property
+    def period_label(self):
+        return f"{self.range_start:%b %Y} - {self.last_month:%b %Y}"
+
+    @property
+    def download_name(self):
+        return f"dental_clinic_report_{self.range_start:%Y-%m}_{self.last_month:%Y-%m}.pdf"
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'progress': self.progress,
+            'file_size': self.file_size,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    def __repr__(self):
+        return f'<ReportJob {self.id} {self.status}>'
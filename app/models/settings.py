@@ -49,6 +49,12 @@ class Settings(db.Model):
     email_appointment_reminders = db.Column(db.Boolean, default=True)
     email_invoice_copy = db.Column(db.Boolean, default=True)
     
+    # Incremented by SQLAlchemy on every UPDATE; workers compare it to
+    # decide whether their cached snapshot is stale
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+    
+    __mapper_args__ = {'version_id_col': version}
+    
     def __init__(self):
         # Set default business hours
         default_hours = {
@@ -2,9 +2,11 @@ from flask import Blueprint, render_template, redirect, url_for, request, flash,
 from flask_login import login_required
 from app.models.appointment import Appointment
 from app.models.patient import Patient
-from app.models.settings import Settings
-from app.utils.email_sender import send_appointment_email
+from app.utils.settings_cache import get_settings
+from app.utils.email_sender import queue_appointment_email
 from app.utils.pagination import PaginationHelper, SearchHelper, FilterHelper, get_search_args
+from app.utils.search_index import search_filter
+from app.utils import loaders
 from app import db
 from datetime import datetime, date
 import logging
@@ -25,21 +27,11 @@ def index():
     page, per_page = PaginationHelper.get_page_args()
     
     # Start with base query
-    query = Appointment.query.join(Patient)
+    query = Appointment.query.join(Patient).options(*loaders.APPOINTMENT_LIST)
     
     # Apply search if provided
-    search_fields = ['treatment_type', 'notes', 'Patient.first_name', 'Patient.last_name']
     if search_term:
-        search_filters = []
-        for field in search_fields:
-            if '.' in field:
-                model_name, field_name = field.split('.')
-                if model_name == 'Patient':
-                    search_filters.append(getattr(Patient, field_name).ilike(f'%{search_term}%'))
-            else:
-                search_filters.append(getattr(Appointment, field).ilike(f'%{search_term}%'))
-        if search_filters:
-            query = query.filter(db.or_(*search_filters))
+        query = query.filter(search_filter('appointment', search_term))
     
     # Apply date filter if provided
     date_filter = request.args.get('filter_date')
@@ -55,12 +47,13 @@ def index():
     if status_filter:
         query = query.filter(Appointment.status == status_filter)
     
-    # Order by date and time
-    query = query.order_by(Appointment.date.desc(), Appointment.time.asc())
-    
-    # Paginate results
+    # Paginate results by date and time, seeking from the cursor instead of using OFFSET
     pagination = PaginationHelper(Appointment, page, per_page)
-    appointments = pagination.paginate_query(query)
+    appointments = pagination.paginate_keyset(
+        query,
+        [Appointment.date.desc(), Appointment.time.asc(), Appointment.id.asc()],
+        PaginationHelper.get_cursor_arg()
+    )
     
     # Get current date for template
     current_date = date.today()
@@ -89,8 +82,7 @@ def new():
             # Validate required fields
             if not all([patient_id, date_str, time_str, treatment_type, duration]):
                 flash('Please fill in all required fields', 'error')
-                patients = Patient.query.order_by(Patient.last_name).all()
-                return render_template('appointments/new.html', patients=patients)
+                return render_template('appointments/new.html')
 
             # Convert date and time strings to Python objects
             date = datetime.strptime(date_str, '%Y-%m-%d').date()
@@ -112,33 +104,23 @@ def new():
             
             # Get patient and settings
             patient = Patient.query.get(appointment.patient_id)
-            settings = Settings.query.first()
-            
-            if not settings:
-                settings = Settings(
-                    clinic_name="Dental Clinic",
-                    email_appointment_reminders=True
-                )
-                db.session.add(settings)
-                db.session.commit()
+            settings = get_settings()
             
             # Log debug information
             logger.info(f"Patient email: {patient.email}")
             logger.info(f"Settings: {settings.email_appointment_reminders}")
             
-            # Send confirmation email if patient has email
+            # Queue confirmation email if patient has email; the outbox worker sends it
             if patient.email:
-                logger.info("Patient has email, attempting to send...")
+                logger.info("Patient has email, queueing confirmation...")
                 try:
-                    success, message = send_appointment_email(appointment, patient, settings)
-                    logger.info(f"Email send attempt result: {success}, {message}")
-                    if success:
-                        flash('Appointment created and confirmation email sent', 'success')
-                    else:
-                        flash(f'Appointment created but email failed: {message}', 'warning')
+                    queue_appointment_email(appointment, patient, settings)
+                    db.session.commit()
+                    flash('Appointment created and confirmation email queued', 'success')
                 except Exception as e:
-                    logger.error(f"Email send error: {str(e)}")
-                    flash(f'Appointment created but email failed: {str(e)}', 'warning')
+                    db.session.rollback()
+                    logger.error(f"Email queue error: {str(e)}")
+                    flash(f'Appointment created but email could not be queued: {str(e)}', 'warning')
             else:
                 logger.info("Patient has no email, skipping email send")
                 flash('Appointment created successfully (no email address provided)', 'success')
@@ -148,51 +130,49 @@ def new():
         except ValueError as e:
             logger.error(f"Value error: {str(e)}")
             flash(f'Invalid date or time format: {str(e)}', 'error')
-            patients = Patient.query.order_by(Patient.last_name).all()
-            return render_template('appointments/new.html', patients=patients)
+            return render_template('appointments/new.html')
         except Exception as e:
             logger.error(f"General error: {str(e)}")
             flash(f'An error occurred: {str(e)}', 'error')
-            patients = Patient.query.order_by(Patient.last_name).all()
-            return render_template('appointments/new.html', patients=patients)
+            return render_template('appointments/new.html')
     
-    patients = Patient.query.order_by(Patient.last_name).all()
-    return render_template('appointments/new.html', patients=patients)
+    return render_template('appointments/new.html')
 
 @bp.route('/<int:id>/resend-email')
 @login_required
 def resend_email(id):
     try:
-        appointment = Appointment.query.get_or_404(id)
-        patient = Patient.query.get(appointment.patient_id)
-        settings = Settings.query.first()
+        appointment = loaders.get_or_404(Appointment, id, loaders.APPOINTMENT_DETAIL)
+        patient = appointment.patient
+        settings = get_settings()
         
         if not patient.email:
             return jsonify({'success': False, 'message': 'Patient has no email address'}), 400
-            
-        if not settings:
-            return jsonify({'success': False, 'message': 'Clinic settings not configured'}), 400
         
-        success, message = send_appointment_email(appointment, patient, settings)
+        queue_appointment_email(appointment, patient, settings)
+        db.session.commit()
         
-        if success:
-            return jsonify({'success': True, 'message': 'Confirmation email resent successfully'})
-        else:
-            return jsonify({'success': False, 'message': f'Failed to send email: {message}'}), 500
+        return jsonify({'success': True, 'message': 'Confirmation email queued for resending'})
             
     except Exception as e:
+        db.session.rollback()
         logger.error(f"Resend email error: {str(e)}")
         return jsonify({'success': False, 'message': str(e)}), 500
 
 @bp.route('/<int:id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit(id):
-    appointment = Appointment.query.get_or_404(id)
+    appointment = loaders.get_or_404(Appointment, id, loaders.APPOINTMENT_DETAIL)
     
     if request.method == 'POST':
         try:
-            appointment.date = datetime.strptime(request.form['date'], '%Y-%m-%d').date()
-            appointment.time = datetime.strptime(request.form['time'], '%H:%M').time()
+            new_date = datetime.strptime(request.form['date'], '%Y-%m-%d').date()
+            new_time = datetime.strptime(request.form['time'], '%H:%M').time()
+            # A rescheduled appointment gets a reminder for its new slot
+            if (new_date, new_time) != (appointment.date, appointment.time):
+                appointment.reminder_sent_at = None
+            appointment.date = new_date
+            appointment.time = new_time
             appointment.treatment_type = request.form['treatment_type']
             appointment.duration = int(request.form['duration'])
             appointment.status = request.form['status']
@@ -208,8 +188,7 @@ def edit(id):
             logger.error(f"Error editing appointment: {str(e)}")
             flash(f'An error occurred: {str(e)}', 'error')
     
-    patients = Patient.query.order_by(Patient.last_name).all()
-    return render_template('appointments/edit.html', appointment=appointment, patients=patients)
+    return render_template('appointments/edit.html', appointment=appointment)
 
 @bp.route('/<int:id>/delete', methods=['POST'])
 @login_required
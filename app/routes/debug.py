@@ -0,0 +1,15 @@
+from flask import Blueprint, abort, render_template
+from flask_login import current_user, login_required
+from app.utils.profiler import HISTORY_SIZE, N_PLUS_ONE_THRESHOLD, history
+
+bp = Blueprint('debug', __name__, url_prefix='/debug')
+
+@bp.route('/perf')
+@login_required
+def perf():
+    if not current_user.is_admin:
+        abort(403)
+    return render_template('debug/perf.html',
+                         rows=history.aggregate(),
+                         history_size=HISTORY_SIZE,
+                         threshold=N_PLUS_ONE_THRESHOLD)
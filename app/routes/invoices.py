@@ -1,11 +1,13 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, make_response, send_file
 from flask_login import login_required, current_user
 from app.models.invoice import Invoice
 from app.models.patient import Patient
-from app.models.settings import Settings
+from app.utils.settings_cache import get_settings
 from app import db
 from datetime import datetime, date, timedelta
 from app.utils.pagination import PaginationHelper, SearchHelper, FilterHelper, get_search_args
+from app.utils.search_index import search_filter
+from app.utils import loaders
 
 invoices = Blueprint('invoices', __name__, url_prefix='/invoices')
 
@@ -19,21 +21,11 @@ def index():
     page, per_page = PaginationHelper.get_page_args()
     
     # Start with base query
-    query = Invoice.query.join(Patient)
+    query = Invoice.query.join(Patient).options(*loaders.INVOICE_LIST)
     
     # Apply search if provided
-    search_fields = ['notes', 'Patient.first_name', 'Patient.last_name']
     if search_term:
-        search_filters = []
-        for field in search_fields:
-            if '.' in field:
-                model_name, field_name = field.split('.')
-                if model_name == 'Patient':
-                    search_filters.append(getattr(Patient, field_name).ilike(f'%{search_term}%'))
-            else:
-                search_filters.append(getattr(Invoice, field).ilike(f'%{search_term}%'))
-        if search_filters:
-            query = query.filter(db.or_(*search_filters))
+        query = query.filter(search_filter('invoice', search_term))
     
     # Apply date filter if provided
     date_filter = request.args.get('filter_date')
@@ -49,17 +41,18 @@ def index():
     if status_filter:
         query = query.filter(Invoice.status == status_filter)
     
-    # Order by date and id (which is used to generate invoice number)
-    query = query.order_by(Invoice.date.desc(), Invoice.id.desc())
-    
-    # Paginate results
+    # Paginate results by date and id (which is used to generate invoice number)
     pagination = PaginationHelper(Invoice, page, per_page)
-    invoices = pagination.paginate_query(query)
+    invoices = pagination.paginate_keyset(
+        query,
+        [Invoice.date.desc(), Invoice.id.desc()],
+        PaginationHelper.get_cursor_arg()
+    )
     
     # Get current date for template
     current_date = date.today()
     
-    settings = Settings.query.first()
+    settings = get_settings()
     
     return render_template(
         'invoices/index.html',
@@ -132,11 +125,10 @@ def new():
             flash(f'Error creating invoice: {str(e)}', 'error')
             return redirect(url_for('invoices.new'))
     
-    patients = Patient.query.all()
-    settings = Settings.query.first()
+    settings = get_settings()
     today = datetime.now().strftime('%Y-%m-%d')
     due_date = (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d')
-    return render_template('invoices/new.html', patients=patients, today=today, due_date=due_date, settings=settings)
+    return render_template('invoices/new.html', today=today, due_date=due_date, settings=settings)
 
 @invoices.route('/<int:id>/edit', methods=['GET', 'POST'])
 @login_required
@@ -187,19 +179,40 @@ def edit(id):
             flash('Error updating invoice: ' + str(e), 'error')
             db.session.rollback()
     
-    patients = Patient.query.order_by(Patient.first_name).all()
-    settings = Settings.query.first()
-    return render_template('invoices/edit.html', invoice=invoice, patients=patients, settings=settings)
+    settings = get_settings()
+    return render_template('invoices/edit.html', invoice=invoice, settings=settings)
 
 @invoices.route('/<int:id>')
 @login_required
 def view(id):
-    invoice = Invoice.query.get_or_404(id)
-    settings = Settings.query.first()
+    invoice = loaders.get_or_404(Invoice, id, loaders.INVOICE_DETAIL)
+    settings = get_settings()
     print_mode = request.args.get('print', False)
     template = 'invoices/print.html' if print_mode else 'invoices/view.html'
     return render_template(template, invoice=invoice, settings=settings)
 
+@invoices.route('/<int:id>/pdf')
+@login_required
+def pdf(id):
+    from app.utils.invoice_pdf import invoice_pdf_path, invoice_revision
+    invoice = loaders.get_or_404(Invoice, id, loaders.INVOICE_DETAIL)
+    settings = get_settings()
+    revision = invoice_revision(invoice, settings)
+    # A reprint of an unchanged invoice is answered from the ETag alone
+    if request.if_none_match.contains(revision):
+        response = make_response('', 304)
+        response.set_etag(revision)
+    else:
+        response = send_file(invoice_pdf_path(invoice, settings, revision),
+                             mimetype='application/pdf',
+                             download_name=f'{invoice.invoice_number}.pdf',
+                             conditional=True,
+                             etag=revision,
+                             max_age=0)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
 @invoices.route('/<int:id>/status', methods=['POST'])
 @login_required
 def update_status(id):
@@ -229,6 +242,9 @@ def update_status(id):
         invoice.status = 'partially_paid'
     else:
         invoice.status = 'unpaid'
+    # Past its due date an unsettled invoice stays overdue, as the sweeper would set it
+    if invoice.status != 'paid' and invoice.due_date < date.today():
+        invoice.status = 'overdue'
     
     db.session.commit()
     
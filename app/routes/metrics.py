@@ -0,0 +1,17 @@
+from flask import Blueprint, Response, abort, current_app
+from flask_login import current_user
+from prometheus_client import CONTENT_TYPE_LATEST
+from app import login_manager
+from app.utils.metrics import authorized, render_metrics
+
+bp = Blueprint('metrics', __name__)
+
+@bp.route('/metrics')
+def index():
+    if current_app.config.get('METRICS_TOKEN'):
+        if not authorized(current_app):
+            abort(401)
+    elif not current_user.is_authenticated:
+        # Without a scrape token the metrics are for signed-in staff only
+        return login_manager.unauthorized()
+    return Response(render_metrics(), content_type=CONTENT_TYPE_LATEST)
@@ -1,9 +1,14 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash
+from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify
 from flask_login import login_required
 from app.models.patient import Patient
 from app import db
 from datetime import datetime, date
 from app.utils.pagination import PaginationHelper, SearchHelper, FilterHelper, get_search_args
+from app.utils.search_index import search_filter
+from app.utils.patient_lookup import lookup_patients
+from app.utils.loaders import patient_history
+from app.utils.receivables import patient_balance
+from app.utils.settings_cache import get_settings
 
 bp = Blueprint('patients', __name__, url_prefix='/patients')
 
@@ -20,18 +25,19 @@ def index():
     query = Patient.query
     
     # Apply search if provided
-    search_fields = ['first_name', 'last_name', 'email', 'phone']
-    query = SearchHelper.apply_search(query, Patient, search_term, search_fields)
+    if search_term:
+        query = query.filter(search_filter('patient', search_term))
     
     # Apply filters if provided
     query = FilterHelper.apply_filters(query, Patient, filters)
     
-    # Order by name
-    query = query.order_by(Patient.last_name, Patient.first_name)
-    
-    # Paginate results
+    # Paginate results by name
     pagination = PaginationHelper(Patient, page, per_page)
-    patients = pagination.paginate_query(query)
+    patients = pagination.paginate_keyset(
+        query,
+        [Patient.last_name, Patient.first_name, Patient.id],
+        PaginationHelper.get_cursor_arg()
+    )
     
     # Get current date for age calculation
     current_date = date.today()
@@ -44,6 +50,16 @@ def index():
         now=current_date
     )
 
+@bp.route('/lookup')
+@login_required
+def lookup():
+    """Patient typeahead used by the appointment, invoice and prescription forms."""
+    try:
+        limit = int(request.args.get('limit', 10))
+    except (TypeError, ValueError):
+        limit = 10
+    return jsonify(lookup_patients(request.args.get('q', ''), limit=limit))
+
 @bp.route('/new', methods=['GET', 'POST'])
 @login_required
 def new():
@@ -105,6 +121,7 @@ def view(id):
         return render_template('patients/print.html', 
                              patient=patient, 
                              now=current_date,
+                             history=patient_history(patient, limit=5),
                              first_name=patient.first_name,
                              last_name=patient.last_name,
                              date_of_birth=patient.date_of_birth,
@@ -119,9 +136,14 @@ def view(id):
                              treatment_plan=patient.treatment_plan,
                              treatment_done=patient.treatment_done,
                              recall=patient.recall)
+    open_invoices, outstanding = patient_balance(patient.id)
     return render_template('patients/view.html', 
                          patient=patient, 
                          now=current_date,
+                         history=patient_history(patient),
+                         settings=get_settings(),
+                         open_invoices=open_invoices,
+                         outstanding=outstanding,
                          first_name=patient.first_name,
                          last_name=patient.last_name,
                          date_of_birth=patient.date_of_birth,
@@ -2,10 +2,12 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 from app.models.prescription import Prescription, Medication
 from app.models.patient import Patient
-from app.models.settings import Settings
+from app.utils.settings_cache import get_settings
 from app import db
 from datetime import datetime, date
 from app.utils.pagination import PaginationHelper, SearchHelper, FilterHelper, get_search_args
+from app.utils.search_index import search_filter
+from app.utils import loaders
 
 prescriptions = Blueprint('prescriptions', __name__)
 
@@ -19,21 +21,11 @@ def index():
     page, per_page = PaginationHelper.get_page_args()
     
     # Start with base query
-    query = Prescription.query.join(Patient)
+    query = Prescription.query.join(Patient).options(*loaders.PRESCRIPTION_LIST)
     
     # Apply search if provided
-    search_fields = ['diagnosis', 'notes', 'Patient.first_name', 'Patient.last_name']
     if search_term:
-        search_filters = []
-        for field in search_fields:
-            if '.' in field:
-                model_name, field_name = field.split('.')
-                if model_name == 'Patient':
-                    search_filters.append(getattr(Patient, field_name).ilike(f'%{search_term}%'))
-            else:
-                search_filters.append(getattr(Prescription, field).ilike(f'%{search_term}%'))
-        if search_filters:
-            query = query.filter(db.or_(*search_filters))
+        query = query.filter(search_filter('prescription', search_term))
     
     # Apply date filter if provided
     date_filter = request.args.get('filter_date')
@@ -44,8 +36,8 @@ def index():
         except ValueError:
             flash('Invalid date format', 'error')
     
-    # Order by date
-    query = query.order_by(Prescription.date.desc())
+    # Order by date, newest first (id breaks ties so pages are stable)
+    query = query.order_by(Prescription.date.desc(), Prescription.id.desc())
     
     # Paginate results
     pagination = PaginationHelper(Prescription, page, per_page)
@@ -107,19 +99,14 @@ def new():
         flash('Prescription created successfully', 'success')
         return redirect(url_for('prescriptions.index'))
     
-    patients = Patient.query.all()
-    return render_template('prescriptions/new.html', patients=patients)
+    return render_template('prescriptions/new.html')
 
 @prescriptions.route('/prescriptions/<int:id>')
 @login_required
 def view(id):
     try:
-        prescription = Prescription.query.get_or_404(id)
-        settings = Settings.query.first()
-        if settings is None:
-            settings = Settings()  # Create a default settings object if none exists
-            db.session.add(settings)
-            db.session.commit()
+        prescription = loaders.get_or_404(Prescription, id, loaders.PRESCRIPTION_DETAIL)
+        settings = get_settings()
         
         current_date = date.today()
             
@@ -141,7 +128,7 @@ def view(id):
 @prescriptions.route('/prescriptions/<int:id>/edit', methods=['GET', 'POST'])
 @login_required
 def edit(id):
-    prescription = Prescription.query.get_or_404(id)
+    prescription = loaders.get_or_404(Prescription, id, loaders.PRESCRIPTION_DETAIL)
     
     if request.method == 'POST':
         prescription.diagnosis = request.form.get('diagnosis')
@@ -178,8 +165,7 @@ def edit(id):
         flash('Prescription updated successfully', 'success')
         return redirect(url_for('prescriptions.view', id=prescription.id))
     
-    patients = Patient.query.all()
-    return render_template('prescriptions/edit.html', prescription=prescription, patients=patients)
+    return render_template('prescriptions/edit.html', prescription=prescription)
 
 @prescriptions.route('/prescriptions/<int:id>/delete', methods=['POST'])
 @login_required
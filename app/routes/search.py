@@ -0,0 +1,66 @@
+from flask import Blueprint, request, jsonify, url_for
+from flask_login import login_required
+from app.models.patient import Patient
+from app.models.appointment import Appointment
+from app.models.prescription import Prescription
+from app.models.invoice import Invoice
+from app.utils.search_index import search as search_index
+
+bp = Blueprint('search', __name__)
+
+@bp.route('/search')
+@login_required
+def search():
+    term = request.args.get('q', '').strip()
+    try:
+        limit = min(int(request.args.get('limit', 20)), 100)
+    except (TypeError, ValueError):
+        limit = 20
+
+    matches = search_index(term, limit=limit)
+
+    # Load labels with one query per kind instead of one per hit
+    ids_by_kind = {}
+    for kind, ref_id, _ in matches:
+        ids_by_kind.setdefault(kind, []).append(ref_id)
+    labels = {}
+    if 'patient' in ids_by_kind:
+        for row in Patient.query.with_entities(Patient.id, Patient.first_name, Patient.last_name)\
+                .filter(Patient.id.in_(ids_by_kind['patient'])):
+            labels[('patient', row.id)] = f"{row.first_name} {row.last_name}"
+    for kind, model, detail_column, describe in [
+        ('appointment', Appointment, Appointment.treatment_type,
+         lambda row: f"{row.date} {row.detail or 'Appointment'}"),
+        ('prescription', Prescription, Prescription.diagnosis,
+         lambda row: f"{row.date} {row.detail or 'Prescription'}"),
+        ('invoice', Invoice, Invoice.status,
+         lambda row: f"INV-{row.date.year}-{str(row.id).zfill(5)}"),
+    ]:
+        if kind not in ids_by_kind:
+            continue
+        rows = model.query.join(Patient)\
+            .with_entities(model.id, model.date, detail_column.label('detail'),
+                           Patient.first_name, Patient.last_name)\
+            .filter(model.id.in_(ids_by_kind[kind]))
+        for row in rows:
+            labels[(kind, row.id)] = f"{describe(row)} - {row.first_name} {row.last_name}"
+
+    endpoints = {
+        'patient': 'patients.view',
+        'appointment': 'appointments.edit',
+        'prescription': 'prescriptions.view',
+        'invoice': 'invoices.view',
+    }
+    results = []
+    for kind, ref_id, rank in matches:
+        if (kind, ref_id) not in labels:
+            continue
+        results.append({
+            'type': kind,
+            'id': ref_id,
+            'label': labels[(kind, ref_id)],
+            'url': url_for(endpoints[kind], id=ref_id),
+            'score': -rank
+        })
+
+    return jsonify({'query': term, 'results': results})
@@ -1,6 +1,6 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
-from app.models.settings import Settings
+from app.utils.settings_cache import load_settings
 from app import db
 
 settings = Blueprint('settings', __name__)
@@ -19,11 +19,7 @@ CURRENCY_CHOICES = [
 @login_required
 def index():
     # Get current settings or create new if not exists
-    settings_obj = Settings.query.first()
-    if not settings_obj:
-        settings_obj = Settings()
-        db.session.add(settings_obj)
-        db.session.commit()
+    settings_obj = load_settings()
     
     if request.method == 'POST':
         try:
@@ -0,0 +1,124 @@
+import threading
+import time
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from sqlalchemy import case, event, func
+from sqlalchemy.orm import Session, joinedload
+from app import db
+from app.models.patient import Patient
+from app.models.appointment import Appointment
+from app.models.invoice import Invoice
+from app.utils.receivables import ledger_totals
+
+# Stats are cached per worker. Committed writes through this process clear
+# the cache immediately; the TTL bounds how stale another worker's copy can be.
+CACHE_TTL = 60
+UPCOMING_LIMIT = 25
+TRACKED_MODELS = (Patient, Appointment, Invoice)
+
+_generation = 0
+_lock = threading.Lock()
+
+
+def _count_if(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+@lru_cache(maxsize=8)
+def _compute(today, generation, ttl_bucket):
+    invoices = ledger_totals(today)
+
+    # Patient and appointment counts come from scalar subqueries in one statement
+    month_start = datetime.combine(today.replace(day=1), datetime.min.time())
+    counts = db.session.query(
+        db.session.query(func.count(Patient.id)).scalar_subquery(),
+        db.session.query(_count_if(Patient.created_at >= month_start)).scalar_subquery(),
+        db.session.query(func.count(Appointment.id)).scalar_subquery(),
+        db.session.query(_count_if(Appointment.date == today)).scalar_subquery(),
+        db.session.query(_count_if(Appointment.date.between(today, today + timedelta(days=7)))).scalar_subquery(),
+        db.session.query(_count_if((Appointment.status == 'scheduled') & (Appointment.date >= today))).scalar_subquery(),
+    ).one()
+
+    total_amount = invoices['total_amount']
+    return {
+        'total_invoices': invoices['total_invoices'],
+        'total_amount': total_amount,
+        'unpaid_amount': invoices['unpaid_amount'],
+        'overdue_invoices': invoices['overdue_invoices'],
+        'payment_rate': (invoices['total_paid'] / total_amount * 100) if total_amount > 0 else 0,
+        'total_patients': counts[0],
+        'new_patients_this_month': counts[1],
+        'total_appointments': counts[2],
+        'todays_appointments': counts[3],
+        'this_week_appointments': counts[4],
+        'pending_appointments': counts[5],
+    }
+
+
+def get_dashboard_stats(today=None):
+    """Return the dashboard KPI counters as a dict.
+
+    Invoice totals come from the receivables ledger and the
+    patient/appointment counts from one conditional-aggregate query; the
+    result is cached until a Patient, Appointment or Invoice write is
+    committed.
+    """
+    today = today or date.today()
+    return dict(_compute(today, _generation, int(time.time() // CACHE_TTL)))
+
+
+def upcoming_appointments(today=None, limit=UPCOMING_LIMIT):
+    """Appointments in the next 7 days with their patients eager-loaded."""
+    today = today or date.today()
+    return Appointment.query\
+        .options(joinedload(Appointment.patient))\
+        .filter(Appointment.date.between(today, today + timedelta(days=7)))\
+        .order_by(Appointment.date, Appointment.time, Appointment.id)\
+        .limit(limit)\
+        .all()
+
+
+def recent_patients(limit=5):
+    """Most recently added patients, newest first.
+
+    Ordered by primary key rather than created_at so it is an index walk
+    instead of a sort over the whole patient table.
+    """
+    return Patient.query.order_by(Patient.id.desc()).limit(limit).all()
+
+
+def clear_cache():
+    global _generation
+    with _lock:
+        _generation += 1
+        _compute.cache_clear()
+
+
+# Writes only mark the session during flush; the cache is cleared after
+# commit so a concurrent request cannot re-cache pre-commit numbers.
+def _mark_dirty(mapper, connection, target):
+    Session.object_session(target).info['dashboard_stale'] = True
+
+
+def _mark_bulk_dirty(update_context):
+    if update_context.mapper.class_ in TRACKED_MODELS:
+        update_context.session.info['dashboard_stale'] = True
+
+
+for _model in TRACKED_MODELS:
+    for _event in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event, _mark_dirty)
+
+event.listen(Session, 'after_bulk_update', _mark_bulk_dirty)
+event.listen(Session, 'after_bulk_delete', _mark_bulk_dirty)
+
+
+@event.listens_for(Session, 'after_commit')
+def _clear_after_commit(session):
+    if session.info.pop('dashboard_stale', False):
+        clear_cache()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('dashboard_stale', None)
@@ -0,0 +1,145 @@
+import logging
+import os
+import time
+import click
+from flask.cli import ScriptInfo
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+from app.utils.metrics import DB_CHECKOUT_WAIT
+from app.utils.sqlite_profile import configure_sqlite_engine
+
+logger = logging.getLogger(__name__)
+
+# Defaults for server databases (PostgreSQL). SQLite keeps SQLAlchemy's own
+# pool defaults unless DB_POOL_* is set, and gets its pragmas from
+# sqlite_profile instead.
+SERVER_POOL_RECYCLE = 1800       # seconds; below typical proxy/server idle cut-offs
+SERVER_STATEMENT_TIMEOUT = 30000  # ms
+CONNECT_TIMEOUT = 10             # seconds
+APPLICATION_NAME = 'dentflow'
+
+
+def database_uri(url, default_path):
+    """DATABASE_URL if set, otherwise the SQLite file at ``default_path``.
+
+    Accepts the ``postgres://`` scheme hosting providers still hand out, and
+    resolves relative SQLite paths against the project directory (the one
+    holding ``instance/``), as the install guides assume.
+    """
+    if not url:
+        return f'sqlite:///{default_path}'
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    parsed = make_url(url)
+    if parsed.get_backend_name() != 'sqlite' or parsed.database in (None, '', ':memory:'):
+        return url
+    path = parsed.database
+    if not os.path.isabs(path):
+        path = os.path.join(os.path.dirname(os.path.dirname(default_path)), path)
+    if not os.path.exists(path) and os.path.exists(default_path):
+        logger.warning(f"DATABASE_URL points at {path}, which does not exist yet, "
+                       f"while the clinic data is in {default_path}")
+    return parsed.set(database=path).render_as_string(hide_password=False)
+
+
+def database_settings_from_env(environ=None):
+    """DB_* pool settings present in the environment, parsed."""
+    environ = os.environ if environ is None else environ
+    settings = {}
+    for key in ('DB_POOL_SIZE', 'DB_MAX_OVERFLOW', 'DB_POOL_TIMEOUT', 'DB_POOL_RECYCLE', 'DB_STATEMENT_TIMEOUT'):
+        if environ.get(key):
+            settings[key] = int(environ[key])
+    if environ.get('DB_POOL_PRE_PING'):
+        settings['DB_POOL_PRE_PING'] = environ['DB_POOL_PRE_PING'].lower() in ('1', 'true', 'on')
+    return settings
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    _sqla_logger_namespace = 'sqlalchemy.pool.impl.QueuePool'  # keep SQLAlchemy's log level
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            DB_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+
+
+def _is_memory_sqlite(url):
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def configure_engine(app):
+    """Build SQLALCHEMY_ENGINE_OPTIONS from the DB_* settings; call before db.init_app.
+
+    Options already present in SQLALCHEMY_ENGINE_OPTIONS win, so scripts can
+    still pass their own.
+    """
+    url = make_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    if _is_memory_sqlite(url):
+        return  # a single shared connection; pool settings do not apply
+
+    backend = url.get_backend_name()
+    server = backend != 'sqlite'
+    pool = {
+        'poolclass': TimedQueuePool,
+        'pool_size': app.config.get('DB_POOL_SIZE'),
+        'max_overflow': app.config.get('DB_MAX_OVERFLOW'),
+        'pool_timeout': app.config.get('DB_POOL_TIMEOUT'),
+        'pool_recycle': app.config.get('DB_POOL_RECYCLE', SERVER_POOL_RECYCLE if server else None),
+        'pool_pre_ping': app.config.get('DB_POOL_PRE_PING', server),
+    }
+    if server:
+        # Hand out the most recently used connection, so idle extras time out server-side
+        pool['pool_use_lifo'] = True
+    for key, value in pool.items():
+        if value is not None:
+            options.setdefault(key, value)
+
+    if backend == 'sqlite':
+        configure_sqlite_engine(app)
+    elif backend == 'postgresql':
+        _configure_postgresql(app, url, options)
+
+
+def _configure_postgresql(app, url, options):
+    timeout = app.config.get('DB_STATEMENT_TIMEOUT', SERVER_STATEMENT_TIMEOUT)
+    connect_args = options.setdefault('connect_args', {})
+    connect_args.setdefault('application_name', APPLICATION_NAME)
+    if url.get_driver_name() in ('psycopg2', 'psycopg'):
+        connect_args.setdefault('connect_timeout', CONNECT_TIMEOUT)
+        # TCP keepalives notice a dropped server before the next checkout does
+        connect_args.setdefault('keepalives', 1)
+        connect_args.setdefault('keepalives_idle', 30)
+        if timeout:
+            connect_args.setdefault('options', f'-c statement_timeout={int(timeout)}')
+
+
+class LazyMigrateGroup(click.Group):
+    """Flask-Migrate's 'db' command group, imported the first time it is used.
+
+    Alembic takes longer to import than the rest of the app's dependencies
+    beyond SQLAlchemy, and only these commands need it, so web workers never
+    load it.
+    """
+
+    def _commands(self, ctx):
+        from flask_migrate import Migrate
+        from flask_migrate.cli import db as db_cli_group
+        app = ctx.ensure_object(ScriptInfo).load_app()
+        if 'migrate' not in app.extensions:
+            from app import db
+            Migrate(app, db)
+        return db_cli_group
+
+    def list_commands(self, ctx):
+        return self._commands(ctx).list_commands(ctx)
+
+    def get_command(self, ctx, name):
+        return self._commands(ctx).get_command(ctx, name)
+
+
+migrate_cli = LazyMigrateGroup('db', help='Perform database migrations.')
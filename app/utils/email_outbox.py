@@ -0,0 +1,393 @@
+import logging
+import smtplib
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from app import db
+from app.models.email_outbox import EmailOutbox
+from app.utils.email_sender import build_message, get_smtp_config, open_smtp_connection
+from app.utils.metrics import EMAIL_CONNECTIONS, EMAIL_SEND_LATENCY, EMAIL_SENDS
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 20
+POLL_INTERVAL = 5          # seconds between polls when the queue is empty
+IDLE_DISCONNECT = 60       # close the SMTP connection after this long without work
+LEASE_TIMEOUT = 300        # 'sending' rows not renewed for this long were orphaned by a crash
+MAX_ATTEMPTS = 6
+RETRY_BASE_DELAY = 30      # seconds; doubles with every failed attempt
+RETRY_MAX_DELAY = 3600
+
+
+class OutboxMetrics:
+    """Process-local counters for the outbox sender, mirrored to /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.connections_opened = 0
+        self.latencies = deque(maxlen=1000)
+
+    def record_sent(self, latency):
+        with self._lock:
+            self.sent += 1
+            self.latencies.append(latency)
+        EMAIL_SENDS.labels('sent').inc()
+        EMAIL_SEND_LATENCY.observe(latency)
+
+    def record_retry(self):
+        with self._lock:
+            self.retried += 1
+        EMAIL_SENDS.labels('retried').inc()
+
+    def record_failure(self):
+        with self._lock:
+            self.failed += 1
+        EMAIL_SENDS.labels('failed').inc()
+
+    def record_connection(self):
+        with self._lock:
+            self.connections_opened += 1
+        EMAIL_CONNECTIONS.inc()
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            counters = {
+                'sent': self.sent,
+                'retried': self.retried,
+                'failed': self.failed,
+                'connections_opened': self.connections_opened,
+            }
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] if latencies else None
+
+        counters['send_latency_p50'] = percentile(0.5)
+        counters['send_latency_p95'] = percentile(0.95)
+        return counters
+
+
+metrics = OutboxMetrics()
+
+
+def enqueue_email(recipient, subject, html_body, text_body=None, category=None, appointment_id=None):
+    """Add a message to the outbox. It is sent after the caller commits."""
+    message = EmailOutbox(
+        recipient=recipient,
+        subject=subject,
+        html_body=html_body,
+        text_body=text_body,
+        category=category,
+        appointment_id=appointment_id,
+        status='queued',
+        next_attempt_at=datetime.utcnow()
+    )
+    db.session.add(message)
+    db.session.info['outbox_pending'] = True
+    return message
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_after_commit(session):
+    if session.info.pop('outbox_pending', False) and _worker is not None:
+        _worker.wake()
+
+
+def queue_depth():
+    """Count outbox rows by status."""
+    rows = db.session.query(EmailOutbox.status, func.count(EmailOutbox.id))\
+        .group_by(EmailOutbox.status).all()
+    return {status: count for status, count in rows}
+
+
+class RateLimiter:
+    """Spaces out calls to at most ``rate`` per second, shared across threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def retry_delay(attempts):
+    return min(RETRY_BASE_DELAY * 2 ** max(attempts - 1, 0), RETRY_MAX_DELAY)
+
+
+class OutboxSender:
+    """Claims batches of queued messages and sends them over one SMTP connection.
+
+    Claims are made with a single UPDATE guarded on status, so several workers
+    (threads in different gunicorn processes, or a standalone worker) can
+    drain the same outbox without sending a message twice. Each message's
+    lease is renewed just before it is sent and its outcome is written only
+    while the claim is still this worker's, so a slow batch cannot have its
+    tail recovered and sent again by another worker.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, smtp_config=None, rate_limiter=None):
+        self.batch_size = batch_size
+        self.smtp_config = smtp_config
+        self.rate_limiter = rate_limiter
+        self.smtp = None
+        self.last_used = 0
+
+    def run_once(self):
+        """Send one batch. Returns the number of messages claimed."""
+        token, batch = self._claim_batch()
+        if not batch:
+            return 0
+
+        config = self.smtp_config or get_smtp_config()
+        for message in batch:
+            now = datetime.utcnow()
+            if not self._renew(message, token, now):
+                logger.warning(f"Email {message.id} was reclaimed by another worker; skipping it")
+                continue
+            start = time.perf_counter()
+            try:
+                self._send(config, message)
+            except smtplib.SMTPRecipientsRefused as e:
+                # 4xx replies (mailbox busy, greylisting) are temporary; only 5xx is final
+                if all(code >= 500 for code, _ in e.recipients.values()):
+                    outcome = self._fail(message, f'Recipient refused: {e.recipients}')
+                else:
+                    outcome = self._retry(message, now, f'Recipient deferred: {e.recipients}')
+            except Exception as e:
+                # Connection-level problems: drop the connection and retry later
+                self.close()
+                outcome = self._retry(message, now, str(e))
+            else:
+                outcome = {'status': 'sent', 'sent_at': datetime.utcnow(), 'last_error': None}
+                metrics.record_sent(time.perf_counter() - start)
+            self._finish(message, token, outcome)
+        stats = metrics.snapshot()
+        logger.info(f"Email outbox batch: {len(batch)} claimed, {stats['sent']} sent, "
+                    f"{stats['retried']} retried, {stats['failed']} failed, "
+                    f"p95 send latency {stats['send_latency_p95'] or 0:.3f}s")
+        return len(batch)
+
+    def close(self):
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except Exception:
+                pass
+            self.smtp = None
+
+    def close_if_idle(self, idle_timeout=IDLE_DISCONNECT):
+        if self.smtp is not None and time.monotonic() - self.last_used > idle_timeout:
+            self.close()
+
+    def _send(self, config, message):
+        if not config['user'] and config['host'] == 'smtp.gmail.com':
+            raise RuntimeError('Gmail credentials not configured. Please set GMAIL_USER and GMAIL_APP_PASSWORD')
+        if self.smtp is None:
+            self.smtp = open_smtp_connection(config)
+            metrics.record_connection()
+        sender = config['user'] or 'no-reply@localhost'
+        msg = build_message(sender, message.recipient, message.subject, message.html_body, message.text_body)
+        if self.rate_limiter is not None:
+            self.rate_limiter.wait()
+        self.smtp.send_message(msg)
+        self.last_used = time.monotonic()
+
+    def _claim_batch(self):
+        now = datetime.utcnow()
+        # Crash recovery: messages left 'sending' by a dead worker go back in the queue
+        EmailOutbox.query.filter(
+            EmailOutbox.status == 'sending',
+            EmailOutbox.claimed_at < now - timedelta(seconds=LEASE_TIMEOUT)
+        ).update({'status': 'queued', 'claim_token': None}, synchronize_session=False)
+
+        token = uuid.uuid4().hex
+        due = db.session.query(EmailOutbox.id).filter(
+            EmailOutbox.status == 'queued',
+            EmailOutbox.next_attempt_at <= now
+        ).order_by(EmailOutbox.id).limit(self.batch_size).scalar_subquery()
+        claimed = EmailOutbox.query.filter(
+            EmailOutbox.id.in_(due),
+            EmailOutbox.status == 'queued'
+        ).update({
+            'status': 'sending',
+            'claim_token': token,
+            'claimed_at': now,
+            'attempts': EmailOutbox.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+        if not claimed:
+            return token, []
+        return token, EmailOutbox.query.filter_by(claim_token=token).order_by(EmailOutbox.id).all()
+
+    def _held(self, message, token):
+        return EmailOutbox.query.filter(EmailOutbox.id == message.id, EmailOutbox.claim_token == token)
+
+    def _renew(self, message, token, now):
+        """Restart ``message``'s lease; False if crash recovery has handed it to another worker."""
+        renewed = self._held(message, token).update({'claimed_at': now}, synchronize_session=False)
+        db.session.commit()
+        return bool(renewed)
+
+    def _finish(self, message, token, outcome):
+        """Write a send's outcome, unless the message has been claimed again since."""
+        written = self._held(message, token).update(dict(outcome, claim_token=None), synchronize_session=False)
+        db.session.commit()
+        if not written:
+            logger.warning(f"Email {message.id} was reclaimed by another worker while sending; "
+                           f"leaving its status to that worker")
+
+    def _retry(self, message, now, error):
+        if message.attempts >= MAX_ATTEMPTS:
+            metrics.record_failure()
+            logger.error(f"Giving up on email {message.id} after {message.attempts} attempts: {error}")
+            return {'status': 'failed', 'last_error': error}
+        metrics.record_retry()
+        logger.warning(f"Email {message.id} failed (attempt {message.attempts}), will retry: {error}")
+        return {'status': 'queued', 'last_error': error,
+                'next_attempt_at': now + timedelta(seconds=retry_delay(message.attempts))}
+
+    def _fail(self, message, error):
+        metrics.record_failure()
+        logger.error(f"Email {message.id} permanently failed: {error}")
+        return {'status': 'failed', 'last_error': error}
+
+
+class OutboxWorker:
+    """Background thread that drains the outbox inside an app context."""
+
+    def __init__(self, app, poll_interval=POLL_INTERVAL):
+        self.app = app
+        self.poll_interval = poll_interval
+        self.sender = OutboxSender()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self.run, name='email-outbox', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def wake(self):
+        self._wake.set()
+
+    def run(self):
+        while not self._stop.is_set():
+            processed = 0
+            with self.app.app_context():
+                try:
+                    processed = self.sender.run_once()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Email outbox worker error: {str(e)}")
+                finally:
+                    db.session.remove()
+            if processed:
+                continue
+            self.sender.close_if_idle()
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+        self.sender.close()
+
+
+def drain_outbox(app, concurrency=1, rate_limit=None, batch_size=BATCH_SIZE):
+    """Send everything currently due, then return the number of messages claimed.
+
+    Each of the ``concurrency`` threads keeps one SMTP session open for the
+    whole run; ``rate_limit`` caps the combined messages per second.
+    """
+    limiter = RateLimiter(rate_limit) if rate_limit else None
+    claimed = []
+
+    def work():
+        sender = OutboxSender(batch_size=batch_size, rate_limiter=limiter)
+        total = 0
+        with app.app_context():
+            try:
+                while True:
+                    count = sender.run_once()
+                    if not count:
+                        break
+                    total += count
+            finally:
+                sender.close()
+                db.session.remove()
+        claimed.append(total)
+
+    threads = [threading.Thread(target=work, name=f'email-drain-{i}') for i in range(max(1, concurrency))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(claimed)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def init_outbox(app):
+    """Register the outbox CLI and start the in-process sender on the first request.
+
+    Set EMAIL_OUTBOX_WORKER=off to run the sender only as a separate
+    'flask outbox worker' process.
+    """
+    app.cli.add_command(outbox_cli)
+    if app.config.get('EMAIL_OUTBOX_WORKER', 'thread') != 'thread':
+        return
+
+    @app.before_request
+    def start_outbox_worker():
+        global _worker
+        if _worker is None:
+            with _worker_lock:
+                if _worker is None:
+                    _worker = OutboxWorker(current_app._get_current_object())
+                    _worker.start()
+
+
+outbox_cli = AppGroup('outbox', help='Manage the outgoing email queue.')
+
+
+@outbox_cli.command('worker')
+@click.option('--poll-interval', default=POLL_INTERVAL, show_default=True, help='Seconds between polls.')
+def worker_command(poll_interval):
+    """Run the email sender in the foreground."""
+    global _worker
+    _worker = OutboxWorker(current_app._get_current_object(), poll_interval=poll_interval)
+    click.echo('Email outbox worker started. Press Ctrl+C to stop.')
+    try:
+        _worker.run()
+    except KeyboardInterrupt:
+        _worker.sender.close()
+
+
+@outbox_cli.command('status')
+def status_command():
+    """Show queue depth by status."""
+    depth = queue_depth()
+    for status in ('queued', 'sending', 'sent', 'failed'):
+        click.echo(f'{status:<8} {depth.get(status, 0)}')
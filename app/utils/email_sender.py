@@ -1,171 +1,183 @@
 import os
-from datetime import datetime
-from flask import render_template_string
+from functools import lru_cache
 import smtplib
+import time
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from markupsafe import Markup
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
+# Templates are compiled once per process. Autoescaping covers every clinic
+# and patient field that ends up in the HTML part.
+_template_env = Environment(
+    loader=FileSystemLoader(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates', 'email')),
+    autoescape=select_autoescape(['html']),
+    trim_blocks=True,
+    lstrip_blocks=True
+)
+_LAYOUT_BODY_MARKER = '\x00EMAIL_BODY\x00'
+
+
+@lru_cache(maxsize=None)
+def _template(name):
+    return _template_env.get_template(name)
+
+
+def _clinic_fields(settings):
+    return (
+        settings.clinic_name or '',
+        settings.clinic_address or '',
+        settings.clinic_phone or '',
+        settings.clinic_email or '',
+    )
+
+
+@lru_cache(maxsize=32)
+def _layout_parts(clinic_fields):
+    """Pre-render the clinic layout (CSS, header, contact block, footer) around the body.
+
+    Keyed on the clinic fields, so a settings change produces a new entry.
+    """
+    clinic_name, clinic_address, clinic_phone, clinic_email = clinic_fields
+    html = _template('appointment_layout.html').render(
+        clinic_name=clinic_name,
+        clinic_address=clinic_address,
+        clinic_phone=clinic_phone,
+        clinic_email=clinic_email,
+        body=Markup(_LAYOUT_BODY_MARKER)
+    )
+    prefix, suffix = html.split(_LAYOUT_BODY_MARKER)
+    return prefix, suffix
+
+
+def _appointment_context(appointments, patient, settings, intro):
+    clinic_name, clinic_address, clinic_phone, clinic_email = _clinic_fields(settings)
+    return {
+        'first_name': patient.first_name,
+        'intro': intro,
+        'appointments': [{
+            'date': appointment.date.strftime('%B %d, %Y'),   # e.g., December 8, 2024
+            'time': appointment.time.strftime('%I:%M %p'),    # e.g., 02:30 PM
+            'treatment': appointment.treatment_type,
+            'duration': appointment.duration,
+        } for appointment in appointments],
+        'clinic_name': clinic_name,
+        'clinic_address': clinic_address,
+        'clinic_phone': clinic_phone,
+        'clinic_email': clinic_email,
+    }
+
+
+def render_appointment_email(appointments, patient, settings, intro):
+    """Render (html, text) for an appointment email.
+
+    Only the greeting and appointment details are rendered per message; the
+    rest of the HTML comes from the cached clinic layout.
+    """
+    context = _appointment_context(appointments, patient, settings, intro)
+    prefix, suffix = _layout_parts(_clinic_fields(settings))
+    html_content = prefix + _template('appointment_body.html').render(context) + suffix
+    text_content = _template('appointment.txt').render(context)
+    return html_content, text_content
+
+
+CONFIRMATION_INTRO = "Your dental appointment has been confirmed. Here are your appointment details:"
+
 def get_appointment_email_template(appointment, patient, settings):
-    """Generate a modern and attractive HTML email template for appointment confirmation."""
-    appointment_date = appointment.date.strftime('%B %d, %Y')  # e.g., December 8, 2024
-    appointment_time = appointment.time.strftime('%I:%M %p')   # e.g., 02:30 PM
-    
-    html_content = f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <style>
-            body {{
-                font-family: 'Helvetica Neue', Arial, sans-serif;
-                line-height: 1.6;
-                color: #333333;
-                margin: 0;
-                padding: 0;
-            }}
-            .container {{
-                max-width: 600px;
-                margin: 0 auto;
-                padding: 40px 20px;
-            }}
-            .header {{
-                text-align: center;
-                padding-bottom: 30px;
-                border-bottom: 2px solid #f0f0f0;
-                margin-bottom: 30px;
-            }}
-            .clinic-name {{
-                color: #2563eb;
-                font-size: 28px;
-                font-weight: 700;
-                margin: 0;
-            }}
-            .confirmation-box {{
-                background-color: #f8fafc;
-                border-radius: 12px;
-                padding: 30px;
-                margin: 25px 0;
-                border: 1px solid #e2e8f0;
-            }}
-            .appointment-details {{
-                margin: 20px 0;
-            }}
-            .detail-row {{
-                display: block;
-                margin: 12px 0;
-            }}
-            .label {{
-                color: #64748b;
-                font-size: 14px;
-                font-weight: 500;
-            }}
-            .value {{
-                color: #1e293b;
-                font-size: 16px;
-                font-weight: 600;
-            }}
-            .footer {{
-                text-align: center;
-                color: #64748b;
-                font-size: 14px;
-                margin-top: 40px;
-                padding-top: 20px;
-                border-top: 1px solid #f0f0f0;
-            }}
-            .contact-info {{
-                margin-top: 25px;
-                text-align: center;
-            }}
-            .contact-info p {{
-                margin: 5px 0;
-                color: #64748b;
-                font-size: 14px;
-            }}
-            .highlight {{
-                color: #2563eb;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="container">
-            <div class="header">
-                <h1 class="clinic-name">{settings.clinic_name}</h1>
-            </div>
-            
-            <p>Dear {patient.first_name},</p>
-            
-            <p>Your dental appointment has been confirmed. Here are your appointment details:</p>
-            
-            <div class="confirmation-box">
-                <div class="appointment-details">
-                    <div class="detail-row">
-                        <span class="label">Date:</span><br>
-                        <span class="value">{appointment_date}</span>
-                    </div>
-                    <div class="detail-row">
-                        <span class="label">Time:</span><br>
-                        <span class="value">{appointment_time}</span>
-                    </div>
-                    <div class="detail-row">
-                        <span class="label">Treatment:</span><br>
-                        <span class="value">{appointment.treatment_type}</span>
-                    </div>
-                    <div class="detail-row">
-                        <span class="label">Duration:</span><br>
-                        <span class="value">{appointment.duration} minutes</span>
-                    </div>
-                </div>
-            </div>
-
-            <p>Please arrive <span class="highlight">10 minutes</span> before your appointment time. If you need to reschedule or cancel, please contact us at least 24 hours in advance.</p>
-            
-            <div class="contact-info">
-                <p>{settings.clinic_address}</p>
-                <p>Phone: {settings.clinic_phone}</p>
-                <p>Email: {settings.clinic_email}</p>
-            </div>
-            
-            <div class="footer">
-                <p>Thank you for choosing {settings.clinic_name}!</p>
-                <p>This is an automated message, please do not reply to this email.</p>
-            </div>
-        </div>
-    </body>
-    </html>
+    """Generate the HTML email for an appointment confirmation."""
+    return render_appointment_email([appointment], patient, settings, CONFIRMATION_INTRO)[0]
+
+def render_appointment_reminder(appointments, patient, settings):
+    """(html, text) reminder covering all of a patient's appointments on the same day."""
+    if len(appointments) == 1:
+        intro = "This is a friendly reminder of your dental appointment tomorrow:"
+    else:
+        intro = "This is a friendly reminder of your dental appointments tomorrow:"
+    return render_appointment_email(appointments, patient, settings, intro)
+
+def get_smtp_config():
+    """SMTP settings from the environment. Defaults to Gmail over SSL.
+
+    SMTP_HOST, SMTP_PORT and SMTP_USE_SSL can point the sender at another
+    server, e.g. a local SMTP sink during development.
     """
+    return {
+        'host': os.getenv('SMTP_HOST', 'smtp.gmail.com'),
+        'port': int(os.getenv('SMTP_PORT', '465')),
+        'use_ssl': os.getenv('SMTP_USE_SSL', 'true').lower() in ('1', 'true', 'yes'),
+        'user': os.getenv('GMAIL_USER'),
+        'password': os.getenv('GMAIL_APP_PASSWORD'),
+    }
+
+def open_smtp_connection(config=None, timeout=30):
+    """Open and authenticate an SMTP connection that can send many messages."""
+    config = config or get_smtp_config()
+    smtp_class = smtplib.SMTP_SSL if config['use_ssl'] else smtplib.SMTP
+    smtp = smtp_class(config['host'], config['port'], timeout=timeout)
+    if config['user'] and config['password']:
+        smtp.login(config['user'], config['password'])
+    return smtp
+
+def build_message(sender, recipient, subject, html_content, text_content=None):
+    """Create a MIME message with an optional plain-text alternative."""
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = subject
+    msg['From'] = sender
+    msg['To'] = recipient
+    msg['Reply-To'] = sender
     
-    return html_content
+    # Plain text first so clients prefer the HTML part when they can show it
+    if text_content:
+        msg.attach(MIMEText(text_content, 'plain'))
+    msg.attach(MIMEText(html_content, 'html'))
+    return msg
+
+def get_appointment_email_subject(settings):
+    return f"Appointment Confirmation - {settings.clinic_name}"
+
+def queue_appointment_email(appointment, patient, settings):
+    """Add an appointment confirmation to the email outbox.
+
+    The background sender delivers it; the caller is responsible for
+    committing the session.
+    """
+    from app.utils.email_outbox import enqueue_email
+    html_content, text_content = render_appointment_email([appointment], patient, settings, CONFIRMATION_INTRO)
+    return enqueue_email(
+        recipient=patient.email,
+        subject=get_appointment_email_subject(settings),
+        html_body=html_content,
+        text_body=text_content,
+        category='appointment_confirmation',
+        appointment_id=appointment.id
+    )
 
 def send_appointment_email(appointment, patient, settings):
-    """Send appointment confirmation email using Gmail SMTP"""
+    """Send appointment confirmation email immediately over its own SMTP connection.
+
+    Request handlers should use queue_appointment_email instead.
+    """
+    from app.utils.metrics import EMAIL_CONNECTIONS, EMAIL_SEND_LATENCY, EMAIL_SENDS
     try:
-        # Get Gmail credentials from environment variables
-        gmail_user = os.getenv('GMAIL_USER')
-        gmail_password = os.getenv('GMAIL_APP_PASSWORD')
+        config = get_smtp_config()
         
-        if not gmail_user or not gmail_password:
+        if not config['user'] or not config['password']:
             return False, "Gmail credentials not configured. Please set GMAIL_USER and GMAIL_APP_PASSWORD in .env file"
         
         # Prepare email content
-        html_content = get_appointment_email_template(appointment, patient, settings)
-        
-        # Create message
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = f"Appointment Confirmation - {settings.clinic_name}"
-        msg['From'] = gmail_user
-        msg['To'] = patient.email
-        msg['Reply-To'] = gmail_user
-        
-        # Attach HTML content
-        msg.attach(MIMEText(html_content, 'html'))
+        html_content, text_content = render_appointment_email([appointment], patient, settings, CONFIRMATION_INTRO)
+        msg = build_message(config['user'], patient.email, get_appointment_email_subject(settings),
+                            html_content, text_content)
         
-        # Send email using Gmail SMTP
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465) as smtp:
-            smtp.login(gmail_user, gmail_password)
+        start = time.perf_counter()
+        with open_smtp_connection(config) as smtp:
+            EMAIL_CONNECTIONS.inc()
             smtp.send_message(msg)
+        EMAIL_SEND_LATENCY.observe(time.perf_counter() - start)
+        EMAIL_SENDS.labels('sent').inc()
             
         return True, "Email sent successfully"
         
     except Exception as e:
+        EMAIL_SENDS.labels('failed').inc()
         return False, str(e)
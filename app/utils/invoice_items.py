@@ -0,0 +1,150 @@
+import click
+from flask.cli import AppGroup
+from sqlalchemy import event, func, inspect, select, text
+from app import db
+from app.models.invoice import Invoice
+from app.models.invoice_item import InvoiceItem
+
+# Invoice.items (JSON) is what the invoice pages read and write; invoice_item
+# holds the same lines as rows so reports can aggregate them in SQL. The
+# listeners below rewrite an invoice's rows in the flush that changes its
+# items. Core inserts (the seeder, migrations) bypass them and write the rows
+# themselves.
+REBUILD_CHUNK_SIZE = 5000
+
+_INSERT_COLUMNS = 'invoice_id, position, description, quantity, unit_price, total, treatment_code'
+
+# One row per element of invoice.items for invoices with low <= id < high
+# that have no rows yet, expanded by the database's JSON functions. The
+# backfill migration keeps its own copy of these statements.
+EXPAND_ITEMS_SQL = {
+    'sqlite': (
+        f"INSERT INTO invoice_item ({_INSERT_COLUMNS}) "
+        "SELECT invoice.id, item.key, "
+        "coalesce(json_extract(item.value, '$.description'), ''), "
+        "coalesce(CAST(json_extract(item.value, '$.quantity') AS INTEGER), 1), "
+        "coalesce(CAST(json_extract(item.value, '$.unit_price') AS REAL), 0), "
+        "coalesce(CAST(json_extract(item.value, '$.total') AS REAL), "
+        "coalesce(CAST(json_extract(item.value, '$.quantity') AS INTEGER), 1) "
+        "* coalesce(CAST(json_extract(item.value, '$.unit_price') AS REAL), 0)), "
+        "json_extract(item.value, '$.treatment_code') "
+        "FROM invoice, json_each(CASE WHEN json_valid(invoice.items) THEN invoice.items END) AS item "
+        "WHERE invoice.id >= :low AND invoice.id < :high "
+        "AND typeof(item.key) = 'integer' AND item.type = 'object' "
+        "AND NOT EXISTS (SELECT 1 FROM invoice_item WHERE invoice_item.invoice_id = invoice.id) "
+        "ORDER BY invoice.id, item.key"
+    ),
+    'postgresql': (
+        f"INSERT INTO invoice_item ({_INSERT_COLUMNS}) "
+        "SELECT invoice.id, item.ordinality - 1, "
+        "coalesce(item.value->>'description', ''), "
+        "coalesce((item.value->>'quantity')::numeric::integer, 1), "
+        "coalesce((item.value->>'unit_price')::float, 0), "
+        "coalesce((item.value->>'total')::float, "
+        "coalesce((item.value->>'quantity')::numeric::integer, 1) * coalesce((item.value->>'unit_price')::float, 0)), "
+        "item.value->>'treatment_code' "
+        "FROM invoice CROSS JOIN LATERAL json_array_elements("
+        "CASE WHEN json_typeof(invoice.items::json) = 'array' THEN invoice.items::json END"
+        ") WITH ORDINALITY AS item(value, ordinality) "
+        "WHERE invoice.id >= :low AND invoice.id < :high "
+        "AND json_typeof(item.value) = 'object' "
+        "AND NOT EXISTS (SELECT 1 FROM invoice_item WHERE invoice_item.invoice_id = invoice.id) "
+        "ORDER BY invoice.id, item.ordinality"
+    ),
+}
+
+
+def _number(value, cast, default):
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def item_rows(invoice_id, items):
+    """invoice_item rows for an Invoice.items list, as the listeners write them."""
+    rows = []
+    if not isinstance(items, list):
+        return rows
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            continue
+        quantity = _number(item.get('quantity'), int, 1)
+        unit_price = _number(item.get('unit_price'), float, 0.0)
+        rows.append({
+            'invoice_id': invoice_id,
+            'position': position,
+            'description': item.get('description') or '',
+            'quantity': quantity,
+            'unit_price': unit_price,
+            'total': _number(item.get('total'), float, quantity * unit_price),
+            'treatment_code': item.get('treatment_code'),
+        })
+    return rows
+
+
+def _delete_items(connection, invoice_id):
+    connection.execute(InvoiceItem.__table__.delete().where(InvoiceItem.invoice_id == invoice_id))
+
+
+def _insert_items(connection, target):
+    rows = item_rows(target.id, target.items)
+    if rows:
+        connection.execute(InvoiceItem.__table__.insert(), rows)
+
+
+@event.listens_for(Invoice, 'after_insert')
+def _after_insert(mapper, connection, target):
+    _insert_items(connection, target)
+
+
+@event.listens_for(Invoice, 'after_update')
+def _after_update(mapper, connection, target):
+    if inspect(target).attrs['items'].history.has_changes():
+        _delete_items(connection, target.id)
+        _insert_items(connection, target)
+
+
+@event.listens_for(Invoice, 'after_delete')
+def _after_delete(mapper, connection, target):
+    _delete_items(connection, target.id)
+
+
+def expand_items(connection, low, high):
+    """Fill invoice_item from Invoice.items for invoices with ids in [low, high)."""
+    return connection.execute(text(EXPAND_ITEMS_SQL[connection.dialect.name]),
+                              {'low': low, 'high': high}).rowcount
+
+
+def rebuild_items(chunk_size=REBUILD_CHUNK_SIZE):
+    """Rewrite every invoice_item row from Invoice.items; returns the row count.
+
+    Runs one short transaction per ``chunk_size`` invoices, so the invoice
+    pages stay writable meanwhile. Invoices saved during the rebuild get
+    their rows from the listeners.
+    """
+    engine = db.engine
+    with engine.connect() as connection:
+        last_id = connection.execute(select(func.max(Invoice.id))).scalar() or 0
+    count = 0
+    for low in range(1, last_id + 1, chunk_size):
+        high = low + chunk_size
+        with engine.begin() as connection:
+            connection.execute(InvoiceItem.__table__.delete().where(
+                InvoiceItem.invoice_id >= low, InvoiceItem.invoice_id < high))
+            count += expand_items(connection, low, high)
+    return count
+
+
+invoice_items_cli = AppGroup('invoice-items', help='Manage the invoice_item rows mirrored from invoices.')
+
+
+@invoice_items_cli.command('rebuild')
+@click.option('--chunk-size', type=int, default=REBUILD_CHUNK_SIZE, show_default=True,
+              help='Invoices per transaction.')
+def rebuild_command(chunk_size):
+    """Rewrite invoice_item from the invoices' JSON items."""
+    if db.engine.dialect.name not in EXPAND_ITEMS_SQL:
+        raise click.ClickException(f'Rebuilding invoice items is not supported on {db.engine.dialect.name}.')
+    count = rebuild_items(chunk_size)
+    click.echo(f'Wrote {count} invoice items')
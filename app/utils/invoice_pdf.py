@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import time
+from functools import lru_cache
+from xml.sax.saxutils import escape
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+from app.utils.metrics import INVOICE_PDF_RENDER
+from app.utils.report_cache import get_invoice_pdf_cache
+
+PAGE_WIDTH, PAGE_HEIGHT = letter
+MARGIN = 36
+LETTERHEAD_HEIGHT = 90
+FOOTER_HEIGHT = 30
+BRAND_COLOR = '#FF7F11'
+DEFAULT_FOOTER = 'Thank you for choosing our dental clinic!'
+
+
+class InvoiceLayout:
+    """Everything on an invoice that depends only on the clinic settings.
+
+    Built once per settings version and shared by every render: the
+    letterhead lines, footer text, paragraph and table styles.
+    """
+
+    def __init__(self, clinic_name, address, phone, email, footer, currency_symbol):
+        self.currency_symbol = currency_symbol or '$'
+        self.footer = footer or DEFAULT_FOOTER
+        self.letterhead = self._letterhead(clinic_name or 'Dental Clinic', address, phone, email)
+        base = getSampleStyleSheet()
+        self.styles = {
+            'title': ParagraphStyle('InvoiceTitle', parent=base['Heading1'], fontSize=20,
+                                    textColor=colors.HexColor('#333333'), spaceAfter=4),
+            'heading': ParagraphStyle('InvoiceHeading', parent=base['Heading3'], fontSize=11,
+                                      textColor=colors.HexColor('#666666'), spaceBefore=10, spaceAfter=4),
+            'body': ParagraphStyle('InvoiceBody', parent=base['Normal'], fontSize=10, leading=14,
+                                   textColor=colors.HexColor('#333333')),
+            'cell': ParagraphStyle('InvoiceCell', parent=base['Normal'], fontSize=10, leading=12),
+        }
+        self.items_style = TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(BRAND_COLOR)),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('LINEBELOW', (0, 1), (-1, -1), 0.25, colors.HexColor('#DDDDDD')),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+        ])
+        self.totals_style = TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('LINEABOVE', (0, -1), (-1, -1), 0.75, colors.HexColor('#333333')),
+        ])
+
+    @staticmethod
+    def _letterhead(name, address, phone, email):
+        details = [line.strip() for line in (address or '').splitlines() if line.strip()]
+        if phone:
+            details.append(f'Phone: {phone}')
+        if email:
+            details.append(f'Email: {email}')
+        return name, details[:4]
+
+    def money(self, amount):
+        return f'{self.currency_symbol}{amount or 0:,.2f}'
+
+    def draw_page(self, canvas, doc):
+        # Drawn with plain canvas calls: a shared reportlab Drawing is not
+        # safe to render from several threads at once.
+        name, details = self.letterhead
+        top = PAGE_HEIGHT - MARGIN
+        canvas.saveState()
+        canvas.setFont('Helvetica-Bold', 22)
+        canvas.setFillColor(colors.HexColor(BRAND_COLOR))
+        canvas.drawString(MARGIN, top - 24, name)
+        canvas.setFont('Helvetica', 9)
+        canvas.setFillColor(colors.HexColor('#666666'))
+        for i, line in enumerate(details):
+            canvas.drawString(MARGIN, top - 42 - i * 12, line)
+        canvas.setStrokeColor(colors.HexColor(BRAND_COLOR))
+        canvas.setLineWidth(2)
+        canvas.line(MARGIN, top - LETTERHEAD_HEIGHT + 2, PAGE_WIDTH - MARGIN, top - LETTERHEAD_HEIGHT + 2)
+        canvas.drawCentredString(PAGE_WIDTH / 2, MARGIN, self.footer)
+        canvas.drawRightString(PAGE_WIDTH - MARGIN, MARGIN, f'Page {doc.page}')
+        canvas.restoreState()
+
+
+@lru_cache(maxsize=4)
+def _layout(version, clinic_name, address, phone, email, footer, currency_symbol):
+    return InvoiceLayout(clinic_name, address, phone, email, footer, currency_symbol)
+
+
+def layout_fields(settings):
+    """InvoiceLayout arguments from the settings, as plain values that pickle."""
+    return (settings.clinic_name, settings.clinic_address, settings.clinic_phone, settings.clinic_email,
+            settings.invoice_footer, settings.currency_symbol)
+
+
+def invoice_layout(settings):
+    """The shared layout for the current settings version."""
+    return _layout(settings.version, *layout_fields(settings))
+
+
+def invoice_revision(invoice, settings):
+    """Hash of everything printed on the invoice; changes whenever the PDF would.
+
+    Used as the cache key and the HTTP ETag, so it only needs the invoice
+    row and its patient, not a render.
+    """
+    patient = invoice.patient
+    payload = {
+        'invoice': [invoice.id, invoice.date, invoice.due_date, invoice.status, invoice.items,
+                    invoice.subtotal, invoice.tax_rate, invoice.tax_amount, invoice.total_amount,
+                    invoice.paid_amount, invoice.notes],
+        'patient': [patient.first_name, patient.last_name, patient.address, patient.phone, patient.email],
+        'settings_version': settings.version,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def text_paragraph(text, style):
+    """A Paragraph of plain ``text``: markup escaped, newlines kept as line breaks."""
+    return Paragraph(escape(str(text or '')).replace('\n', '<br/>'), style)
+
+
+def render_invoice(output, invoice, layout):
+    """Lay out ``invoice`` on the clinic letterhead into ``output`` (path or file)."""
+    styles = layout.styles
+    doc = SimpleDocTemplate(output, pagesize=letter, leftMargin=MARGIN, rightMargin=MARGIN,
+                            topMargin=MARGIN + LETTERHEAD_HEIGHT + 12, bottomMargin=MARGIN + FOOTER_HEIGHT,
+                            title=f'Invoice {invoice.invoice_number}')
+    width = PAGE_WIDTH - 2 * MARGIN
+    patient = invoice.patient
+
+    bill_to = [f'{patient.first_name} {patient.last_name}']
+    bill_to += [line for line in (patient.address, patient.phone and f'Phone: {patient.phone}',
+                                  patient.email and f'Email: {patient.email}') if line]
+    details = [
+        f'Invoice #{invoice.id}',
+        f"Date: {invoice.date.strftime('%B %d, %Y')}",
+        f"Due Date: {invoice.due_date.strftime('%B %d, %Y')}",
+        f"Status: {(invoice.status or '').replace('_', ' ').title()}",
+    ]
+    header = Table([[
+        [Paragraph('Bill To', styles['heading'])] + [text_paragraph(line, styles['body']) for line in bill_to],
+        [Paragraph(invoice.invoice_number, styles['title'])] + [text_paragraph(line, styles['body']) for line in details],
+    ]], colWidths=[width / 2, width / 2])
+    header.setStyle(TableStyle([('VALIGN', (0, 0), (-1, -1), 'TOP'), ('LEFTPADDING', (0, 0), (-1, -1), 0)]))
+
+    rows = [['Description', 'Quantity', 'Unit Price', 'Total']]
+    for item in invoice.items or []:
+        rows.append([text_paragraph(item.get('description'), styles['cell']), str(item.get('quantity', '')),
+                     layout.money(item.get('unit_price')), layout.money(item.get('total'))])
+    items = Table(rows, colWidths=[width - 270, 70, 100, 100], repeatRows=1)
+    items.setStyle(layout.items_style)
+
+    totals_rows = [['Subtotal', layout.money(invoice.subtotal)],
+                   [f'Tax ({invoice.tax_rate or 0:.1f}%)', layout.money(invoice.tax_amount)]]
+    if invoice.paid_amount:
+        totals_rows += [['Total Amount', layout.money(invoice.total_amount)],
+                        ['Paid Amount', layout.money(invoice.paid_amount)],
+                        ['Balance Due', layout.money(invoice.total_amount - invoice.paid_amount)]]
+    else:
+        totals_rows.append(['Total Amount', layout.money(invoice.total_amount)])
+    totals = Table(totals_rows, colWidths=[width - 100, 100])
+    totals.setStyle(layout.totals_style)
+
+    elements = [header, Spacer(1, 18), items, Spacer(1, 12), totals]
+    if invoice.notes:
+        elements += [Spacer(1, 18), Paragraph('Notes', styles['heading']), text_paragraph(invoice.notes, styles['body'])]
+    doc.build(elements, onFirstPage=layout.draw_page, onLaterPages=layout.draw_page)
+
+
+def invoice_pdf_path(invoice, settings, revision=None, app=None):
+    """Path of the cached PDF for this revision of ``invoice``, rendering it on a miss."""
+    started = time.perf_counter()
+    revision = revision or invoice_revision(invoice, settings)
+    cache = get_invoice_pdf_cache(app)
+    key = f'invoice-{invoice.id}-{revision}'
+    cached = cache.get(key)
+    if cached is not None:
+        INVOICE_PDF_RENDER.labels('hit').observe(time.perf_counter() - started)
+        return cached
+
+    temp = cache.temp_path()
+    try:
+        render_invoice(temp, invoice, invoice_layout(settings))
+        path = cache.put(key, temp)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+    cache.evict()
+    INVOICE_PDF_RENDER.labels('miss').observe(time.perf_counter() - started)
+    return path
@@ -0,0 +1,61 @@
+from sqlalchemy import func
+from sqlalchemy.orm import configure_mappers, contains_eager, joinedload, selectinload
+from app import db
+from app.models.appointment import Appointment
+from app.models.invoice import Invoice
+from app.models.patient import Patient
+from app.models.prescription import Prescription
+
+# The patient backrefs only exist once the mappers are configured
+configure_mappers()
+
+# Loader options per view. Every relationship a template touches is loaded
+# up front, so a page costs the same number of queries whatever its size.
+# List queries already join Patient for search and ordering, so the patient
+# is filled from that join rather than a second one.
+APPOINTMENT_LIST = (contains_eager(Appointment.patient),)
+INVOICE_LIST = (contains_eager(Invoice.patient),)
+PRESCRIPTION_LIST = (contains_eager(Prescription.patient), selectinload(Prescription.medications))
+INVOICE_DETAIL = (joinedload(Invoice.patient),)
+PRESCRIPTION_DETAIL = (joinedload(Prescription.patient), selectinload(Prescription.medications))
+APPOINTMENT_DETAIL = (joinedload(Appointment.patient),)
+
+PATIENT_HISTORY_LIMIT = 20
+
+
+def get_or_404(model, id, options=()):
+    """``Model.query.get_or_404`` with loader options applied."""
+    return db.first_or_404(db.select(model).options(*options).filter(model.id == id))
+
+
+def patient_history(patient, limit=PATIENT_HISTORY_LIMIT):
+    """A patient's most recent appointments and prescriptions, newest first.
+
+    Ordered and limited in SQL instead of sorting the whole collection in
+    the template, with totals from count subqueries. Returns a dict with
+    ``appointments``, ``prescriptions`` (medications preloaded) and their
+    ``*_count`` totals.
+    """
+    appointments = Appointment.query\
+        .filter(Appointment.patient_id == patient.id)\
+        .order_by(Appointment.date.desc(), Appointment.time.desc(), Appointment.id.desc())\
+        .limit(limit)\
+        .all()
+    prescriptions = Prescription.query\
+        .options(selectinload(Prescription.medications))\
+        .filter(Prescription.patient_id == patient.id)\
+        .order_by(Prescription.date.desc(), Prescription.id.desc())\
+        .limit(limit)\
+        .all()
+    counts = db.session.query(
+        db.session.query(func.count(Appointment.id))
+            .filter(Appointment.patient_id == patient.id).scalar_subquery(),
+        db.session.query(func.count(Prescription.id))
+            .filter(Prescription.patient_id == patient.id).scalar_subquery(),
+    ).one()
+    return {
+        'appointments': appointments,
+        'appointment_count': counts[0],
+        'prescriptions': prescriptions,
+        'prescription_count': counts[1],
+    }
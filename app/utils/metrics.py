@@ -0,0 +1,170 @@
+import hmac
+import os
+import sqlite3
+import time
+from flask import g, request, request_finished, request_started
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+from app import db
+
+# With PROMETHEUS_MULTIPROC_DIR set (gunicorn.conf.py does this), every
+# process writes its samples to memory-mapped files in that directory and
+# /metrics sums them, so any gunicorn worker or report process can answer a
+# scrape for all of them. Without it, /metrics reports this process only.
+MULTIPROCESS = 'PROMETHEUS_MULTIPROC_DIR' in os.environ
+
+REPORT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+HTTP_REQUESTS = Counter(
+    'http_requests_total', 'HTTP responses by endpoint and status code',
+    ['endpoint', 'method', 'status'])
+HTTP_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time spent handling a request',
+    ['endpoint', 'method'])
+
+DB_CHECKOUTS = Counter(
+    'db_pool_checkouts_total', 'Connections checked out of the SQLAlchemy pool')
+DB_CONNECTIONS_OPENED = Counter(
+    'db_pool_connections_opened_total', 'New DBAPI connections opened by the pool')
+DB_CHECKED_OUT = Gauge(
+    'db_pool_checked_out', 'Connections currently checked out of the pool',
+    multiprocess_mode='livesum')
+DB_HOLD_TIME = Histogram(
+    'db_pool_checkout_duration_seconds', 'Time a connection stays checked out before it is returned')
+DB_CHECKOUT_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds', 'Time spent waiting for the pool to hand out a connection',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30))
+DB_POOL_IDLE = Gauge(
+    'db_pool_idle', 'Open connections waiting in the pool',
+    multiprocess_mode='livesum')
+DB_POOL_OVERFLOW = Gauge(
+    'db_pool_overflow', 'Connections open beyond the pool size',
+    multiprocess_mode='livesum')
+DB_POOL_SIZE = Gauge(
+    'db_pool_size', 'Configured pool size',
+    multiprocess_mode='livesum')
+SQLITE_BUSY = Counter(
+    'db_sqlite_busy_total', "SQLite 'database is locked' / busy errors",
+    ['outcome'])
+
+REPORT_RENDER = Histogram(
+    'report_render_duration_seconds', 'Time to produce a clinic report PDF',
+    ['cache'], buckets=REPORT_BUCKETS)
+REPORT_JOBS = Counter(
+    'report_jobs_total', 'Finished report jobs by outcome',
+    ['status'])
+INVOICE_PDF_RENDER = Histogram(
+    'invoice_pdf_duration_seconds', 'Time to produce an invoice PDF',
+    ['cache'], buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5))
+
+EMAIL_SENDS = Counter(
+    'email_send_total', 'Email delivery attempts by outcome',
+    ['outcome'])
+EMAIL_SEND_LATENCY = Histogram(
+    'email_send_duration_seconds', 'SMTP time to send one message')
+EMAIL_CONNECTIONS = Counter(
+    'email_smtp_connections_total', 'SMTP connections opened')
+
+INVOICES_MARKED_OVERDUE = Counter(
+    'invoices_marked_overdue_total', 'Invoices moved to overdue by the sweeper')
+
+
+def _start_timer(sender, **extra):
+    g.metrics_start = time.perf_counter()
+
+
+def _observe_request(sender, response, **extra):
+    start = g.pop('metrics_start', None)
+    if start is None:
+        return
+    endpoint = request.endpoint or 'unmatched'
+    HTTP_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - start)
+    HTTP_REQUESTS.labels(endpoint, request.method, response.status_code).inc()
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    connection_record.info['metrics_checkout'] = time.perf_counter()
+    DB_CHECKOUTS.inc()
+    DB_CHECKED_OUT.inc()
+
+
+def _on_checkin(dbapi_connection, connection_record):
+    start = connection_record.info.pop('metrics_checkout', None)
+    if start is not None:
+        DB_HOLD_TIME.observe(time.perf_counter() - start)
+        DB_CHECKED_OUT.dec()
+
+
+def _on_connect(dbapi_connection, connection_record):
+    DB_CONNECTIONS_OPENED.inc()
+
+
+def _watch_pool(engine):
+    def record_pool_state(*args):
+        pool = engine.pool  # replaced on dispose(), so looked up each time
+        if isinstance(pool, QueuePool):
+            DB_POOL_IDLE.set(pool.checkedin())
+            DB_POOL_OVERFLOW.set(max(pool.overflow(), 0))
+            DB_POOL_SIZE.set(pool.size())
+    event.listen(engine, 'checkout', record_pool_state)
+    event.listen(engine, 'checkin', record_pool_state)
+
+
+def is_sqlite_busy(error):
+    message = str(error).lower()
+    return isinstance(error, sqlite3.OperationalError) and ('locked' in message or 'busy' in message)
+
+
+def _on_error(context):
+    if is_sqlite_busy(context.original_exception):
+        SQLITE_BUSY.labels('error').inc()
+
+
+class OutboxCollector:
+    """Queue depth read from the database when /metrics is scraped."""
+
+    def collect(self):
+        from app.utils.email_outbox import queue_depth
+        depth = queue_depth()
+        family = GaugeMetricFamily('email_outbox_messages', 'Outbox messages by status', labels=['status'])
+        for status in ('queued', 'sending', 'sent', 'failed'):
+            family.add_metric([status], depth.get(status, 0))
+        yield family
+
+
+def render_metrics():
+    """Text exposition of every metric, across processes when MULTIPROCESS."""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    outbox = CollectorRegistry()
+    outbox.register(OutboxCollector())
+    return generate_latest(registry) + generate_latest(outbox)
+
+
+def authorized(app):
+    """Whether the request carries 'Authorization: Bearer <METRICS_TOKEN>'."""
+    token = app.config.get('METRICS_TOKEN')
+    if not token:
+        return False
+    return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+
+def init_metrics(app):
+    """Record request, pool and SQLite metrics and serve them at /metrics.
+
+    Must be called inside an app context.
+    """
+    event.listen(db.engine, 'checkout', _on_checkout)
+    event.listen(db.engine, 'checkin', _on_checkin)
+    event.listen(db.engine, 'connect', _on_connect)
+    event.listen(db.engine, 'handle_error', _on_error)
+    _watch_pool(db.engine)
+    request_started.connect(_start_timer, app)
+    request_finished.connect(_observe_request, app)
+    from app.routes import metrics
+    app.register_blueprint(metrics.bp)
@@ -1,5 +1,28 @@
+import base64
+import json
+from datetime import date, datetime, time
 from flask import request
-from sqlalchemy import or_
+from sqlalchemy import and_, or_, func
+from sqlalchemy.sql import operators
+
+class KeysetPage:
+    """One page of keyset (seek) pagination results.
+
+    Unlike Flask-SQLAlchemy's Pagination this never runs an OFFSET query, so
+    the cost of a page does not depend on how deep into the results it is.
+    """
+    cursor_mode = True
+
+    def __init__(self, items, per_page, has_next, has_prev, next_cursor, prev_cursor,
+                 total=None, total_is_capped=False):
+        self.items = items
+        self.per_page = per_page
+        self.has_next = has_next
+        self.has_prev = has_prev
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+        self.total_is_capped = total_is_capped
 
 class PaginationHelper:
     def __init__(self, model, page=1, per_page=10):
@@ -15,6 +38,53 @@ class PaginationHelper:
             error_out=False
         )
 
+    def paginate_keyset(self, query, order_by, cursor=None, count='capped', count_cap=1000):
+        """Paginate a query by seeking past the last row of the previous page.
+
+        ``order_by`` is the full sort order as columns or ``.asc()``/``.desc()``
+        expressions over non-null columns and must end in a unique column
+        (usually the primary key).
+        ``cursor`` is an opaque token from a previous page. ``count`` is
+        ``'exact'``, ``'capped'`` (count at most ``count_cap`` rows) or None.
+        """
+        keys = [_sort_key(clause) for clause in order_by]
+        values, direction = _decode_cursor(cursor, keys)
+        backwards = direction == 'prev'
+
+        page_query = query
+        if values is not None:
+            page_query = page_query.filter(_seek_predicate(keys, values, backwards))
+        ordering = [
+            column.desc() if descending != backwards else column.asc()
+            for column, descending in keys
+        ]
+        rows = page_query.order_by(*ordering).limit(self.per_page + 1).all()
+
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        if backwards:
+            has_prev, has_next = has_more, values is not None
+        else:
+            has_prev, has_next = values is not None, has_more
+
+        next_cursor = _encode_cursor(keys, rows[-1], 'next') if rows and has_next else None
+        prev_cursor = _encode_cursor(keys, rows[0], 'prev') if rows and has_prev else None
+
+        total, total_is_capped = None, False
+        if count == 'exact':
+            total = query.order_by(None).count()
+        elif count == 'capped':
+            capped = query.order_by(None).with_entities(self.model.id).limit(count_cap + 1).subquery()
+            total = query.session.query(func.count()).select_from(capped).scalar()
+            if total > count_cap:
+                total, total_is_capped = count_cap, True
+
+        return KeysetPage(rows, self.per_page, has_next, has_prev, next_cursor, prev_cursor,
+                          total=total, total_is_capped=total_is_capped)
+
     @staticmethod
     def get_page_args():
         """Get pagination arguments from request."""
@@ -26,6 +96,11 @@ class PaginationHelper:
             per_page = 10
         return page, per_page
 
+    @staticmethod
+    def get_cursor_arg():
+        """Get the keyset pagination cursor from request."""
+        return request.args.get('cursor') or None
+
 class SearchHelper:
     @staticmethod
     def apply_search(query, model, search_term, search_fields):
@@ -69,3 +144,51 @@ def get_search_args():
             filters[field] = value
             
     return search_term, filters
+
+
+def _sort_key(clause):
+    """Split an ORDER BY clause into (column, descending)."""
+    modifier = getattr(clause, 'modifier', None)
+    if modifier is operators.desc_op:
+        return clause.element, True
+    if modifier is operators.asc_op:
+        return clause.element, False
+    return clause, False
+
+def _seek_predicate(keys, values, backwards):
+    """Rows strictly after ``values`` in sort order (before, if ``backwards``)."""
+    clauses = []
+    for i, (column, descending) in enumerate(keys):
+        after = column < values[i] if descending != backwards else column > values[i]
+        equal_prefix = [keys[j][0] == values[j] for j in range(i)]
+        clauses.append(and_(*equal_prefix, after))
+    return or_(*clauses)
+
+def _encode_cursor(keys, row, direction):
+    values = []
+    for column, _ in keys:
+        value = getattr(row, column.key)
+        if isinstance(value, (date, datetime, time)):
+            value = value.isoformat()
+        values.append(value)
+    payload = json.dumps({'v': values, 'd': direction}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def _decode_cursor(cursor, keys):
+    """Return (values, direction) for a cursor token, or (None, 'next') if invalid."""
+    if not cursor:
+        return None, 'next'
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        values, direction = payload['v'], payload['d']
+        if len(values) != len(keys) or direction not in ('next', 'prev'):
+            return None, 'next'
+        parsed = []
+        for (column, _), value in zip(keys, values):
+            python_type = column.type.python_type
+            if value is not None and python_type in (date, datetime, time):
+                value = python_type.fromisoformat(value)
+            parsed.append(value)
+        return parsed, direction
+    except (ValueError, TypeError, KeyError, NotImplementedError):
+        return None, 'next'
@@ -0,0 +1,94 @@
+import time
+from functools import lru_cache
+from sqlalchemy import and_, event, or_
+from sqlalchemy.orm import Session
+from app.models.patient import Patient, name_key
+
+# Typeahead results are cached per worker. Local writes clear the cache once
+# they commit; the TTL bounds how stale another worker's cache can be.
+CACHE_TTL = 30
+MAX_LIMIT = 25
+
+_generation = 0
+
+
+def _prefix(column, value):
+    """Prefix match on a name key column, written as a range so it can use its index."""
+    upper_bound = value[:-1] + chr(ord(value[-1]) + 1)
+    return and_(column >= value, column < upper_bound)
+
+
+@lru_cache(maxsize=512)
+def _lookup(term, limit, generation, ttl_bucket):
+    tokens = term.split()
+    if len(tokens) == 1:
+        # Both branches are range scans over the name key indexes
+        condition = or_(_prefix(Patient.last_name_key, tokens[0]),
+                        _prefix(Patient.first_name_key, tokens[0]))
+    else:
+        first, last = tokens[0], ' '.join(tokens[1:])
+        condition = or_(
+            and_(_prefix(Patient.last_name_key, last), _prefix(Patient.first_name_key, first)),
+            and_(_prefix(Patient.last_name_key, first), _prefix(Patient.first_name_key, last)),
+        )
+
+    rows = Patient.query\
+        .with_entities(Patient.id, Patient.first_name, Patient.last_name, Patient.date_of_birth)\
+        .filter(condition)\
+        .order_by(Patient.last_name, Patient.first_name, Patient.id)\
+        .limit(limit)\
+        .all()
+    return tuple(
+        (row.id, f"{row.first_name} {row.last_name}",
+         row.date_of_birth.isoformat() if row.date_of_birth else None)
+        for row in rows
+    )
+
+
+def lookup_patients(term, limit=10):
+    """Return up to ``limit`` patients whose first or last name starts with ``term``.
+
+    Each result is a dict with only id, name and date of birth, so the
+    clinical text columns are never loaded.
+    """
+    term = name_key(' '.join((term or '').split()))
+    if not term:
+        return []
+    limit = max(1, min(limit, MAX_LIMIT))
+    rows = _lookup(term, limit, _generation, int(time.time() // CACHE_TTL))
+    return [{'id': id, 'name': name, 'date_of_birth': dob} for id, name, dob in rows]
+
+
+def clear_cache():
+    global _generation
+    _generation += 1
+    _lookup.cache_clear()
+
+
+# Writes only mark the session during flush; the cache is cleared after
+# commit so a concurrent lookup cannot re-cache pre-commit rows.
+def _mark_dirty(mapper, connection, target):
+    Session.object_session(target).info['patient_lookup_stale'] = True
+
+
+def _mark_bulk_dirty(update_context):
+    if update_context.mapper.class_ is Patient:
+        update_context.session.info['patient_lookup_stale'] = True
+
+
+for _event in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Patient, _event, _mark_dirty)
+
+event.listen(Session, 'after_bulk_update', _mark_bulk_dirty)
+event.listen(Session, 'after_bulk_delete', _mark_bulk_dirty)
+
+
+@event.listens_for(Session, 'after_commit')
+def _clear_after_commit(session):
+    if session.info.pop('patient_lookup_stale', False):
+        clear_cache()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('patient_lookup_stale', None)
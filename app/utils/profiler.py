@@ -0,0 +1,162 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from flask import g, has_request_context, request, request_finished, request_started
+from sqlalchemy import event
+from app import db
+
+logger = logging.getLogger(__name__)
+
+HISTORY_SIZE = 50          # requests kept per endpoint for /debug/perf
+SLOWEST_STATEMENTS = 3
+N_PLUS_ONE_THRESHOLD = 5   # same statement this many times in one request looks like N+1
+STATEMENT_PREVIEW = 300
+
+_IN_LIST = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+_NUMBER = re.compile(r'\b\d+\b')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(statement):
+    """Normalise a statement so executions that differ only in parameters match."""
+    normalised = _WHITESPACE.sub(' ', statement).strip()
+    normalised = _IN_LIST.sub('(?...)', normalised)
+    normalised = _NUMBER.sub('N', normalised)
+    return hashlib.sha1(normalised.encode('utf-8')).hexdigest()[:12], normalised
+
+
+class RequestProfile:
+    """SQL statements executed while handling one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = []  # (statement, seconds)
+
+    def record(self, statement, duration):
+        self.statements.append((statement, duration))
+
+    def summary(self):
+        total = time.perf_counter() - self.started
+        db_time = sum(duration for _, duration in self.statements)
+        by_fingerprint = Counter()
+        samples = {}
+        for statement, _ in self.statements:
+            key, normalised = fingerprint(statement)
+            by_fingerprint[key] += 1
+            samples.setdefault(key, normalised)
+        slowest = sorted(self.statements, key=lambda item: item[1], reverse=True)[:SLOWEST_STATEMENTS]
+        return {
+            'endpoint': request.endpoint or request.path,
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(db_time * 1000, 2),
+            'queries': len(self.statements),
+            'slowest': [
+                {'ms': round(duration * 1000, 2), 'sql': _WHITESPACE.sub(' ', statement)[:STATEMENT_PREVIEW]}
+                for statement, duration in slowest
+            ],
+            'repeated': [
+                {'fingerprint': key, 'count': count, 'sql': samples[key][:STATEMENT_PREVIEW]}
+                for key, count in by_fingerprint.most_common() if count >= N_PLUS_ONE_THRESHOLD
+            ],
+        }
+
+
+class PerfHistory:
+    """Last HISTORY_SIZE request summaries per endpoint, for this process."""
+
+    def __init__(self, size=HISTORY_SIZE):
+        self._lock = threading.Lock()
+        self._by_endpoint = defaultdict(lambda: deque(maxlen=size))
+
+    def add(self, summary):
+        with self._lock:
+            self._by_endpoint[summary['endpoint']].append(summary)
+
+    def aggregate(self):
+        with self._lock:
+            snapshot = {endpoint: list(entries) for endpoint, entries in self._by_endpoint.items()}
+
+        rows = []
+        for endpoint, entries in snapshot.items():
+            totals = sorted(entry['total_ms'] for entry in entries)
+            repeated = Counter()
+            samples = {}
+            for entry in entries:
+                for item in entry['repeated']:
+                    repeated[item['fingerprint']] = max(repeated[item['fingerprint']], item['count'])
+                    samples[item['fingerprint']] = item['sql']
+            rows.append({
+                'endpoint': endpoint,
+                'requests': len(entries),
+                'avg_ms': sum(totals) / len(totals),
+                'p95_ms': totals[min(len(totals) - 1, int(len(totals) * 0.95))],
+                'avg_queries': sum(entry['queries'] for entry in entries) / len(entries),
+                'max_queries': max(entry['queries'] for entry in entries),
+                'avg_db_ms': sum(entry['db_ms'] for entry in entries) / len(entries),
+                'slowest': max((s for entry in entries for s in entry['slowest']),
+                               key=lambda s: s['ms'], default=None),
+                'repeated': [{'count': count, 'sql': samples[key]} for key, count in repeated.most_common(3)],
+            })
+        return sorted(rows, key=lambda row: row['avg_ms'], reverse=True)
+
+
+history = PerfHistory()
+
+
+# The start time lives on the execution context, which is discarded with the
+# statement, so a statement that raises leaves nothing behind on the connection.
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._profiler_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_profiler_start', None)
+    if start is None:
+        return
+    if has_request_context():
+        profile = g.get('sql_profile')
+        if profile is not None:
+            profile.record(statement, time.perf_counter() - start)
+
+
+def _start_profile(sender, **extra):
+    g.sql_profile = RequestProfile()
+
+
+def _finish_profile(sender, response, **extra):
+    profile = g.pop('sql_profile', None)
+    if profile is None:
+        return
+    summary = profile.summary()
+    response.headers['Server-Timing'] = (
+        f'db;dur={summary["db_ms"]};desc="{summary["queries"]} queries", '
+        f'app;dur={summary["total_ms"]}'
+    )
+    history.add(summary)
+    level = logging.WARNING if summary['repeated'] else logging.INFO
+    logger.log(level, 'request_profile ' + json.dumps(summary))
+
+
+def init_profiler(app):
+    """Hook SQL timing into every request when SQL_PROFILER is enabled.
+
+    Adds a Server-Timing header and a 'request_profile' JSON log line to each
+    response, and serves per-endpoint aggregates at /debug/perf for admins.
+    Must be called inside an app context.
+    """
+    if not app.config.get('SQL_PROFILER'):
+        return
+    event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+    request_started.connect(_start_profile, app)
+    request_finished.connect(_finish_profile, app)
+    from app.routes import debug
+    app.register_blueprint(debug.bp)
+
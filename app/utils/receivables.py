@@ -0,0 +1,330 @@
+import logging
+from datetime import date, timedelta
+import click
+from flask.cli import AppGroup
+from sqlalchemy import and_, case, event, false, func, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from app import db
+from app.models.patient import Patient
+from app.models.invoice import Invoice
+from app.models.receivable import ReceivableDay, PatientBalance
+from app.utils.metrics import INVOICES_MARKED_OVERDUE
+
+logger = logging.getLogger(__name__)
+
+# Accounts receivable ledger: receivable_day holds invoice totals per due
+# date and patient_balance the open amount per patient. Invoice mapper events
+# apply each insert, edit, status change and delete as a delta in the same
+# flush, so the ledger commits or rolls back with the invoice. Aging buckets
+# are derived from the due dates at read time, so nothing has to move when
+# the date changes. 'flask receivables reconcile' checks the ledger against
+# the invoices and repairs any drift.
+OPEN_STATUSES = ('unpaid', 'partially_paid', 'overdue')
+# Open statuses the overdue sweeper moves to 'overdue' once the due date has passed
+SWEPT_STATUSES = ('unpaid', 'partially_paid')
+TRACKED_COLUMNS = ('patient_id', 'due_date', 'status', 'total_amount', 'paid_amount')
+
+# (label, first, last) days past due; None leaves the end open
+AGING_BUCKETS = (
+    ('Current', None, 0),
+    ('1-30 days', 1, 30),
+    ('31-60 days', 31, 60),
+    ('61-90 days', 61, 90),
+    ('90+ days', 91, None),
+)
+
+# Amounts are floats summed in a different order than a recomputation, so
+# differences below this are rounding, not drift
+TOLERANCE = 0.005
+REPAIR_CHUNK_SIZE = 500
+
+_DAY_COLUMNS = ('invoice_count', 'billed', 'paid', 'open_count', 'outstanding')
+_PATIENT_COLUMNS = ('open_count', 'outstanding')
+
+
+def _count_if(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def _sum_if(condition, value):
+    return func.coalesce(func.sum(case((condition, value), else_=0)), 0)
+
+
+def _deltas(values, sign):
+    """(receivable_day delta, patient_balance delta or None) for one invoice's values."""
+    total = values['total_amount'] or 0
+    paid = values['paid_amount'] or 0
+    is_open = values['status'] in OPEN_STATUSES
+    day = {'invoice_count': sign, 'billed': sign * total, 'paid': sign * paid,
+           'open_count': sign * is_open, 'outstanding': sign * (total - paid) if is_open else 0}
+    patient = {'open_count': sign, 'outstanding': sign * (total - paid)} if is_open else None
+    return day, patient
+
+
+def _upsert(connection, table, key, delta):
+    dialect = postgresql if connection.dialect.name == 'postgresql' else sqlite
+    statement = dialect.insert(table).values(**key, **delta)
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=list(key),
+        set_={column: table.c[column] + statement.excluded[column] for column in delta},
+    ))
+
+
+def _apply(connection, values, sign):
+    day, patient = _deltas(values, sign)
+    _upsert(connection, ReceivableDay.__table__, {'due_date': values['due_date']}, day)
+    if patient:
+        _upsert(connection, PatientBalance.__table__, {'patient_id': values['patient_id']}, patient)
+
+
+def _lock_for_write(connection):
+    """Hold the database write lock before the stored invoice row is read.
+
+    pysqlite only opens its transaction (BEGIN IMMEDIATE under the 'wal'
+    profile) at the first write, and a flush's first statement may be this
+    read; unlocked, two edits of one invoice could both read the same old
+    values and apply overlapping deltas. A write matching no rows opens the
+    transaction first. Other databases lock the row with FOR UPDATE instead.
+    """
+    if connection.dialect.name == 'sqlite' and not connection.connection.dbapi_connection.in_transaction:
+        table = Invoice.__table__
+        connection.execute(table.update().where(false()).values(id=table.c.id))
+
+
+def _stored_values(connection, invoice_id):
+    """The invoice row as it is in the database, before this flush changes it."""
+    _lock_for_write(connection)
+    columns = [Invoice.__table__.c[name] for name in TRACKED_COLUMNS]
+    row = connection.execute(
+        select(*columns).where(Invoice.__table__.c.id == invoice_id).with_for_update()
+    ).first()
+    return row._asdict() if row else None
+
+
+def _target_values(target):
+    return {name: getattr(target, name) for name in TRACKED_COLUMNS}
+
+
+@event.listens_for(Invoice, 'after_insert')
+def _after_insert(mapper, connection, target):
+    _apply(connection, _target_values(target), 1)
+
+
+@event.listens_for(Invoice, 'before_update')
+def _before_update(mapper, connection, target):
+    state = inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in TRACKED_COLUMNS):
+        return
+    old = _stored_values(connection, target.id)
+    if old:
+        _apply(connection, old, -1)
+    _apply(connection, _target_values(target), 1)
+
+
+@event.listens_for(Invoice, 'before_delete')
+def _before_delete(mapper, connection, target):
+    old = _stored_values(connection, target.id)
+    if old:
+        _apply(connection, old, -1)
+
+
+def _expected_day_totals():
+    is_open = Invoice.status.in_(OPEN_STATUSES)
+    paid = func.coalesce(Invoice.paid_amount, 0)
+    return select(
+        Invoice.due_date,
+        func.count(Invoice.id),
+        func.coalesce(func.sum(Invoice.total_amount), 0),
+        func.coalesce(func.sum(paid), 0),
+        _count_if(is_open),
+        _sum_if(is_open, Invoice.total_amount - paid),
+    ).group_by(Invoice.due_date)
+
+
+def _expected_patient_balances():
+    return select(
+        Invoice.patient_id,
+        func.count(Invoice.id),
+        func.coalesce(func.sum(Invoice.total_amount - func.coalesce(Invoice.paid_amount, 0)), 0),
+    ).where(Invoice.status.in_(OPEN_STATUSES)).group_by(Invoice.patient_id)
+
+
+def rebuild_ledger(connection):
+    """Recompute both ledger tables from the invoices, e.g. after Core inserts."""
+    connection.execute(ReceivableDay.__table__.delete())
+    connection.execute(PatientBalance.__table__.delete())
+    connection.execute(ReceivableDay.__table__.insert().from_select(
+        ['due_date', *_DAY_COLUMNS], _expected_day_totals()))
+    connection.execute(PatientBalance.__table__.insert().from_select(
+        ['patient_id', *_PATIENT_COLUMNS], _expected_patient_balances()))
+
+
+def _differs(actual, expected):
+    return any(abs((a or 0) - (e or 0)) > TOLERANCE for a, e in zip(actual, expected))
+
+
+def _drift(kind, actual, expected, width):
+    zero = (0,) * width
+    return [(kind, key, actual.get(key, zero), expected.get(key, zero))
+            for key in sorted(set(actual) | set(expected))
+            if _differs(actual.get(key, zero), expected.get(key, zero))]
+
+
+def _repair(connection, table, key_column, keys, expected_select, columns):
+    for start in range(0, len(keys), REPAIR_CHUNK_SIZE):
+        chunk = keys[start:start + REPAIR_CHUNK_SIZE]
+        connection.execute(table.delete().where(table.c[key_column].in_(chunk)))
+        source = expected_select.where(getattr(Invoice, key_column).in_(chunk))
+        connection.execute(table.insert().from_select([key_column, *columns], source))
+
+
+def reconcile(repair=True):
+    """Compare the ledger with a full recomputation from the invoices.
+
+    Returns ``(checked, drift)``: the number of ledger keys compared and a
+    list of ``(kind, key, ledger values, recomputed values)``. With
+    ``repair`` the drifted keys are recomputed in one transaction and
+    emptied rows are dropped. An invoice saved between the two reads can
+    show up as drift; repairing it just rewrites the same numbers.
+    """
+    day_table, patient_table = ReceivableDay.__table__, PatientBalance.__table__
+    with db.engine.connect() as connection:
+        expected_days = {row[0]: tuple(row[1:]) for row in connection.execute(_expected_day_totals())}
+        actual_days = {row[0]: tuple(row[1:]) for row in connection.execute(
+            select(day_table.c.due_date, *(day_table.c[column] for column in _DAY_COLUMNS)))}
+        expected_patients = {row[0]: tuple(row[1:]) for row in connection.execute(_expected_patient_balances())}
+        actual_patients = {row[0]: tuple(row[1:]) for row in connection.execute(
+            select(patient_table.c.patient_id, *(patient_table.c[column] for column in _PATIENT_COLUMNS)))}
+
+    drift = _drift('due_date', actual_days, expected_days, len(_DAY_COLUMNS)) + \
+        _drift('patient', actual_patients, expected_patients, len(_PATIENT_COLUMNS))
+    checked = len(set(actual_days) | set(expected_days)) + len(set(actual_patients) | set(expected_patients))
+
+    if repair:
+        with db.engine.begin() as connection:
+            if connection.dialect.name == 'postgresql':
+                # Hold off invoice writes so their deltas cannot land between delete and insert
+                connection.exec_driver_sql('LOCK TABLE invoice IN SHARE MODE')
+            _repair(connection, day_table, 'due_date',
+                    [key for kind, key, _, _ in drift if kind == 'due_date'], _expected_day_totals(), _DAY_COLUMNS)
+            _repair(connection, patient_table, 'patient_id',
+                    [key for kind, key, _, _ in drift if kind == 'patient'], _expected_patient_balances(),
+                    _PATIENT_COLUMNS)
+            connection.execute(day_table.delete().where(day_table.c.invoice_count == 0))
+            connection.execute(patient_table.delete().where(patient_table.c.open_count == 0))
+    return checked, drift
+
+
+def ledger_totals(today=None):
+    """Invoice totals for the dashboard, summed over receivable_day."""
+    today = today or date.today()
+    row = db.session.query(
+        func.coalesce(func.sum(ReceivableDay.invoice_count), 0),
+        func.coalesce(func.sum(ReceivableDay.billed), 0),
+        func.coalesce(func.sum(ReceivableDay.paid), 0),
+        func.coalesce(func.sum(ReceivableDay.outstanding), 0),
+        _sum_if(ReceivableDay.due_date < today, ReceivableDay.open_count),
+    ).one()
+    return {
+        'total_invoices': row[0],
+        'total_amount': row[1],
+        'total_paid': row[2],
+        'unpaid_amount': row[3],
+        'overdue_invoices': row[4],
+    }
+
+
+def _bucket_condition(today, first, last):
+    conditions = []
+    if first is not None:
+        conditions.append(ReceivableDay.due_date <= today - timedelta(days=first))
+    if last is not None:
+        conditions.append(ReceivableDay.due_date >= today - timedelta(days=last))
+    return and_(*conditions)
+
+
+def aging_summary(today=None):
+    """Open invoices and amounts per AGING_BUCKETS entry, by days past due.
+
+    One aggregate over receivable_day, so the cost follows the number of
+    distinct due dates, not the number of invoices.
+    """
+    today = today or date.today()
+    columns = []
+    for _, first, last in AGING_BUCKETS:
+        condition = _bucket_condition(today, first, last)
+        columns += [_sum_if(condition, ReceivableDay.open_count), _sum_if(condition, ReceivableDay.outstanding)]
+    row = db.session.query(*columns).filter(ReceivableDay.open_count > 0).one()
+    return [{'label': label, 'count': row[2 * i], 'amount': row[2 * i + 1]}
+            for i, (label, _, _) in enumerate(AGING_BUCKETS)]
+
+
+def patient_balance(patient_id):
+    """(open invoices, outstanding amount) for one patient."""
+    balance = db.session.get(PatientBalance, patient_id)
+    return (balance.open_count, balance.outstanding) if balance else (0, 0.0)
+
+
+def largest_balances(limit=10):
+    """Patients who owe the most: (name, open invoices, outstanding), largest first."""
+    rows = db.session.query(Patient.first_name, Patient.last_name, PatientBalance.open_count,
+                            PatientBalance.outstanding)\
+        .join(Patient, Patient.id == PatientBalance.patient_id)\
+        .filter(PatientBalance.outstanding > TOLERANCE)\
+        .order_by(PatientBalance.outstanding.desc())\
+        .limit(limit)\
+        .all()
+    return [(f'{first} {last}', count, amount) for first, last, count, amount in rows]
+
+
+def sweep_overdue(today=None):
+    """Mark unpaid and partially paid invoices past their due date as overdue.
+
+    One UPDATE over the (status, due_date) index; returns the number of
+    invoices changed. As a session bulk update it marks the dashboard cache
+    stale, so the commit clears it like any other invoice write. The ledger needs no
+    change: both statuses are open, and amounts and due dates stay as they
+    are.
+    """
+    today = today or date.today()
+    changed = Invoice.query\
+        .filter(Invoice.status.in_(SWEPT_STATUSES), Invoice.due_date < today)\
+        .update({'status': 'overdue'}, synchronize_session=False)
+    db.session.commit()
+    INVOICES_MARKED_OVERDUE.inc(changed)
+    logger.info(f"Marked {changed} invoices due before {today} as overdue")
+    return changed
+
+
+receivables_cli = AppGroup('receivables', help='Check the accounts receivable ledger and overdue invoices.')
+
+
+@receivables_cli.command('reconcile')
+@click.option('--repair/--no-repair', default=True, show_default=True,
+              help='Rewrite drifted ledger rows from the invoices.')
+def reconcile_command(repair):
+    """Verify the ledger against the invoices; exits with status 1 on drift.
+
+    Meant to run nightly from cron.
+    """
+    checked, drift = reconcile(repair)
+    for kind, key, actual, expected in drift[:20]:
+        click.echo(f'{kind} {key}: ledger {actual}, invoices {expected}')
+    if drift:
+        logger.warning(f"Receivables ledger drifted on {len(drift)} of {checked} keys"
+                       f"{', repaired' if repair else ''}")
+        click.echo(f"{len(drift)} of {checked} ledger rows drifted{'; repaired' if repair else ''}")
+        raise SystemExit(1)
+    click.echo(f'Checked {checked} ledger rows, no drift')
+
+
+@receivables_cli.command('sweep-overdue')
+@click.option('--date', 'today', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Mark invoices due before this date. Default: today.')
+def sweep_overdue_command(today):
+    """Move invoices past their due date to 'overdue'.
+
+    Meant to run daily from cron, shortly after midnight.
+    """
+    changed = sweep_overdue(today.date() if today else None)
+    click.echo(f'Marked {changed} invoices as overdue')
@@ -0,0 +1,104 @@
+import logging
+from datetime import date, datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models.appointment import Appointment
+from app.utils.settings_cache import get_settings
+from app.utils.email_sender import render_appointment_reminder
+from app.utils.email_outbox import enqueue_email, drain_outbox
+
+logger = logging.getLogger(__name__)
+
+
+def due_reminders(target_date):
+    """Scheduled appointments on ``target_date`` that have not been reminded yet."""
+    return Appointment.query.filter(
+        Appointment.date == target_date,
+        Appointment.status == 'scheduled',
+        Appointment.reminder_sent_at.is_(None)
+    )
+
+
+def claim_reminders(target_date, claimed_at):
+    """Stamp ``target_date``'s due appointments and return the ones this call claimed.
+
+    The claim is a single UPDATE guarded on reminder_sent_at IS NULL, and
+    the stamp doubles as the claim token, so when two runs overlap each
+    appointment is claimed by exactly one of them. Both statements use the
+    (date, status) index, so the cost depends only on that day's bookings.
+    """
+    claimed = due_reminders(target_date).update({'reminder_sent_at': claimed_at}, synchronize_session=False)
+    if not claimed:
+        return []
+    return Appointment.query\
+        .options(joinedload(Appointment.patient))\
+        .filter(Appointment.date == target_date, Appointment.reminder_sent_at == claimed_at)\
+        .order_by(Appointment.patient_id, Appointment.time)\
+        .all()
+
+
+def queue_reminders(target_date=None):
+    """Queue one reminder per patient for their appointments on ``target_date``.
+
+    Defaults to tomorrow. Appointments are claimed by stamping
+    reminder_sent_at in the same transaction as the outbox rows, so
+    repeated or overlapping runs never send a reminder twice. Returns the
+    number of reminder emails queued.
+    """
+    settings = get_settings()
+    if not settings.email_appointment_reminders:
+        return 0
+
+    target_date = target_date or date.today() + timedelta(days=1)
+    appointments = claim_reminders(target_date, datetime.utcnow())
+    if not appointments:
+        db.session.commit()
+        return 0
+
+    # Group by patient so each patient gets a single email for the day
+    by_patient = {}
+    for appointment in appointments:
+        by_patient.setdefault(appointment.patient_id, []).append(appointment)
+
+    queued = 0
+    subject = f"Appointment Reminder - {settings.clinic_name}"
+    for patient_appointments in by_patient.values():
+        patient = patient_appointments[0].patient
+        # Patients without email stay claimed too, so they are not re-scanned every run
+        if patient.email:
+            html_content, text_content = render_appointment_reminder(patient_appointments, patient, settings)
+            enqueue_email(
+                recipient=patient.email,
+                subject=subject,
+                html_body=html_content,
+                text_body=text_content,
+                category='appointment_reminder',
+                appointment_id=patient_appointments[0].id
+            )
+            queued += 1
+
+    db.session.commit()
+    logger.info(f"Queued {queued} appointment reminders for {target_date}")
+    return queued
+
+
+reminders_cli = AppGroup('reminders', help='Send appointment reminder emails.')
+
+
+@reminders_cli.command('send')
+@click.option('--date', 'target_date', type=click.DateTime(formats=['%Y-%m-%d']),
+              help='Appointment date to remind about (default: tomorrow).')
+@click.option('--drain/--no-drain', default=True, show_default=True,
+              help='Send queued email now instead of leaving it to the outbox worker.')
+@click.option('--concurrency', default=1, show_default=True, help='Parallel SMTP sessions.')
+@click.option('--rate', 'rate_limit', type=float, help='Maximum messages per second.')
+def send_command(target_date, drain, concurrency, rate_limit):
+    """Queue reminders for tomorrow's appointments. Safe to run every few minutes."""
+    queued = queue_reminders(target_date.date() if target_date else None)
+    click.echo(f'Queued {queued} reminders')
+    if drain and queued:
+        sent = drain_outbox(current_app._get_current_object(), concurrency=concurrency, rate_limit=rate_limit)
+        click.echo(f'Processed {sent} outbox messages')
@@ -0,0 +1,83 @@
+import os
+import shutil
+import uuid
+from flask import current_app
+
+MAX_BYTES = 200 * 1024 * 1024
+INVOICE_PDF_MAX_BYTES = 100 * 1024 * 1024
+
+
+class ReportCache:
+    """Finished PDFs on disk, named by a hash of what they show.
+
+    Hits refresh the file's mtime and eviction removes the oldest files
+    first, so the directory behaves as an LRU bounded by ``max_bytes``.
+    Files are written under a temporary name and renamed, which makes the
+    cache safe to share between worker processes.
+    """
+
+    def __init__(self, directory, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, key):
+        return os.path.join(self.directory, f'{key}.pdf')
+
+    def get(self, key):
+        """Return the cached file path for ``key``, or None."""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key, source_path):
+        """Move a finished file into the cache and return its cached path."""
+        path = self.path_for(key)
+        os.replace(source_path, path)
+        return path
+
+    def temp_path(self):
+        return os.path.join(self.directory, f'.{uuid.uuid4().hex}.part')
+
+    def evict(self):
+        """Delete least recently used files until the cache fits. Returns bytes freed."""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pdf'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        freed = 0
+        for _, size, path in sorted(entries):
+            if total - freed <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            freed += size
+        return freed
+
+
+def get_report_cache(app=None):
+    app = app or current_app
+    directory = app.config.get('REPORT_CACHE_DIR') or os.path.join(app.instance_path, 'report_cache')
+    return ReportCache(directory, app.config.get('REPORT_CACHE_MAX_BYTES', MAX_BYTES))
+
+
+def get_invoice_pdf_cache(app=None):
+    app = app or current_app
+    directory = app.config.get('INVOICE_PDF_CACHE_DIR') or os.path.join(app.instance_path, 'invoice_pdfs')
+    return ReportCache(directory, app.config.get('INVOICE_PDF_CACHE_MAX_BYTES', INVOICE_PDF_MAX_BYTES))
+
+
+def copy_into(cached_path, destination):
+    """Expose a cached report at ``destination`` without copying where possible."""
+    try:
+        os.link(cached_path, destination)
+    except OSError:
+        shutil.copyfile(cached_path, destination)
@@ -0,0 +1,164 @@
+import calendar
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from sqlalchemy import case, extract, func
+from app import db
+from app.models.patient import Patient
+from app.models.appointment import Appointment
+from app.models.invoice import Invoice
+from app.models.invoice_item import InvoiceItem
+from app.utils.receivables import ledger_totals
+
+RANGE_CHOICES = (6, 12, 24, 36)
+DEFAULT_MONTHS = 6
+MAX_MONTHS = 120
+
+
+def _add_months(day, months):
+    month_index = day.year * 12 + day.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def _count_if(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+@dataclass(frozen=True)
+class ReportRange:
+    """A half-open range of whole months: ``start <= date < end``."""
+    start: date
+    end: date
+
+    @property
+    def months(self):
+        return (self.end.year - self.start.year) * 12 + self.end.month - self.start.month
+
+    @property
+    def days(self):
+        return (self.end - self.start).days
+
+    def month_starts(self):
+        return [_add_months(self.start, i) for i in range(self.months)]
+
+    @property
+    def label(self):
+        last = _add_months(self.end, -1)
+        return f"{calendar.month_abbr[self.start.month]} {self.start.year} - {calendar.month_abbr[last.month]} {last.year}"
+
+
+def parse_month(value):
+    """Parse a 'YYYY-MM' string into the first day of that month, or None."""
+    try:
+        return datetime.strptime(value, '%Y-%m').date() if value else None
+    except ValueError:
+        return None
+
+
+def resolve_range(months=None, start=None, end=None, today=None):
+    """Build the report range from request arguments.
+
+    ``start``/``end`` are inclusive 'YYYY-MM' months; when both are valid
+    they win over ``months``. Otherwise the range is the last ``months``
+    months including the current one.
+    """
+    today = today or date.today()
+    first, last = parse_month(start), parse_month(end)
+    if first and last and first <= last:
+        end_month = _add_months(last, 1)
+        return ReportRange(max(first, _add_months(end_month, -MAX_MONTHS)), end_month)
+
+    try:
+        months = int(months)
+    except (TypeError, ValueError):
+        months = DEFAULT_MONTHS
+    if months not in RANGE_CHOICES:
+        months = DEFAULT_MONTHS
+    end_month = _add_months(today.replace(day=1), 1)
+    return ReportRange(_add_months(end_month, -months), end_month)
+
+
+def monthly_revenue(report_range):
+    """Invoice totals per month over ``report_range``, zero-filled.
+
+    One GROUP BY over a plain range on Invoice.date, so the
+    (date, total_amount) index is range-scanned whatever the length.
+    """
+    year = extract('year', Invoice.date)
+    month = extract('month', Invoice.date)
+    rows = db.session.query(year, month, func.sum(Invoice.total_amount))\
+        .filter(Invoice.date >= report_range.start, Invoice.date < report_range.end)\
+        .group_by(year, month)\
+        .all()
+    totals = {(int(y), int(m)): amount or 0 for y, m, amount in rows}
+    return [(start, totals.get((start.year, start.month), 0)) for start in report_range.month_starts()]
+
+
+def _item_totals(report_range):
+    """Quantity, line count and revenue per item description over ``report_range``.
+
+    Invoices in the range come from the (date, id) index and their lines from
+    the invoice_item covering index, so neither table nor any JSON is read.
+    """
+    quantity = func.sum(InvoiceItem.quantity)
+    revenue = func.sum(InvoiceItem.total)
+    query = db.session.query(InvoiceItem.description, func.count(), quantity, revenue)\
+        .join(Invoice, Invoice.id == InvoiceItem.invoice_id)\
+        .filter(Invoice.date >= report_range.start, Invoice.date < report_range.end)\
+        .group_by(InvoiceItem.description)
+    return query, quantity, revenue
+
+
+def top_treatments(report_range, limit=10):
+    """The ``limit`` most-billed items by quantity: (description, lines, quantity, revenue)."""
+    query, quantity, revenue = _item_totals(report_range)
+    rows = query.order_by(quantity.desc(), revenue.desc(), InvoiceItem.description).limit(limit).all()
+    return [tuple(row) for row in rows]
+
+
+def revenue_by_item(report_range):
+    """Every billed item, highest revenue first: (description, lines, quantity, revenue)."""
+    query, _, revenue = _item_totals(report_range)
+    rows = query.order_by(revenue.desc(), InvoiceItem.description).all()
+    return [tuple(row) for row in rows]
+
+
+def report_summary(report_range, today=None):
+    """Headline counts for the clinic report.
+
+    One aggregate query per table; invoice totals come from the receivables
+    ledger, and only the last 30 days' revenue is summed from invoices.
+    """
+    today = today or date.today()
+    thirty_days_ago = today - timedelta(days=30)
+    in_range = lambda column: (column >= report_range.start) & (column < report_range.end)
+
+    patients = db.session.query(
+        func.count(Patient.id),
+        _count_if(Patient.created_at >= datetime.combine(thirty_days_ago, datetime.min.time())),
+    ).one()
+    appointments = db.session.query(
+        func.count(Appointment.id),
+        _count_if(Appointment.date >= thirty_days_ago),
+        _count_if(Appointment.date >= today),
+        _count_if(Appointment.status == 'completed'),
+        _count_if(Appointment.status == 'cancelled'),
+        _count_if(in_range(Appointment.date)),
+    ).one()
+    invoices = ledger_totals(today)
+    revenue_30d = db.session.query(func.coalesce(func.sum(Invoice.total_amount), 0))\
+        .filter(Invoice.date >= thirty_days_ago)\
+        .scalar()
+
+    return {
+        'total_patients': patients[0],
+        'new_patients_30d': patients[1],
+        'total_appointments': appointments[0],
+        'appointments_30d': appointments[1],
+        'upcoming_appointments': appointments[2],
+        'completed_appointments': appointments[3],
+        'cancelled_appointments': appointments[4],
+        'range_appointments': appointments[5],
+        'total_invoices': invoices['total_invoices'],
+        'total_revenue': invoices['total_amount'],
+        'revenue_30d': revenue_30d,
+    }
@@ -0,0 +1,242 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from app import db
+from app.models.report_job import ReportJob
+from app.utils.report_cache import copy_into, get_report_cache
+from app.utils.report_data import ReportRange
+from app.utils.metrics import REPORT_JOBS, REPORT_RENDER
+
+logger = logging.getLogger(__name__)
+
+SPOOL_TTL = 24 * 3600      # seconds a finished report stays downloadable
+JOB_TIMEOUT = 15 * 60      # queued/running jobs older than this are marked failed
+PROGRESS_INTERVAL = 0.5    # minimum seconds between progress writes
+
+
+def spool_dir(app=None):
+    app = app or current_app
+    path = app.config.get('REPORT_SPOOL_DIR') or os.path.join(app.instance_path, 'reports')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def spool_path(job_id, app=None):
+    return os.path.join(spool_dir(app), f'{job_id}.pdf')
+
+
+# Worker processes -----------------------------------------------------------
+
+_worker_app = None
+
+
+def _init_worker(config):
+    """Process pool initializer: each worker builds its own app and engine once."""
+    global _worker_app
+    from app import create_app
+    _worker_app = create_app(config)
+
+
+def run_report_job(job_id, app=None):
+    """Render one queued job to its spool file and record the outcome.
+
+    Runs in a pool process, or inline when REPORT_WORKERS is 0. The PDF is
+    written to a .part file and renamed, so a download never sees a
+    half-written report.
+    """
+    app = app or _worker_app
+    with app.app_context():
+        job = db.session.get(ReportJob, job_id)
+        if job is None or job.status != 'queued':
+            return
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+
+        path = spool_path(job_id, app)
+        partial = path + '.part'
+        last_write = [0.0]
+
+        def progress(percent):
+            now = time.monotonic()
+            if percent < 100 and now - last_write[0] < PROGRESS_INTERVAL:
+                return
+            last_write[0] = now
+            job.progress = percent
+            db.session.commit()
+
+        try:
+            render_cached_report(partial, ReportRange(job.range_start, job.range_end), progress, app)
+            os.replace(partial, path)
+        except Exception as e:
+            db.session.rollback()
+            if os.path.exists(partial):
+                os.remove(partial)
+            job.status = 'failed'
+            job.error = str(e)
+            logger.exception(f"Report job {job_id} failed")
+        else:
+            job.status = 'done'
+            job.progress = 100
+            job.file_size = os.path.getsize(path)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        REPORT_JOBS.labels(job.status).inc()
+        db.session.remove()
+
+
+def render_cached_report(output_path, report_range, progress=None, app=None):
+    """Write the report to ``output_path``, reusing an identical earlier render.
+
+    The report data is queried first and hashed; only a dataset or
+    clinic settings change that alters the hash causes a new layout.
+    Returns True when the report came from the cache.
+    """
+    from app.utils.report_pdf import collect_report_data, render_clinic_report, report_cache_key
+    progress = progress or (lambda percent: None)
+    started = time.perf_counter()
+    cache = get_report_cache(app)
+    data = collect_report_data(report_range)
+    key = report_cache_key(data)
+    progress(20)
+
+    cached = cache.get(key)
+    if cached is not None:
+        try:
+            copy_into(cached, output_path)
+            REPORT_RENDER.labels('hit').observe(time.perf_counter() - started)
+            return True
+        except FileNotFoundError:
+            pass  # evicted by another process in the meantime
+
+    temp = cache.temp_path()
+    try:
+        render_clinic_report(temp, data, progress)
+        copy_into(cache.put(key, temp), output_path)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+    cache.evict()
+    REPORT_RENDER.labels('miss').observe(time.perf_counter() - started)
+    return False
+
+
+# Web process side -----------------------------------------------------------
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(app):
+    """Return this process's pool, creating it after startup or a fork."""
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            config = {key: value for key, value in app.config.items() if key.startswith(('REPORT_', 'SQLITE_', 'DB_'))}
+            config.update({
+                'SQLALCHEMY_DATABASE_URI': app.config['SQLALCHEMY_DATABASE_URI'],
+                'REPORT_SPOOL_DIR': spool_dir(app),
+                'REPORT_CACHE_DIR': get_report_cache(app).directory,
+                'REPORT_WORKERS': 0,
+                'EMAIL_OUTBOX_WORKER': 'off',
+            })
+            # spawn, not fork: the parent's engine and worker threads must not leak into children
+            _executor = ProcessPoolExecutor(
+                max_workers=app.config['REPORT_WORKERS'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(config,)
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def submit_report(report_range, user_id=None):
+    """Queue a clinic report and hand it to the process pool. Returns the job."""
+    app = current_app._get_current_object()
+    evict_expired()
+
+    job = ReportJob(
+        id=uuid.uuid4().hex,
+        user_id=user_id,
+        range_start=report_range.start,
+        range_end=report_range.end,
+        status='queued',
+        progress=0
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    if not app.config.get('REPORT_WORKERS'):
+        run_report_job(job.id, app)
+        db.session.refresh(job)
+        return job
+
+    future = _get_executor(app).submit(run_report_job, job.id)
+    job_id = job.id
+
+    def on_done(future):
+        # A worker that died mid-job cannot record its own failure
+        error = future.exception()
+        if error is None:
+            return
+        logger.error(f"Report job {job_id} crashed: {error}")
+        with app.app_context():
+            ReportJob.query.filter(ReportJob.id == job_id, ReportJob.status.in_(['queued', 'running']))\
+                .update({'status': 'failed', 'error': str(error), 'finished_at': datetime.utcnow()},
+                        synchronize_session=False)
+            db.session.commit()
+            db.session.remove()
+
+    future.add_done_callback(on_done)
+    return job
+
+
+def evict_expired(max_age=None):
+    """Delete spooled reports older than ``max_age`` seconds and fail stuck jobs.
+
+    Returns the number of jobs removed.
+    """
+    app = current_app._get_current_object()
+    max_age = max_age if max_age is not None else app.config.get('REPORT_SPOOL_TTL', SPOOL_TTL)
+    now = datetime.utcnow()
+
+    ReportJob.query.filter(
+        ReportJob.status.in_(['queued', 'running']),
+        ReportJob.created_at < now - timedelta(seconds=JOB_TIMEOUT)
+    ).update({'status': 'failed', 'error': 'Timed out', 'finished_at': now}, synchronize_session=False)
+
+    expired = ReportJob.query.with_entities(ReportJob.id)\
+        .filter(ReportJob.created_at < now - timedelta(seconds=max_age))\
+        .all()
+    for (job_id,) in expired:
+        for path in (spool_path(job_id, app), spool_path(job_id, app) + '.part'):
+            if os.path.exists(path):
+                os.remove(path)
+    if expired:
+        ReportJob.query.filter(ReportJob.id.in_([job_id for job_id, in expired]))\
+            .delete(synchronize_session=False)
+    db.session.commit()
+    return len(expired)
+
+
+reports_cli = AppGroup('reports', help='Manage spooled report jobs.')
+
+
+@reports_cli.command('evict')
+@click.option('--max-age', type=int, help='Delete reports older than this many seconds.')
+def evict_command(max_age):
+    """Delete expired spooled reports and trim the report cache."""
+    removed = evict_expired(max_age)
+    click.echo(f'Removed {removed} expired reports')
+    freed = get_report_cache().evict()
+    click.echo(f'Freed {freed} bytes from the report cache')
@@ -0,0 +1,379 @@
+import hashlib
+import json
+import threading
+from functools import lru_cache
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.graphics.shapes import Drawing, Line, String
+from reportlab.graphics.charts.piecharts import Pie
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+from datetime import date
+from app.utils.settings_cache import get_settings
+from app.utils.report_data import monthly_revenue, report_summary, revenue_by_item, top_treatments
+from app.utils.receivables import aging_summary, largest_balances
+
+CHART_CACHE_SIZE = 32
+REVENUE_ITEM_ROWS = 15  # further items are summed into one 'Other items' row
+
+# ReportLab attaches a drawing to the canvas while rendering it, so the shared
+# cached charts must not be drawn by two threads at once (REPORT_WORKERS=0
+# under a threaded server)
+_build_lock = threading.Lock()
+
+def create_pie_chart(data, labels, title, width=400, height=200):
+    drawing = Drawing(width, height)
+    
+    # Create pie chart
+    pie = Pie()
+    pie.x = 100
+    pie.y = 25
+    pie.width = 150
+    pie.height = 150
+    pie.data = data
+    pie.labels = labels
+    
+    # Add some color and style
+    pie.slices.strokeWidth = 0.5
+    pie.slices[0].popout = 10
+    
+    # Use a nice color scheme
+    color_scheme = [colors.HexColor('#FF7F11'),  # Primary orange
+              colors.HexColor('#4A90E2'),  # Blue
+              colors.HexColor('#50C878'),  # Green
+              colors.HexColor('#FF6B6B')]  # Red
+    
+    for i, color in enumerate(color_scheme):
+        if i < len(pie.slices):
+            pie.slices[i].fillColor = color
+    
+    # Add title
+    title = String(200, 180, title, fontSize=12, textAnchor='middle')
+    
+    drawing.add(pie)
+    drawing.add(title)
+    return drawing
+
+def create_bar_chart(data, labels, title, width=400, height=200):
+    drawing = Drawing(width, height)
+    
+    # Create bar chart
+    bc = VerticalBarChart()
+    bc.x = 50
+    bc.y = 25
+    bc.height = 150
+    bc.width = 300
+    bc.data = [data]
+    bc.strokeColor = colors.black
+    bc.valueAxis.valueMin = 0
+    # Keep a usable axis when every month is zero
+    peak = max(data) if data and max(data) > 0 else 1
+    bc.valueAxis.valueMax = peak * 1.2
+    bc.valueAxis.valueStep = peak * 0.2
+    bc.categoryAxis.labels.boxAnchor = 'ne'
+    bc.categoryAxis.labels.dx = 8
+    bc.categoryAxis.labels.dy = -2
+    bc.categoryAxis.labels.angle = 30
+    bc.categoryAxis.categoryNames = labels
+    
+    # Style the bars
+    bc.bars[0].fillColor = colors.HexColor('#FF7F11')
+    
+    # Add title
+    title = String(200, 180, title, fontSize=12, textAnchor='middle')
+    
+    drawing.add(bc)
+    drawing.add(title)
+    return drawing
+
+@lru_cache(maxsize=None)
+def report_styles():
+    """Paragraph styles for the clinic report, built once per process."""
+    styles = getSampleStyleSheet()
+    return {
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=24,
+            spaceAfter=30,
+            textColor=colors.HexColor('#FF7F11')
+        ),
+        'heading': ParagraphStyle(
+            'Heading2',
+            parent=styles['Heading2'],
+            fontSize=18,
+            spaceBefore=20,
+            spaceAfter=10,
+            textColor=colors.HexColor('#333333')
+        ),
+        'subheading': ParagraphStyle(
+            'Heading3',
+            parent=styles['Heading3'],
+            fontSize=14,
+            spaceBefore=15,
+            spaceAfter=5,
+            textColor=colors.HexColor('#666666')
+        ),
+        'body': ParagraphStyle(
+            'Body',
+            parent=styles['Normal'],
+            fontSize=10,
+            textColor=colors.HexColor('#333333')
+        ),
+    }
+
+@lru_cache(maxsize=None)
+def table_style(header_color):
+    """Shared table style with a coloured header row, built once per colour."""
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(header_color)),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 10),
+    ])
+
+# Chart drawings keyed on their data, so an unchanged chart is reused as-is
+@lru_cache(maxsize=CHART_CACHE_SIZE)
+def cached_pie_chart(data, labels, title):
+    return create_pie_chart(list(data), list(labels), title)
+
+@lru_cache(maxsize=CHART_CACHE_SIZE)
+def cached_bar_chart(data, labels, title):
+    return create_bar_chart(list(data), list(labels), title)
+
+def collect_report_data(report_range, today=None):
+    """Everything the clinic report shows, as a JSON-serialisable dict.
+
+    Figures are as of ``today``, which the report prints instead of the time
+    it was rendered, so a cached copy never carries a stale timestamp.
+    """
+    today = today or date.today()
+    settings = get_settings()
+    revenue_by_month = monthly_revenue(report_range)
+    label_format = '%b' if report_range.months <= 12 else '%b %y'
+    return {
+        'clinic': {
+            'name': settings.clinic_name,
+            'address': settings.clinic_address,
+            'phone': settings.clinic_phone,
+            'email': settings.clinic_email,
+            'currency_symbol': settings.currency_symbol,
+        },
+        'settings_version': settings.version,
+        'as_of': today.isoformat(),
+        'range_label': report_range.label,
+        'range_days': report_range.days,
+        'stats': report_summary(report_range, today),
+        'month_labels': [month.strftime(label_format) for month, _ in revenue_by_month],
+        'monthly_revenue': [amount for _, amount in revenue_by_month],
+        'top_treatments': top_treatments(report_range),
+        'revenue_by_item': revenue_by_item(report_range),
+        'aging': aging_summary(today),
+        'largest_balances': largest_balances(),
+    }
+
+def report_cache_key(data):
+    """Content address of a report: a hash of its dataset and clinic settings."""
+    payload = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def render_clinic_report(output, data, progress=None):
+    """Lay out a report from ``collect_report_data`` output into ``output``.
+
+    ``output`` is a filename or a binary file object. ``progress`` is called
+    with a percentage as layout proceeds.
+    """
+    progress = progress or (lambda percent: None)
+    clinic = data['clinic']
+    stats = data['stats']
+    currency_symbol = clinic['currency_symbol'] if clinic else '$'
+    
+    # Create the PDF object using ReportLab
+    doc = SimpleDocTemplate(
+        output,
+        pagesize=letter,
+        rightMargin=36,
+        leftMargin=36,
+        topMargin=36,
+        bottomMargin=36
+    )
+    
+    # Styles
+    styles = report_styles()
+    heading_style = styles['heading']
+    subheading_style = styles['subheading']
+    body_style = styles['body']
+    
+    # Container for the 'Flowable' objects
+    elements = []
+    
+    # Header with clinic information
+    header = Drawing(500, 50)
+    header.add(String(250, 40, clinic['name'] if clinic else "Dental Clinic Report", fontSize=24, textAnchor='middle', fillColor=colors.HexColor('#FF7F11')))
+    header.add(Line(50, 30, 450, 30, strokeColor=colors.HexColor('#FF7F11'), strokeWidth=2))
+    elements.append(header)
+    
+    if clinic:
+        elements.append(Paragraph(f"Address: {clinic['address']}", body_style))
+        elements.append(Paragraph(f"Phone: {clinic['phone']}", body_style))
+        elements.append(Paragraph(f"Email: {clinic['email']}", body_style))
+    
+    elements.append(Spacer(1, 20))
+    elements.append(Paragraph(f"Figures As Of: {data['as_of']}", body_style))
+    elements.append(Paragraph(f"Reporting Period: {data['range_label']}", body_style))
+    elements.append(Spacer(1, 30))
+    
+    # Add decorative line after header
+    line = Drawing(500, 1)
+    line.add(Line(50, 0, 450, 0, strokeColor=colors.HexColor('#FF7F11'), strokeWidth=1))
+    elements.append(line)
+    elements.append(Spacer(1, 20))
+    
+    total_patients = stats['total_patients']
+    total_appointments = stats['total_appointments']
+    total_revenue = stats['total_revenue']
+    new_patients_30d = stats['new_patients_30d']
+    appointments_30d = stats['appointments_30d']
+    revenue_30d = stats['revenue_30d']
+    upcoming_appointments = stats['upcoming_appointments']
+    completed_appointments = stats['completed_appointments']
+    cancelled_appointments = stats['cancelled_appointments']
+    
+    monthly_revenue_totals = data['monthly_revenue']
+    previous_month_revenue = monthly_revenue_totals[-2] if len(monthly_revenue_totals) > 1 else 0
+    range_daily_appointments = stats['range_appointments'] / data['range_days']
+    
+    progress(40)
+    
+    # Create charts
+    # Appointment Status Pie Chart
+    appointment_chart = cached_pie_chart(
+        (upcoming_appointments, completed_appointments, cancelled_appointments),
+        ('Upcoming', 'Completed', 'Cancelled'),
+        'Appointment Status Distribution'
+    )
+    elements.append(appointment_chart)
+    elements.append(Spacer(1, 20))
+    
+    # Monthly Revenue Bar Chart
+    revenue_chart = cached_bar_chart(tuple(monthly_revenue_totals), tuple(data['month_labels']),
+                                     f"Monthly Revenue Trend ({data['range_label']})")
+    elements.append(revenue_chart)
+    elements.append(Spacer(1, 20))
+    
+    # Key Performance Indicators
+    elements.append(Paragraph("Key Performance Indicators", heading_style))
+    
+    kpi_data = [
+        ['Metric', 'Current', '30-Day Trend'],
+        ['Total Patients', str(total_patients), f"+{new_patients_30d}"],
+        ['Monthly Revenue', f"{currency_symbol}{monthly_revenue_totals[-1]:,.2f}", 
+         f"{'+' if revenue_30d > previous_month_revenue else ''}{currency_symbol}{revenue_30d - previous_month_revenue:,.2f}"],
+        ['Avg. Daily Appointments', f"{appointments_30d/30:.1f}", 
+         f"{'+' if appointments_30d/30 > range_daily_appointments else ''}{(appointments_30d/30 - range_daily_appointments):.1f}"]
+    ]
+    
+    kpi_table = Table(kpi_data, colWidths=[200, 100, 100])
+    kpi_table.setStyle(table_style('#FF7F11'))
+    elements.append(kpi_table)
+    elements.append(PageBreak())
+    
+    # Detailed Statistics
+    elements.append(Paragraph("Detailed Analysis", heading_style))
+    
+    # Financial Metrics
+    elements.append(Paragraph("Financial Overview", subheading_style))
+    financial_data = [
+        ['Metric', 'Value'],
+        ['Total Revenue', f"{currency_symbol}{total_revenue:,.2f}"],
+        ['Revenue (Last 30 Days)', f"{currency_symbol}{revenue_30d:,.2f}"],
+        ['Average Revenue per Patient', f"{currency_symbol}{(total_revenue/total_patients if total_patients > 0 else 0):,.2f}"],
+        ['Average Revenue per Appointment', f"{currency_symbol}{(total_revenue/total_appointments if total_appointments > 0 else 0):,.2f}"]
+    ]
+    
+    financial_table = Table(financial_data, colWidths=[200, 200])
+    financial_table.setStyle(table_style('#4A90E2'))
+    elements.append(financial_table)
+    elements.append(Spacer(1, 20))
+    
+    # Revenue by invoice item over the reporting period, the long tail folded into one row
+    item_revenue = data['revenue_by_item']
+    if item_revenue:
+        elements.append(Paragraph("Revenue by Item", subheading_style))
+        item_data = [['Item', 'Quantity', 'Revenue']]
+        for description, _, quantity, revenue in item_revenue[:REVENUE_ITEM_ROWS]:
+            item_data.append([description, str(quantity), f"{currency_symbol}{revenue:,.2f}"])
+        rest = item_revenue[REVENUE_ITEM_ROWS:]
+        if rest:
+            item_data.append([f"Other items ({len(rest)})", str(sum(row[2] for row in rest)),
+                              f"{currency_symbol}{sum(row[3] for row in rest):,.2f}"])
+        item_table = Table(item_data, colWidths=[200, 100, 100])
+        item_table.setStyle(table_style('#4A90E2'))
+        elements.append(item_table)
+        elements.append(Spacer(1, 20))
+    
+    # Accounts receivable aging as of today, by days past the due date
+    elements.append(Paragraph("Accounts Receivable Aging", subheading_style))
+    aging_data = [['Days Past Due', 'Invoices', 'Outstanding']]
+    for bucket in data['aging']:
+        aging_data.append([bucket['label'], str(bucket['count']), f"{currency_symbol}{bucket['amount']:,.2f}"])
+    aging_data.append(['Total', str(sum(bucket['count'] for bucket in data['aging'])),
+                       f"{currency_symbol}{sum(bucket['amount'] for bucket in data['aging']):,.2f}"])
+    aging_table = Table(aging_data, colWidths=[200, 100, 100])
+    aging_table.setStyle(table_style('#4A90E2'))
+    elements.append(aging_table)
+    elements.append(Spacer(1, 20))
+    
+    if data['largest_balances']:
+        elements.append(Paragraph("Largest Outstanding Balances", subheading_style))
+        balance_data = [['Patient', 'Open Invoices', 'Outstanding']]
+        for name, count, amount in data['largest_balances']:
+            balance_data.append([name, str(count), f"{currency_symbol}{amount:,.2f}"])
+        balance_table = Table(balance_data, colWidths=[200, 100, 100])
+        balance_table.setStyle(table_style('#4A90E2'))
+        elements.append(balance_table)
+        elements.append(Spacer(1, 20))
+    
+    # Appointment Metrics
+    elements.append(Paragraph("Appointment Analytics", subheading_style))
+    appointment_data = [
+        ['Metric', 'Value'],
+        ['Total Appointments', str(total_appointments)],
+        ['Upcoming Appointments', str(upcoming_appointments)],
+        ['Completed Appointments', str(completed_appointments)],
+        ['Cancelled Appointments', str(cancelled_appointments)],
+        ['Completion Rate', f"{(completed_appointments/total_appointments*100 if total_appointments > 0 else 0):.1f}%"],
+        ['Cancellation Rate', f"{(cancelled_appointments/total_appointments*100 if total_appointments > 0 else 0):.1f}%"]
+    ]
+    
+    appointment_table = Table(appointment_data, colWidths=[200, 200])
+    appointment_table.setStyle(table_style('#50C878'))
+    elements.append(appointment_table)
+    
+    # Most-billed treatments over the reporting period
+    if data['top_treatments']:
+        elements.append(Spacer(1, 20))
+        elements.append(Paragraph("Top Treatments", subheading_style))
+        treatment_data = [['Treatment', 'Invoices', 'Quantity', 'Revenue']]
+        for description, lines, quantity, revenue in data['top_treatments']:
+            treatment_data.append([description, str(lines), str(quantity), f"{currency_symbol}{revenue:,.2f}"])
+        treatment_table = Table(treatment_data, colWidths=[160, 80, 80, 100])
+        treatment_table.setStyle(table_style('#50C878'))
+        elements.append(treatment_table)
+    
+    # Build PDF
+    progress(60)
+    with _build_lock:
+        doc.build(elements)
+    progress(100)
+
+def build_clinic_report(output, report_range, progress=None):
+    """Query and render the clinic report for ``report_range`` into ``output``."""
+    render_clinic_report(output, collect_report_data(report_range), progress)
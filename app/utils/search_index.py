@@ -0,0 +1,230 @@
+import re
+import time
+import click
+from flask.cli import AppGroup
+from sqlalchemy import event, inspect, or_, text
+from app import db
+from app.models.patient import Patient
+from app.models.appointment import Appointment
+from app.models.prescription import Prescription
+from app.models.invoice import Invoice
+
+# One FTS5 table holds a document per patient, appointment, prescription and
+# invoice. Child records only index their own text; searches that should also
+# match the patient's name join back through patient_id instead, so renaming a
+# patient never has to rewrite the child documents.
+INDEX_TABLE = 'search_index'
+
+# kind and ref_id are UNINDEXED, so filtering on them scans every document.
+# Each document's rowid encodes both instead (ref_id * KIND_COUNT + code), so
+# the listeners update and delete documents by rowid lookup.
+KIND_CODES = {'patient': 0, 'appointment': 1, 'prescription': 2, 'invoice': 3}
+KIND_COUNT = len(KIND_CODES)
+
+# Seconds before a database without the index is checked again, so an index
+# created by 'flask db upgrade' is picked up without a restart
+UNAVAILABLE_RECHECK_INTERVAL = 30.0
+
+CREATE_INDEX_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} USING fts5("
+    "kind UNINDEXED, ref_id UNINDEXED, name, body, "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+
+# kind -> (model, name columns, body columns, LIKE fields used when the index is unavailable)
+INDEXED_MODELS = {
+    'patient': (Patient, ['first_name', 'last_name'], ['email', 'phone'],
+                ['first_name', 'last_name', 'email', 'phone']),
+    'appointment': (Appointment, [], ['treatment_type', 'notes'],
+                    ['treatment_type', 'notes']),
+    'prescription': (Prescription, [], ['diagnosis', 'notes'],
+                     ['diagnosis', 'notes']),
+    'invoice': (Invoice, [], ['notes'],
+                ['notes']),
+}
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_available = {}  # engine url -> (available, checked at)
+
+
+def index_available(connection=None):
+    """Return True if the FTS5 search index exists in the current database."""
+    engine = connection.engine if connection is not None else db.engine
+    cached = _available.get(engine.url)
+    if cached is not None and (cached[0] or time.monotonic() - cached[1] < UNAVAILABLE_RECHECK_INTERVAL):
+        return cached[0]
+    available = False
+    if engine.dialect.name == 'sqlite':
+        if connection is not None:
+            available = _has_index_table(connection)
+        else:
+            with engine.connect() as conn:
+                available = _has_index_table(conn)
+    _available[engine.url] = (available, time.monotonic())
+    return available
+
+
+def _has_index_table(connection):
+    return connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': INDEX_TABLE}
+    ).first() is not None
+
+
+def build_match_query(term, column=None):
+    """Turn free text into an FTS5 prefix query, e.g. 'jo smi' -> '"jo"* "smi"*'."""
+    tokens = _TOKEN_RE.findall(term or '')
+    if not tokens:
+        return None
+    query = ' '.join(f'"{token}"*' for token in tokens)
+    if column:
+        query = f'{column} : ({query})'
+    return query
+
+
+def document_rowid(kind, ref_id):
+    return ref_id * KIND_COUNT + KIND_CODES[kind]
+
+
+def _document(kind, target):
+    _, name_columns, body_columns, _ = INDEXED_MODELS[kind]
+    name = ' '.join(filter(None, (getattr(target, c) for c in name_columns)))
+    body = ' '.join(filter(None, (getattr(target, c) for c in body_columns)))
+    return {'rowid': document_rowid(kind, target.id), 'kind': kind, 'ref_id': target.id,
+            'name': name, 'body': body}
+
+
+def _delete_document(connection, kind, ref_id):
+    connection.execute(
+        text(f"DELETE FROM {INDEX_TABLE} WHERE rowid = :rowid"),
+        {'rowid': document_rowid(kind, ref_id)}
+    )
+
+
+def _make_listeners(kind):
+    _, name_columns, body_columns, _ = INDEXED_MODELS[kind]
+    source_columns = name_columns + body_columns
+
+    def after_insert(mapper, connection, target):
+        if _index_enabled(connection):
+            connection.execute(
+                text(f"INSERT INTO {INDEX_TABLE} (rowid, kind, ref_id, name, body) "
+                     "VALUES (:rowid, :kind, :ref_id, :name, :body)"),
+                _document(kind, target)
+            )
+
+    def after_update(mapper, connection, target):
+        # Status changes, payments and the like leave the document as it is
+        attrs = inspect(target).attrs
+        if not any(attrs[column].history.has_changes() for column in source_columns):
+            return
+        if _index_enabled(connection):
+            _delete_document(connection, kind, target.id)
+            after_insert(mapper, connection, target)
+
+    def after_delete(mapper, connection, target):
+        if _index_enabled(connection):
+            _delete_document(connection, kind, target.id)
+
+    return after_insert, after_update, after_delete
+
+
+def _index_enabled(connection):
+    return connection.dialect.name == 'sqlite' and index_available(connection)
+
+
+for _kind, (_model, _, _, _) in INDEXED_MODELS.items():
+    _insert, _update, _delete = _make_listeners(_kind)
+    event.listen(_model, 'after_insert', _insert)
+    event.listen(_model, 'after_update', _update)
+    event.listen(_model, 'after_delete', _delete)
+
+
+def matching_ids(kind, term, column=None):
+    """Return a SELECT of ref_ids for documents of ``kind`` matching ``term``."""
+    return text(
+        f"SELECT ref_id FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH :query AND kind = :kind"
+    ).bindparams(query=build_match_query(term, column), kind=kind).columns(ref_id=db.Integer)
+
+
+def _like_filter(kind, term):
+    model, _, _, fields = INDEXED_MODELS[kind]
+    filters = [getattr(model, field).ilike(f'%{term}%') for field in fields]
+    if kind != 'patient':
+        filters.append(Patient.first_name.ilike(f'%{term}%'))
+        filters.append(Patient.last_name.ilike(f'%{term}%'))
+    return or_(*filters)
+
+
+def search_filter(kind, term):
+    """Build the WHERE clause a list view uses to search ``kind`` records.
+
+    Appointment, prescription and invoice queries are expected to be joined to
+    Patient, matching the behaviour of the LIKE search this replaces.
+    """
+    if not index_available() or build_match_query(term) is None:
+        return _like_filter(kind, term)
+
+    model = INDEXED_MODELS[kind][0]
+    if kind == 'patient':
+        return model.id.in_(matching_ids('patient', term))
+    return or_(
+        model.id.in_(matching_ids(kind, term)),
+        model.patient_id.in_(matching_ids('patient', term, column='name'))
+    )
+
+
+def search(term, limit=20):
+    """Ranked search across every indexed kind, best matches first."""
+    query = build_match_query(term)
+    if query is None or not index_available():
+        return []
+    rows = db.session.execute(
+        text(f"SELECT kind, ref_id, rank FROM {INDEX_TABLE} "
+             f"WHERE {INDEX_TABLE} MATCH :query ORDER BY rank LIMIT :limit"),
+        {'query': query, 'limit': limit}
+    ).all()
+    return [(row.kind, row.ref_id, row.rank) for row in rows]
+
+
+def create_index():
+    db.session.execute(text(CREATE_INDEX_SQL))
+    _available.clear()
+
+
+def rebuild_index():
+    """Drop and repopulate every document from the source tables."""
+    create_index()
+    db.session.execute(text(f"DELETE FROM {INDEX_TABLE}"))
+    counts = {}
+    for kind, (model, name_columns, body_columns, _) in INDEXED_MODELS.items():
+        table = model.__table__.name
+        name_sql = _concat_sql(name_columns)
+        body_sql = _concat_sql(body_columns)
+        result = db.session.execute(text(
+            f"INSERT INTO {INDEX_TABLE} (rowid, kind, ref_id, name, body) "
+            f"SELECT id * {KIND_COUNT} + :code, :kind, id, {name_sql}, {body_sql} FROM {table}"
+        ), {'kind': kind, 'code': KIND_CODES[kind]})
+        counts[kind] = result.rowcount
+    db.session.execute(text(f"INSERT INTO {INDEX_TABLE}({INDEX_TABLE}) VALUES ('optimize')"))
+    db.session.commit()
+    return counts
+
+
+def _concat_sql(columns):
+    if not columns:
+        return "''"
+    return " || ' ' || ".join(f"coalesce({column}, '')" for column in columns)
+
+
+search_cli = AppGroup('search-index', help='Manage the full-text search index.')
+
+
+@search_cli.command('rebuild')
+def rebuild_command():
+    """Rebuild the search index from existing records."""
+    if db.engine.dialect.name != 'sqlite':
+        raise click.ClickException('The full-text search index requires SQLite with FTS5.')
+    counts = rebuild_index()
+    for kind, count in counts.items():
+        click.echo(f'Indexed {count} {kind} records')
@@ -0,0 +1,301 @@
+import random
+import time as timer
+from datetime import date, datetime, time, timedelta
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, select, text
+from app import db
+from app.models.patient import Patient
+from app.models.appointment import Appointment
+from app.models.invoice import Invoice
+from app.models.invoice_item import InvoiceItem
+from app.models.prescription import Prescription, Medication
+from app.utils.invoice_items import item_rows
+from app.utils.receivables import rebuild_ledger
+
+BATCH_SIZE = 20000
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda',
+               'David', 'Elizabeth', 'William', 'Barbara', 'Priya', 'Wei', 'Ahmed', 'Sofia',
+               'Kenji', 'Amara', 'Lucas', 'Fatima', 'Mateo', 'Aisha', 'Noah', 'Olga']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis',
+              'Rodriguez', 'Martinez', 'Patel', 'Chen', 'Khan', 'Rossi', 'Tanaka', 'Okafor',
+              'Novak', 'Silva', 'Kowalski', 'Nguyen', 'Müller', 'Dubois', 'Haddad', 'Larsen']
+STREETS = ['Main Street', 'Oak Avenue', 'Park Road', 'Hill Lane', 'Lake Drive', 'Station Road']
+TREATMENTS = [('Checkup', 60), ('Cleaning', 90), ('Filling', 150), ('Root Canal', 900),
+              ('Extraction', 250), ('Crown', 1100), ('Whitening', 400), ('X-Ray', 80),
+              ('Scaling', 120), ('Consultation', 50)]
+# Checkups and cleanings are booked far more often than crowns
+TREATMENT_WEIGHTS = [30, 25, 15, 4, 6, 3, 3, 8, 4, 2]
+DIAGNOSES = ['Dental caries', 'Gingivitis', 'Periapical abscess', 'Pericoronitis',
+             'Tooth sensitivity', 'Chronic periodontitis', 'Pulpitis', 'Oral ulcer']
+DRUGS = [('Amoxicillin', '500 mg'), ('Ibuprofen', '400 mg'), ('Metronidazole', '400 mg'),
+         ('Paracetamol', '650 mg'), ('Chlorhexidine mouthwash', '10 ml'), ('Clindamycin', '300 mg'),
+         ('Benzocaine gel', 'Apply thinly')]
+FREQUENCIES = ['Once daily', 'Twice daily', 'Three times daily', 'As needed']
+DURATIONS = ['3 days', '5 days', '7 days', '10 days']
+SLOTS = [time(hour, minute) for hour in range(9, 18) for minute in (0, 30)]
+
+
+class Generator:
+    """Rows for one seeding run, reproducible from ``seed`` and ``end_date``.
+
+    Each table draws from its own random stream, so changing one table's
+    row count leaves the others unchanged. Visits and prescriptions favour
+    a core of regular patients, dates lean towards the recent past, and
+    statuses depend on how old a record is.
+    """
+
+    def __init__(self, seed, end_date, years, first_ids, patients, email_rate=0.9):
+        self.seed = seed
+        self.end_date = end_date
+        self.span = int(years * 365)
+        self.first_ids = first_ids
+        self.patients = patients
+        self.email_rate = email_rate
+        self.now = datetime.combine(end_date, time(18, 0))
+
+    def _rng(self, table):
+        return random.Random(f'{self.seed}:{table}')
+
+    def _patient_id(self, rng):
+        # Squaring skews towards the first patients: regulars visit more often
+        return self.first_ids['patient'] + int(self.patients * rng.random() ** 2)
+
+    def _past_day(self, rng):
+        # Triangular towards today: the clinic has grown over the years
+        return self.end_date - timedelta(days=int(rng.triangular(0, self.span, 0)))
+
+    def patients_rows(self, count):
+        rng = self._rng('patient')
+        first_id = self.first_ids['patient']
+        for i in range(first_id, first_id + count):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            created = self.now - timedelta(days=int(rng.triangular(0, self.span, 0)), minutes=rng.randrange(600))
+            yield {
+                'id': i, 'first_name': first, 'last_name': last,
+                'date_of_birth': self.end_date - timedelta(days=rng.randrange(3 * 365, 90 * 365)),
+                'gender': rng.choice(['Male', 'Female']),
+                'phone': f'555-{rng.randrange(10 ** 7):07d}',
+                'email': f'{first.lower()}.{last.lower()}{i}@example.com' if rng.random() < self.email_rate else None,
+                'address': f'{rng.randrange(1, 999)} {rng.choice(STREETS)}',
+                'chief_complaint': rng.choice(['Tooth pain', 'Routine checkup', 'Bleeding gums', 'Sensitivity', None]),
+                'medical_history': rng.choice(['None', 'Diabetes', 'Hypertension', 'Asthma', None]),
+                'created_at': created,
+            }
+
+    def appointment_rows(self, count):
+        rng = self._rng('appointment')
+        first_id = self.first_ids['appointment']
+        treatments = [name for name, _ in TREATMENTS]
+        for i in range(first_id, first_id + count):
+            if rng.random() < 0.08:
+                day = self.end_date + timedelta(days=rng.randrange(1, 60))
+            else:
+                day = self._past_day(rng)
+            if day.weekday() == 6:
+                day -= timedelta(days=1)  # closed on Sundays
+            if day > self.end_date:
+                status = 'cancelled' if rng.random() < 0.05 else 'scheduled'
+            else:
+                roll = rng.random()
+                status = 'completed' if roll < 0.85 else 'cancelled' if roll < 0.97 else 'scheduled'
+            yield {
+                'id': i, 'patient_id': self._patient_id(rng), 'date': day, 'time': rng.choice(SLOTS),
+                'duration': rng.choice([30, 30, 45, 60, 90]),
+                'status': status,
+                'treatment_type': rng.choices(treatments, TREATMENT_WEIGHTS)[0],
+                'notes': rng.choice(['', '', '', 'Prefers morning', 'Anxious patient', 'Follow-up']),
+                'created_at': datetime.combine(min(day, self.end_date), time(9)) - timedelta(days=rng.randrange(30)),
+            }
+
+    def invoice_rows(self, count):
+        rng = self._rng('invoice')
+        first_id = self.first_ids['invoice']
+        for i in range(first_id, first_id + count):
+            day = self._past_day(rng)
+            items = []
+            for description, price in rng.sample(TREATMENTS, rng.choices([1, 2, 3, 4], [50, 30, 15, 5])[0]):
+                quantity = rng.choice([1, 1, 1, 2])
+                items.append({'description': description, 'quantity': quantity,
+                              'unit_price': float(price), 'total': float(price * quantity)})
+            subtotal = sum(item['total'] for item in items)
+            tax_rate = rng.choice([0.0, 0.0, 5.0, 10.0])
+            tax_amount = round(subtotal * tax_rate / 100, 2)
+            total = subtotal + tax_amount
+            # Older invoices have mostly been settled
+            paid_share = 0.93 if (self.end_date - day).days > 60 else 0.5
+            roll = rng.random()
+            if roll < paid_share:
+                status, paid = 'paid', total
+            elif roll < paid_share + (1 - paid_share) / 3:
+                status, paid = 'partially_paid', round(total * rng.uniform(0.2, 0.8), 2)
+            else:
+                status, paid = 'unpaid', 0.0
+            yield {
+                'id': i, 'patient_id': self._patient_id(rng), 'date': day, 'due_date': day + timedelta(days=30),
+                'items': items, 'subtotal': subtotal, 'tax_rate': tax_rate, 'tax_amount': tax_amount,
+                'total_amount': total, 'paid_amount': paid, 'status': status, 'notes': None,
+                'created_at': datetime.combine(day, time(17)),
+            }
+
+    def prescription_rows(self, count):
+        """(prescription, medications) pairs; each prescription has one to three."""
+        rng = self._rng('prescription')
+        first_id = self.first_ids['prescription']
+        medication_id = self.first_ids['medication']
+        for i in range(first_id, first_id + count):
+            day = self._past_day(rng)
+            prescription = {
+                'id': i, 'patient_id': self._patient_id(rng), 'date': day,
+                'diagnosis': rng.choice(DIAGNOSES), 'notes': rng.choice(['', 'Review in one week']),
+                'created_at': datetime.combine(day, time(12)),
+            }
+            medications = []
+            for name, dosage in rng.sample(DRUGS, rng.choices([1, 2, 3], [40, 45, 15])[0]):
+                medications.append({
+                    'id': medication_id, 'prescription_id': i, 'name': name, 'dosage': dosage,
+                    'frequency': rng.choice(FREQUENCIES), 'duration': rng.choice(DURATIONS),
+                    'instructions': rng.choice(['After meals', 'Before bed', '']),
+                })
+                medication_id += 1
+            yield prescription, medications
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _secondary_indexes(connection, table):
+    """(name, CREATE statement) for each index that is not a key constraint."""
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        rows = connection.execute(text(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = :table AND sql IS NOT NULL"
+        ), {'table': table})
+    elif dialect == 'postgresql':
+        rows = connection.execute(text(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() "
+            "AND tablename = :table AND indexname NOT IN (SELECT conname FROM pg_constraint)"
+        ), {'table': table})
+    else:
+        return []
+    return [tuple(row) for row in rows]
+
+
+def _next_ids(connection):
+    return {
+        model.__table__.name: (connection.execute(select(func.max(model.id))).scalar() or 0) + 1
+        for model in (Patient, Appointment, Invoice, Prescription, Medication)
+    }
+
+
+def seed_database(patients, appointments, invoices, prescriptions, seed=42, end_date=None, years=3,
+                  batch_size=BATCH_SIZE, email_rate=0.9, echo=None):
+    """Append generated rows to the clinic tables; returns the row count per table.
+
+    Rows go in with executemany ``insert()`` batches inside one transaction.
+    The tables' secondary indexes are dropped first and rebuilt once at the
+    end, which is several times faster than updating them row by row.
+    invoice_item rows are written alongside their invoices and the
+    receivables ledger is recomputed at the end; the search index is not
+    updated, so rebuild it afterwards.
+    """
+    echo = echo or (lambda message: None)
+    if patients < 1 and (appointments or invoices or prescriptions):
+        raise ValueError('Appointments, invoices and prescriptions need at least one new patient')
+    engine = db.engine
+    tables = [model.__table__ for model in (Patient, Appointment, Invoice, InvoiceItem, Prescription, Medication)]
+
+    with engine.begin() as connection:
+        generator = Generator(seed, end_date or date.today(), years, _next_ids(connection), patients, email_rate)
+        indexes = [index for table in tables for index in _secondary_indexes(connection, table.name)]
+        for name, _ in indexes:
+            connection.execute(text(f'DROP INDEX {name}'))
+
+    counts = dict.fromkeys((table.name for table in tables), 0)
+    try:
+        with engine.begin() as connection:
+            for table, rows in ((Patient.__table__, generator.patients_rows(patients)),
+                                (Appointment.__table__, generator.appointment_rows(appointments))):
+                started = timer.perf_counter()
+                for batch in _batches(rows, batch_size):
+                    connection.execute(table.insert(), batch)
+                    counts[table.name] += len(batch)
+                echo(f'{counts[table.name]} {table.name} rows in {timer.perf_counter() - started:.1f}s')
+
+            started = timer.perf_counter()
+            for batch in _batches(generator.invoice_rows(invoices), batch_size):
+                connection.execute(Invoice.__table__.insert(), batch)
+                items = [row for invoice in batch for row in item_rows(invoice['id'], invoice['items'])]
+                connection.execute(InvoiceItem.__table__.insert(), items)
+                counts['invoice'] += len(batch)
+                counts['invoice_item'] += len(items)
+            echo(f"{counts['invoice']} invoice rows with {counts['invoice_item']} items "
+                 f"in {timer.perf_counter() - started:.1f}s")
+
+            started = timer.perf_counter()
+            for batch in _batches(generator.prescription_rows(prescriptions), batch_size):
+                connection.execute(Prescription.__table__.insert(), [prescription for prescription, _ in batch])
+                medications = [medication for _, rows in batch for medication in rows]
+                connection.execute(Medication.__table__.insert(), medications)
+                counts['prescription'] += len(batch)
+                counts['medication'] += len(medications)
+            echo(f"{counts['prescription']} prescription rows with {counts['medication']} medications "
+                 f"in {timer.perf_counter() - started:.1f}s")
+    finally:
+        started = timer.perf_counter()
+        with engine.begin() as connection:
+            for _, create in indexes:
+                connection.execute(text(create))
+            rebuild_ledger(connection)
+            connection.execute(text('ANALYZE'))
+        echo(f'Rebuilt {len(indexes)} indexes and the receivables ledger in {timer.perf_counter() - started:.1f}s')
+    return counts
+
+
+seed_cli = AppGroup('seed', help='Generate synthetic clinic data for performance testing.')
+
+
+@seed_cli.command('generate')
+@click.option('--patients', type=int, default=10000, show_default=True)
+@click.option('--appointments', type=int, help='Default: 5 per patient.')
+@click.option('--invoices', type=int, help='Default: one per appointment.')
+@click.option('--prescriptions', type=int, help='Default: one per two appointments.')
+@click.option('--seed', 'seed', type=int, default=42, show_default=True, help='Same seed and end date, same rows.')
+@click.option('--end-date', type=click.DateTime(['%Y-%m-%d']), help='Latest past date. Default: today.')
+@click.option('--years', type=float, default=3, show_default=True, help='Years of history before the end date.')
+@click.option('--batch-size', type=int, default=BATCH_SIZE, show_default=True)
+@click.option('--search-index/--no-search-index', default=True, show_default=True,
+              help='Rebuild the full-text search index afterwards (SQLite only).')
+def generate_command(patients, appointments, invoices, prescriptions, seed, end_date, years, batch_size,
+                     search_index):
+    """Append realistic patients, appointments, invoices and prescriptions.
+
+    Secondary indexes on these tables are dropped while loading, so run it
+    against a local or test database, not one serving traffic.
+    """
+    appointments = patients * 5 if appointments is None else appointments
+    invoices = appointments if invoices is None else invoices
+    prescriptions = appointments // 2 if prescriptions is None else prescriptions
+    started = timer.perf_counter()
+    try:
+        counts = seed_database(patients, appointments, invoices, prescriptions, seed=seed,
+                               end_date=end_date.date() if end_date else None, years=years,
+                               batch_size=batch_size, echo=click.echo)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Seeded {sum(counts.values())} rows in {timer.perf_counter() - started:.1f}s')
+
+    if search_index and db.engine.dialect.name == 'sqlite':
+        from app.utils.search_index import rebuild_index
+        index_started = timer.perf_counter()
+        rebuild_index()
+        click.echo(f'Rebuilt the search index in {timer.perf_counter() - index_started:.1f}s')
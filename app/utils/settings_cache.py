@@ -0,0 +1,119 @@
+import threading
+import time
+from types import MappingProxyType
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from app import db
+from app.models.settings import Settings
+
+# How often (seconds) a worker checks the settings version for changes made
+# by other processes. Changes made in this process apply immediately.
+VERSION_CHECK_INTERVAL = 1.0
+DEFAULT_CLINIC_NAME = 'Dental Clinic'
+
+_lock = threading.RLock()  # reentrant: creating the default row commits, which clears the cache
+_snapshot = None
+_checked_at = 0.0
+
+
+class SettingsSnapshot:
+    """Read-only copy of the clinic Settings row.
+
+    Safe to share between requests and threads, and usable anywhere a
+    Settings instance was read (templates, email rendering, reports).
+    """
+
+    __slots__ = ('_values',)
+
+    def __init__(self, values):
+        object.__setattr__(self, '_values', MappingProxyType(dict(values)))
+
+    def __getattr__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Settings snapshots are read-only; update the Settings row instead')
+
+    @property
+    def currency_display(self):
+        """Return the currency symbol and code"""
+        return f"{self.currency_symbol} ({self.currency})"
+
+    def __repr__(self):
+        return f'<SettingsSnapshot v{self.version} {self.clinic_name}>'
+
+
+def load_settings(session=None):
+    """Return the Settings row, creating the default one if the table is empty."""
+    session = session or db.session
+    settings = session.query(Settings).order_by(Settings.id).first()
+    if settings is None:
+        settings = Settings()
+        settings.clinic_name = DEFAULT_CLINIC_NAME
+        session.add(settings)
+        session.commit()
+    return settings
+
+
+def _take_snapshot():
+    # A private session, so a cache miss never flushes or commits the caller's work
+    with Session(db.engine) as session:
+        settings = load_settings(session)
+        return SettingsSnapshot({
+            attr.key: getattr(settings, attr.key) for attr in Settings.__mapper__.column_attrs
+        })
+
+
+def _current_version():
+    with db.engine.connect() as connection:
+        return connection.execute(select(Settings.version).order_by(Settings.id).limit(1)).scalar()
+
+
+def get_settings():
+    """Return the clinic settings as a cached, immutable snapshot.
+
+    The row is loaded once per process. Every update bumps Settings.version,
+    and each worker compares its copy against the stored version at most
+    once per VERSION_CHECK_INTERVAL.
+    """
+    global _snapshot, _checked_at
+    now = time.monotonic()
+    snapshot = _snapshot
+    if snapshot is not None and now - _checked_at < VERSION_CHECK_INTERVAL:
+        return snapshot
+
+    with _lock:
+        if _snapshot is not None and _snapshot is not snapshot:
+            return _snapshot  # another thread refreshed it meanwhile
+        if snapshot is None or _current_version() != snapshot.version:
+            _snapshot = _take_snapshot()
+        _checked_at = time.monotonic()
+        return _snapshot
+
+
+def clear_cache():
+    global _snapshot
+    with _lock:
+        _snapshot = None
+
+
+def _mark_dirty(mapper, connection, target):
+    Session.object_session(target).info['settings_stale'] = True
+
+
+for _event in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Settings, _event, _mark_dirty)
+
+
+@event.listens_for(Session, 'after_commit')
+def _clear_after_commit(session):
+    if session.info.pop('settings_stale', False):
+        clear_cache()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session):
+    session.info.pop('settings_stale', None)
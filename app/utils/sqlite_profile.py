@@ -0,0 +1,91 @@
+import logging
+import random
+import sqlite3
+import time
+from sqlalchemy import event
+from app import db
+from app.utils.metrics import SQLITE_BUSY, is_sqlite_busy
+
+logger = logging.getLogger(__name__)
+
+# Applied to every new connection by the 'wal' profile. WAL lets readers
+# run alongside the single writer; NORMAL sync is durable across app crashes
+# and only risks the last transactions on power loss.
+WAL_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,          # ms SQLite waits on a lock before SQLITE_BUSY
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -20000,          # negative means KiB, so about 20 MB per connection
+    'temp_store': 'MEMORY',
+}
+BUSY_RETRIES = 3
+BUSY_BACKOFF = 0.05                # seconds before the first retry; doubles each time
+
+
+def _run_with_retry(cursor, execute, *args):
+    for attempt in range(BUSY_RETRIES + 1):
+        try:
+            return execute(*args)
+        except sqlite3.OperationalError as e:
+            # Only safe when the failure left no transaction open: the
+            # implicit BEGIN IMMEDIATE itself was refused, or an
+            # autocommit read was blocked, so nothing has been done yet
+            if attempt == BUSY_RETRIES or not is_sqlite_busy(e) or cursor.connection.in_transaction:
+                raise
+            SQLITE_BUSY.labels('retried').inc()
+            delay = BUSY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5)
+            logger.warning(f"SQLite busy, retrying in {delay:.2f}s (attempt {attempt + 1})")
+            time.sleep(delay)
+
+
+class BusyRetryCursor(sqlite3.Cursor):
+    """Cursor that retries statements refused with SQLITE_BUSY before they started."""
+
+    def execute(self, sql, parameters=()):
+        return _run_with_retry(self, super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        # Materialise generators so a retry sends the same rows again
+        return _run_with_retry(self, super().executemany, sql, list(seq_of_parameters))
+
+
+class BusyRetryConnection(sqlite3.Connection):
+    def cursor(self, factory=BusyRetryCursor):
+        return super().cursor(factory)
+
+
+def _wal_enabled(app):
+    # WAL needs a database file; in-memory databases keep the defaults
+    path = app.config['SQLALCHEMY_DATABASE_URI'].partition('sqlite:///')[2]
+    return app.config.get('SQLITE_PROFILE') == 'wal' and path not in ('', ':memory:')
+
+
+def configure_sqlite_engine(app):
+    """Add the 'wal' profile's driver options; call before db.init_app.
+
+    The driver's isolation level makes the implicit BEGIN that precedes the
+    first INSERT/UPDATE/DELETE a BEGIN IMMEDIATE, so a writer takes the
+    write lock up front instead of failing a lock upgrade half way through.
+    Reads still run without opening a transaction.
+    """
+    if not _wal_enabled(app):
+        return
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    connect_args = options.setdefault('connect_args', {})
+    connect_args.setdefault('isolation_level', 'IMMEDIATE')
+    connect_args.setdefault('factory', BusyRetryConnection)
+
+
+def init_sqlite(app):
+    """Set the profile's pragmas on every new connection; call inside an app context."""
+    if not _wal_enabled(app):
+        return
+    pragmas = dict(WAL_PRAGMAS, **app.config.get('SQLITE_PRAGMAS', {}))
+
+    @event.listens_for(db.engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
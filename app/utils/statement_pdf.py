@@ -0,0 +1,53 @@
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+from app.utils.invoice_pdf import FOOTER_HEIGHT, LETTERHEAD_HEIGHT, MARGIN, PAGE_WIDTH, text_paragraph
+
+DATE_FORMAT = '%b %d, %Y'
+
+
+def render_statement(output, statement, layout):
+    """Lay out one patient's monthly statement on the invoice letterhead.
+
+    ``statement`` is a dict from statements.collect_statements; ``layout``
+    is the InvoiceLayout for the clinic settings.
+    """
+    styles = layout.styles
+    doc = SimpleDocTemplate(output, pagesize=letter, leftMargin=MARGIN, rightMargin=MARGIN,
+                            topMargin=MARGIN + LETTERHEAD_HEIGHT + 12, bottomMargin=MARGIN + FOOTER_HEIGHT,
+                            title=f"Statement {statement['period']} - {statement['name']}")
+    width = PAGE_WIDTH - 2 * MARGIN
+
+    recipient = [statement['name']]
+    recipient += [line for line in (statement['address'], statement['phone'] and f"Phone: {statement['phone']}",
+                                    statement['email'] and f"Email: {statement['email']}") if line]
+    details = [
+        f"Period: {statement['period']}",
+        f"Statement Date: {statement['statement_date'].strftime('%B %d, %Y')}",
+        f"Patient #{statement['patient_id']}",
+    ]
+    header = Table([[
+        [Paragraph('Statement For', styles['heading'])] + [text_paragraph(line, styles['body']) for line in recipient],
+        [Paragraph('Statement', styles['title'])] + [text_paragraph(line, styles['body']) for line in details],
+    ]], colWidths=[width / 2, width / 2])
+    header.setStyle(TableStyle([('VALIGN', (0, 0), (-1, -1), 'TOP'), ('LEFTPADDING', (0, 0), (-1, -1), 0)]))
+
+    rows = [['Invoice', 'Date', 'Due Date', 'Status', 'Total', 'Paid', 'Balance']]
+    for invoice in statement['invoices']:
+        rows.append([invoice['number'], invoice['date'].strftime(DATE_FORMAT), invoice['due_date'].strftime(DATE_FORMAT),
+                     (invoice['status'] or '').replace('_', ' ').title(), layout.money(invoice['total']),
+                     layout.money(invoice['paid']), layout.money(invoice['balance'])])
+    invoices = Table(rows, colWidths=[width - 436, 70, 70, 80, 72, 72, 72], repeatRows=1)
+    invoices.setStyle(layout.items_style)
+
+    totals = Table([
+        ['Billed this period', layout.money(statement['billed'])],
+        ["Paid on this period's invoices", layout.money(statement['paid'])],
+        ['Outstanding Balance', layout.money(statement['outstanding'])],
+    ], colWidths=[width - 100, 100])
+    totals.setStyle(layout.totals_style)
+
+    elements = [header, Spacer(1, 18), invoices, Spacer(1, 12), totals]
+    if statement['carried']:
+        elements += [Spacer(1, 18), text_paragraph(f"Includes {statement['carried']} open invoice(s) from earlier periods.",
+                                                   styles['body'])]
+    doc.build(elements, onFirstPage=layout.draw_page, onLaterPages=layout.draw_page)
@@ -0,0 +1,233 @@
+import csv
+import io
+import multiprocessing
+import os
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import select, union
+from app import db
+from app.models.patient import Patient
+from app.models.invoice import Invoice
+from app.utils.receivables import OPEN_STATUSES
+from app.utils.report_data import parse_month, resolve_range
+from app.utils.settings_cache import get_settings
+
+# Monthly patient statements: every patient with an invoice dated in the
+# month, or an earlier invoice that is still open, gets one PDF listing those
+# invoices, what was paid on them and the outstanding balance. The whole run
+# reads its data in three queries; rendering is spread over a process pool in
+# chunks of patients, and the PDFs are streamed into one ZIP as the chunks
+# come back, so only the chunks in flight are ever held in memory.
+CHUNK_SIZE = 50       # statements per pool task
+TASKS_PER_WORKER = 2  # chunks queued ahead per worker process
+
+MANIFEST_NAME = 'statements.csv'
+MANIFEST_COLUMNS = ('patient_id', 'name', 'email', 'file', 'invoices', 'billed', 'paid', 'outstanding')
+
+
+def _invoice_rows(*conditions):
+    return db.session.query(Invoice.id, Invoice.patient_id, Invoice.date, Invoice.due_date, Invoice.status,
+                            Invoice.total_amount, Invoice.paid_amount)\
+        .filter(*conditions)\
+        .order_by(Invoice.date, Invoice.id)\
+        .all()
+
+
+def collect_statements(statement_range, today=None):
+    """One statement per patient with activity in ``statement_range``, by patient id.
+
+    Activity is an invoice dated in the range or an earlier invoice still
+    open. Three queries cover every patient: the range's invoices (from
+    the date index), the earlier open ones (from the status index) and the
+    patients they belong to. Statements are plain dicts, so they pickle
+    cheaply to the rendering processes.
+    """
+    start, end = statement_range.start, statement_range.end
+    in_period = (Invoice.date >= start, Invoice.date < end)
+    carried_over = (Invoice.status.in_(OPEN_STATUSES), Invoice.date < start)
+
+    period_rows = _invoice_rows(*in_period)
+    carried_rows = _invoice_rows(*carried_over)
+    patient_ids = union(select(Invoice.patient_id).where(*in_period),
+                        select(Invoice.patient_id).where(*carried_over))
+    patients = db.session.query(Patient.id, Patient.first_name, Patient.last_name, Patient.address,
+                                Patient.phone, Patient.email)\
+        .filter(Patient.id.in_(patient_ids))\
+        .order_by(Patient.id)\
+        .all()
+
+    period = start.strftime('%B %Y')
+    statement_date = today or date.today()
+    statements = {}
+    for patient in patients:
+        statements[patient.id] = {
+            'patient_id': patient.id,
+            'name': f'{patient.first_name} {patient.last_name}',
+            'address': patient.address,
+            'phone': patient.phone,
+            'email': patient.email,
+            'period': period,
+            'statement_date': statement_date,
+            'filename': f"statement-{start.strftime('%Y-%m')}-{patient.id:06d}.pdf",
+            'invoices': [],
+            'billed': 0.0,
+            'paid': 0.0,
+            'outstanding': 0.0,
+            'carried': 0,
+        }
+
+    # Earlier open invoices first, so each statement lists its invoices by date
+    for rows, carried in ((carried_rows, True), (period_rows, False)):
+        for row in rows:
+            statement = statements[row.patient_id]
+            total, paid = row.total_amount or 0, row.paid_amount or 0
+            balance = total - paid if row.status in OPEN_STATUSES else 0
+            statement['invoices'].append({
+                'number': Invoice.format_number(row.id, row.date),
+                'date': row.date,
+                'due_date': row.due_date,
+                'status': row.status,
+                'total': total,
+                'paid': paid,
+                'balance': balance,
+            })
+            if carried:
+                statement['carried'] += 1
+            else:
+                statement['billed'] += total
+                statement['paid'] += paid
+            statement['outstanding'] += balance
+    return list(statements.values())
+
+
+# Worker processes -----------------------------------------------------------
+
+_worker_layout = None
+
+
+def _init_worker(fields):
+    """Process pool initializer: lay out the letterhead once per worker."""
+    global _worker_layout
+    from app.utils.invoice_pdf import InvoiceLayout
+    _worker_layout = InvoiceLayout(*fields)
+
+
+def render_chunk(statements, layout=None):
+    """Render ``statements`` to PDFs; returns [(filename, pdf bytes)].
+
+    Runs in a pool process, or inline with an explicit ``layout``.
+    """
+    from app.utils.statement_pdf import render_statement
+    layout = layout or _worker_layout
+    rendered = []
+    for statement in statements:
+        buffer = io.BytesIO()
+        render_statement(buffer, statement, layout)
+        rendered.append((statement['filename'], buffer.getvalue()))
+    return rendered
+
+
+def _rendered_chunks(chunks, workers, settings):
+    """Yield each chunk's rendered PDFs, in order, keeping the pool busy."""
+    from app.utils.invoice_pdf import invoice_layout, layout_fields
+    if not workers:
+        layout = invoice_layout(settings)
+        for chunk in chunks:
+            yield render_chunk(chunk, layout)
+        return
+
+    # spawn, not fork: the parent's engine must not leak into the children
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=_init_worker, initargs=(layout_fields(settings),)) as executor:
+        pending = deque()
+        try:
+            for chunk in chunks:
+                pending.append(executor.submit(render_chunk, chunk))
+                if len(pending) >= workers * TASKS_PER_WORKER:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+# Statement run --------------------------------------------------------------
+
+def write_statements(output_path, statements, workers=0, chunk_size=CHUNK_SIZE, progress=None):
+    """Render ``statements`` into a ZIP at ``output_path``, with a CSV manifest.
+
+    ``workers`` processes render chunks of ``chunk_size`` statements (0
+    renders in this process). The archive is written to a .part file and
+    renamed, so a reader never sees a half-written run. ``progress`` is
+    called with (done, total) after each chunk. Returns the statement count.
+    """
+    progress = progress or (lambda done, total: None)
+    settings = get_settings()
+    db.session.close()  # rendering takes a while; don't hold a read transaction open
+
+    total = len(statements)
+    chunks = [statements[i:i + chunk_size] for i in range(0, total, chunk_size)]
+    manifest = io.StringIO()
+    writer = csv.writer(manifest)
+    writer.writerow(MANIFEST_COLUMNS)
+    partial = output_path + '.part'
+    done = 0
+    progress(done, total)
+    try:
+        # PDF page streams are already compressed, so entries are stored as-is
+        with zipfile.ZipFile(partial, 'w', zipfile.ZIP_STORED) as archive:
+            for chunk, rendered in zip(chunks, _rendered_chunks(chunks, workers, settings)):
+                for statement, (filename, pdf) in zip(chunk, rendered):
+                    archive.writestr(filename, pdf)
+                    writer.writerow([statement['patient_id'], statement['name'], statement['email'] or '', filename,
+                                     len(statement['invoices']), f"{statement['billed']:.2f}",
+                                     f"{statement['paid']:.2f}", f"{statement['outstanding']:.2f}"])
+                done += len(rendered)
+                progress(done, total)
+            archive.writestr(MANIFEST_NAME, manifest.getvalue())
+        os.replace(partial, output_path)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return total
+
+
+statements_cli = AppGroup('statements', help='Generate monthly patient statements.')
+
+
+@statements_cli.command('generate')
+@click.option('--month', help='Statement month as YYYY-MM. Default: last month.')
+@click.option('--output', type=click.Path(dir_okay=False),
+              help='ZIP file to write. Default: instance/statements/statements-YYYY-MM.zip')
+@click.option('--workers', type=int, default=os.cpu_count() or 1, show_default='CPU count',
+              help='Rendering processes; 0 renders in this process.')
+@click.option('--chunk-size', type=int, default=CHUNK_SIZE, show_default=True, help='Statements per task.')
+def generate_command(month, output, workers, chunk_size):
+    """Render a PDF statement for every patient with activity in a month, into one ZIP."""
+    month = month or (date.today().replace(day=1) - timedelta(days=1)).strftime('%Y-%m')
+    if parse_month(month) is None:
+        raise click.BadParameter('expected YYYY-MM', param_hint='--month')
+    if chunk_size < 1:
+        raise click.BadParameter('must be at least 1', param_hint='--chunk-size')
+    if output is None:
+        directory = os.path.join(current_app.instance_path, 'statements')
+        os.makedirs(directory, exist_ok=True)
+        output = os.path.join(directory, f'statements-{month}.zip')
+
+    started = time.perf_counter()
+    statements = collect_statements(resolve_range(start=month, end=month))
+    click.echo(f'{len(statements)} patients with activity in {month} '
+               f'(queried in {time.perf_counter() - started:.1f}s)')
+    with click.progressbar(length=len(statements), label='Rendering statements') as bar:
+        count = write_statements(output, statements, workers, chunk_size,
+                                 progress=lambda done, total: bar.update(done - bar.pos))
+    elapsed = time.perf_counter() - started
+    click.echo(f'Wrote {count} statements to {output} in {elapsed:.1f}s ({count / elapsed:.1f}/s)')
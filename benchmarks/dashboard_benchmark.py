@@ -0,0 +1,109 @@
+"""Measure dashboard query count and latency as the tables grow.
+
+Usage:
+    python benchmarks/dashboard_benchmark.py --sizes 1000 10000 100000 --repeat 20
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from app import create_app, db
+from app.models.user import User
+from app.models.patient import Patient
+from app.models.appointment import Appointment
+from app.models.invoice import Invoice
+from app.utils import dashboard_stats
+
+
+def seed(rows, rng):
+    today = date.today()
+    db.session.execute(Patient.__table__.insert(), [{
+        'id': i, 'first_name': f'First{i}', 'last_name': f'Last{i}',
+        'date_of_birth': date(1980, 1, 1),
+        'created_at': datetime.utcnow() - timedelta(days=rng.randrange(1000)),
+    } for i in range(1, rows + 1)])
+    db.session.execute(Appointment.__table__.insert(), [{
+        'id': i, 'patient_id': rng.randrange(1, rows + 1),
+        'date': today + timedelta(days=rng.randrange(-700, 30)),
+        'time': datetime.strptime(f'{rng.randrange(9, 18)}:00', '%H:%M').time(),
+        'duration': 30, 'status': rng.choice(['scheduled', 'completed', 'cancelled']),
+        'created_at': datetime.utcnow(),
+    } for i in range(1, rows + 1)])
+    invoices = []
+    for i in range(1, rows + 1):
+        total = rng.randrange(50, 2000)
+        status = rng.choice(['paid', 'unpaid', 'partially_paid'])
+        paid = total if status == 'paid' else (total // 2 if status == 'partially_paid' else 0)
+        invoice_date = today - timedelta(days=rng.randrange(700))
+        invoices.append({
+            'id': i, 'patient_id': rng.randrange(1, rows + 1), 'date': invoice_date,
+            'due_date': invoice_date + timedelta(days=30), 'items': [],
+            'subtotal': total, 'total_amount': total, 'paid_amount': paid,
+            'status': status, 'created_at': datetime.utcnow(),
+        })
+    db.session.execute(Invoice.__table__.insert(), invoices)
+    db.session.commit()
+
+
+def measure(client, repeat, cold):
+    statements = []
+    listener = lambda *args: statements.append(1)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    samples = []
+    try:
+        for _ in range(repeat):
+            if cold:
+                dashboard_stats.clear_cache()
+            statements.clear()
+            start = time.perf_counter()
+            response = client.get('/dashboard')
+            samples.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.status_code
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    samples.sort()
+    return len(statements), samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='patients, appointments and invoices to seed per run')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8}{'cold queries':>14}{'cold p50':>12}{'warm queries':>14}{'warm p50':>12}")
+    for rows in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            app = create_app({
+                'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                'AUTO_CREATE_TABLES': True,
+                'EMAIL_OUTBOX_WORKER': 'off',
+                'WTF_CSRF_ENABLED': False,
+            })
+            with app.app_context():
+                seed(rows, random.Random(args.seed))
+                user = User(username='bench', email='bench@example.com')
+                user.set_password('bench')
+                db.session.add(user)
+                db.session.commit()
+
+                client = app.test_client()
+                client.post('/login', data={'username': 'bench', 'password': 'bench'})
+                cold = measure(client, args.repeat, cold=True)
+                warm = measure(client, args.repeat, cold=False)
+                print(f"{rows:>8}{cold[0]:>14}{cold[1] * 1000:>10.1f}ms{warm[0]:>14}{warm[1] * 1000:>10.1f}ms")
+                db.session.remove()
+                db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
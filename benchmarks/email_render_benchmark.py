@@ -0,0 +1,50 @@
+"""Micro-benchmark for appointment email rendering (renders per second).
+
+Compares a full render of the layout for every message with the cached
+per-clinic layout used for real sends.
+
+Usage:
+    python benchmarks/email_render_benchmark.py --iterations 20000
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date, time as time_of_day
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils import email_sender
+
+
+def run(iterations, cold):
+    settings = SimpleNamespace(clinic_name='Bright Smiles Dental', clinic_address='12 High Street, Springfield',
+                               clinic_phone='555-0100', clinic_email='hello@brightsmiles.example')
+    appointment = SimpleNamespace(date=date(2026, 11, 2), time=time_of_day(14, 30),
+                                  treatment_type='Cleaning', duration=30)
+    patients = [SimpleNamespace(first_name=f'Patient {i} <b>') for i in range(100)]
+
+    email_sender._layout_parts.cache_clear()
+    start = time.perf_counter()
+    for i in range(iterations):
+        if cold:
+            email_sender._layout_parts.cache_clear()
+        email_sender.render_appointment_email([appointment], patients[i % 100], settings,
+                                              email_sender.CONFIRMATION_INTRO)
+    return iterations / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+
+    cold = run(args.iterations, cold=True)
+    warm = run(args.iterations, cold=False)
+    print(f'layout rendered per message: {cold:,.0f} renders/s')
+    print(f'cached clinic layout:        {warm:,.0f} renders/s ({warm / cold:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,459 @@
+"""Load-test every blueprint against a seeded database and report latency per endpoint.
+
+Seeds patients with appointments, invoices (with JSON line items) and
+prescriptions (with medications), then drives each scenario in turn from
+--concurrency logged-in clients: list pages with search, filters and deep
+pagination, detail and print views, invoice PDFs, edit forms, creates, edits, status
+changes, dashboard, search, report generation, deletes (of records the run
+created), login and /metrics. Requests go through the Flask test client,
+or with --http through a local threaded server.
+
+Writes p50/p95/p99 latency, throughput and SQL query counts per scenario as
+JSON. With --baseline, compares against an earlier --output file and exits
+with status 1 if a scenario got slower at both p50 and p95 (beyond
+--tolerance), issued more queries, or started failing.
+
+Usage:
+    python benchmarks/load_test.py --patients 2000 --requests 100 --concurrency 4 --output before.json
+    python benchmarks/load_test.py --patients 2000 --requests 100 --concurrency 4 --baseline before.json
+"""
+import argparse
+import http.cookiejar
+import json
+import logging
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import date, timedelta
+from itertools import count
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import g, has_request_context
+from sqlalchemy import event
+from werkzeug.serving import make_server
+from app import create_app, db
+from app.models.user import User
+from app.models.patient import Patient
+from app.models.appointment import Appointment
+from app.models.invoice import Invoice
+from app.models.prescription import Prescription
+from app.models.report_job import ReportJob
+from app.models.settings import Settings
+from app.utils.search_index import rebuild_index
+from app.utils.seed_data import DIAGNOSES, DRUGS, FIRST_NAMES, LAST_NAMES, TREATMENTS, seed_database
+
+
+def invoice_items(rng):
+    items = []
+    for description, price in rng.sample(TREATMENTS, rng.randint(1, 4)):
+        quantity = rng.randint(1, 2)
+        items.append({'description': description, 'quantity': quantity,
+                      'unit_price': float(price), 'total': float(price * quantity)})
+    return items
+
+
+def seed(patients, visits, seed_value):
+    """The clinic's history from 'flask seed generate'; returns the row count per table."""
+    settings = Settings()
+    settings.clinic_name, settings.clinic_email = 'Load Test Dental', 'clinic@example.com'
+    db.session.add(settings)
+    user = User(username='bench', email='bench@example.com', is_admin=True)
+    user.set_password('bench')
+    db.session.add(user)
+    db.session.commit()
+    # Every patient has an email, so resending confirmations always succeeds
+    counts = seed_database(patients, patients * visits, patients * visits, patients * visits // 2,
+                           seed=seed_value, email_rate=1.0)
+    rebuild_index()
+    return counts
+
+
+def install_query_counter(app):
+    """Report each response's SQL statement count in an X-Query-Count header."""
+    def count_statement(*args):
+        if has_request_context():
+            g.load_test_queries = g.get('load_test_queries', 0) + 1
+
+    event.listen(db.engine, 'before_cursor_execute', count_statement)
+
+    @app.after_request
+    def add_query_count(response):
+        response.headers['X-Query-Count'] = str(g.get('load_test_queries', 0))
+        return response
+
+
+class TestClientSession:
+    """One logged-in user on the Flask test client."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, data=None, headers=None):
+        response = self.client.open(path, method=method, data=data, headers=headers)
+        body = response.get_data()
+        response.close()
+        return response.status_code, response.headers, body
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpSession:
+    """One logged-in user talking to the local server over HTTP."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def request(self, method, path, data=None, headers=None):
+        body = urllib.parse.urlencode(data, doseq=True).encode() if data is not None else None
+        request = urllib.request.Request(self.base_url + urllib.parse.quote(path, safe='/?=&%'), data=body, method=method, headers=headers or {})
+        try:
+            with self.opener.open(request) as response:
+                return response.status, response.headers, response.read()
+        except urllib.error.HTTPError as error:
+            return error.code, error.headers, error.read()
+
+
+class Fixture:
+    """Ids the scenarios pick from, refreshed between phases."""
+
+    def __init__(self, counts, rng):
+        self.counts = counts
+        self.rng = rng
+        self.created = {}
+        self.report_jobs = []
+        self.cursors = {}
+        self.lock = threading.Lock()
+
+    def pick(self, table):
+        with self.lock:
+            return self.rng.randint(1, self.counts[table])
+
+    def next_created(self, table):
+        """An id created by this run, each handed out once (for deletes)."""
+        with self.lock:
+            return self.created[table].pop() if self.created.get(table) else 0
+
+    def refresh(self):
+        for model in (Patient, Appointment, Invoice, Prescription):
+            table = model.__table__.name
+            ids = db.session.query(model.id).filter(model.id > self.counts[table]).all()
+            self.created[table] = [row.id for row in ids]
+        self.report_jobs = [row.id for row in ReportJob.query.filter_by(status='done').with_entities(ReportJob.id)]
+        db.session.remove()
+
+
+def patient_form(fixture):
+    rng = fixture.rng
+    return {
+        'first_name': rng.choice(FIRST_NAMES), 'last_name': f'{rng.choice(LAST_NAMES)}New',
+        'date_of_birth': '1985-06-15', 'gender': 'Female', 'phone': '555-0199',
+        'email': 'new.patient@example.com', 'address': '1 Load Street',
+        'chief_complaint': 'Sensitivity', 'medical_dental_history': 'None',
+        'on_examination': 'Caries 36', 'diagnosis': 'Dental caries', 'treatment_plan': 'Filling',
+        'treatment_done': '', 'recall': '6 months',
+    }
+
+
+def appointment_form(fixture, edit=False):
+    form = {
+        'patient_id': fixture.pick('patient'),
+        'date': (date.today() + timedelta(days=fixture.rng.randrange(1, 30))).isoformat(),
+        'time': '11:30', 'treatment_type': 'Cleaning', 'duration': '45', 'notes': 'Load test',
+    }
+    if edit:
+        form['status'] = 'scheduled'
+    return form
+
+
+def invoice_form(fixture, edit=False):
+    items = invoice_items(fixture.rng)
+    form = {
+        'patient_id': fixture.pick('patient'), 'date': date.today().isoformat(),
+        'due_date': (date.today() + timedelta(days=30)).isoformat(), 'notes': 'Load test', 'tax_rate': '5',
+        'item_description[]': [item['description'] for item in items],
+        'item_quantity[]': [str(item['quantity']) for item in items],
+        'item_price[]': [str(item['unit_price']) for item in items],
+    }
+    if edit:
+        form.update(status='unpaid', paid_amount='0')
+    return form
+
+
+def prescription_form(fixture):
+    drugs = fixture.rng.sample(DRUGS, 2)
+    return {
+        'patient_id': fixture.pick('patient'), 'diagnosis': fixture.rng.choice(DIAGNOSES), 'notes': 'Load test',
+        'medication_name[]': [name for name, _ in drugs], 'medication_dosage[]': [dosage for _, dosage in drugs],
+        'medication_frequency[]': ['Twice daily'] * 2, 'medication_duration[]': ['5 days'] * 2,
+        'medication_instructions[]': ['After meals'] * 2,
+    }
+
+
+def settings_form():
+    form = {'clinic_name': 'Load Test Dental', 'clinic_address': '1 Clinic Road', 'clinic_phone': '555-0100',
+            'clinic_email': 'clinic@example.com', 'invoice_prefix': 'INV-', 'default_tax_rate': '0',
+            'invoice_footer': '', 'currency': 'USD'}
+    for day in ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday'):
+        form.update({f'hours_{day}_start': '10:00', f'hours_{day}_end': '20:00'})
+    return form
+
+
+JSON = {'Accept': 'application/json'}
+
+# (name, method, path(fixture), form(fixture) or None, headers), run in this order
+SCENARIOS = [
+    ('dashboard', 'GET', lambda f: '/dashboard', None, None),
+    ('patients.index', 'GET', lambda f: '/patients/', None, None),
+    ('patients.index search', 'GET', lambda f: f'/patients/?search={f.rng.choice(LAST_NAMES).lower()}', None, None),
+    ('patients.index filter', 'GET', lambda f: '/patients/?filter_gender=Female&per_page=50', None, None),
+    ('patients.index deep page', 'GET', lambda f: f"/patients/?cursor={f.cursors['/patients/']}", None, None),
+    ('patients.lookup', 'GET', lambda f: f'/patients/lookup?q={f.rng.choice(FIRST_NAMES)[:3]}', None, None),
+    ('patients.view', 'GET', lambda f: f"/patients/{f.pick('patient')}", None, None),
+    ('patients.view print', 'GET', lambda f: f"/patients/{f.pick('patient')}?print=true", None, None),
+    ('patients.edit form', 'GET', lambda f: f"/patients/{f.pick('patient')}/edit", None, None),
+    ('appointments.index', 'GET', lambda f: '/appointments/', None, None),
+    ('appointments.index search', 'GET', lambda f: f'/appointments/?search={f.rng.choice(FIRST_NAMES)}', None, None),
+    ('appointments.index filter', 'GET',
+     lambda f: f'/appointments/?filter_status=scheduled&filter_date={date.today().isoformat()}', None, None),
+    ('appointments.index deep page', 'GET', lambda f: f"/appointments/?cursor={f.cursors['/appointments/']}", None, None),
+    ('appointments.edit form', 'GET', lambda f: f"/appointments/{f.pick('appointment')}/edit", None, None),
+    ('invoices.index', 'GET', lambda f: '/invoices/', None, None),
+    ('invoices.index search', 'GET', lambda f: f'/invoices/?search={f.rng.choice(LAST_NAMES)}', None, None),
+    ('invoices.index filter', 'GET', lambda f: '/invoices/?filter_status=unpaid&per_page=50', None, None),
+    ('invoices.index deep page', 'GET', lambda f: f"/invoices/?cursor={f.cursors['/invoices/']}", None, None),
+    ('invoices.view', 'GET', lambda f: f"/invoices/{f.pick('invoice')}", None, None),
+    ('invoices.view print', 'GET', lambda f: f"/invoices/{f.pick('invoice')}?print=true", None, None),
+    ('invoices.pdf', 'GET', lambda f: f"/invoices/{f.pick('invoice')}/pdf", None, None),
+    ('invoices.edit form', 'GET', lambda f: f"/invoices/{f.pick('invoice')}/edit", None, None),
+    ('prescriptions.index', 'GET', lambda f: '/prescriptions', None, None),
+    ('prescriptions.index search', 'GET', lambda f: f'/prescriptions?search={f.rng.choice(DIAGNOSES).split()[-1]}', None, None),
+    ('prescriptions.index filter', 'GET',
+     lambda f: f'/prescriptions?filter_date={(date.today() - timedelta(days=f.rng.randrange(365))).isoformat()}', None, None),
+    ('prescriptions.view', 'GET', lambda f: f"/prescriptions/{f.pick('prescription')}", None, None),
+    ('prescriptions.view print', 'GET', lambda f: f"/prescriptions/{f.pick('prescription')}?print=true", None, None),
+    ('prescriptions.edit form', 'GET', lambda f: f"/prescriptions/{f.pick('prescription')}/edit", None, None),
+    ('search', 'GET', lambda f: f'/search?q={f.rng.choice(LAST_NAMES)}', None, JSON),
+    ('settings', 'GET', lambda f: '/settings', None, None),
+    ('reports.index', 'GET', lambda f: '/reports', None, None),
+    ('patients.new', 'POST', lambda f: '/patients/new', patient_form, None),
+    ('appointments.new', 'POST', lambda f: '/appointments/new', appointment_form, None),
+    ('invoices.new', 'POST', lambda f: '/invoices/new', invoice_form, None),
+    ('prescriptions.new', 'POST', lambda f: '/prescriptions/new', prescription_form, None),
+    ('patients.edit', 'POST', lambda f: f"/patients/{f.pick('patient')}/edit", patient_form, None),
+    ('appointments.edit', 'POST', lambda f: f"/appointments/{f.pick('appointment')}/edit",
+     lambda f: appointment_form(f, edit=True), None),
+    ('invoices.edit', 'POST', lambda f: f"/invoices/{f.pick('invoice')}/edit", lambda f: invoice_form(f, edit=True), None),
+    ('invoices.update_status', 'POST', lambda f: f"/invoices/{f.pick('invoice')}/status",
+     lambda f: {'status': 'partially_paid', 'paid_amount': '10'}, None),
+    ('prescriptions.edit', 'POST', lambda f: f"/prescriptions/{f.pick('prescription')}/edit", prescription_form, None),
+    ('appointments.resend_email', 'GET', lambda f: f"/appointments/{f.pick('appointment')}/resend-email", None, None),
+    ('settings.update', 'POST', lambda f: '/settings', lambda f: settings_form(), None),
+    ('reports.create_job', 'POST', lambda f: '/reports/jobs',
+     lambda f: {'months': str(f.rng.choice([3, 6, 12]))}, JSON),
+    ('reports.generate_report', 'GET', lambda f: f'/generate_report?months={f.rng.choice([3, 6, 12])}', None, None),
+    ('reports.job', 'GET', lambda f: f'/reports/jobs/{f.rng.choice(f.report_jobs)}', None, None),
+    ('reports.job_status', 'GET', lambda f: f'/reports/jobs/{f.rng.choice(f.report_jobs)}/status', None, None),
+    ('reports.download', 'GET', lambda f: f'/reports/jobs/{f.rng.choice(f.report_jobs)}/download', None, None),
+    ('appointments.delete', 'POST', lambda f: f"/appointments/{f.next_created('appointment')}/delete", lambda f: {}, None),
+    ('invoices.delete', 'POST', lambda f: f"/invoices/{f.next_created('invoice')}/delete", lambda f: {}, None),
+    ('prescriptions.delete', 'POST', lambda f: f"/prescriptions/{f.next_created('prescription')}/delete",
+     lambda f: {}, None),
+    ('patients.delete', 'POST', lambda f: f"/patients/{f.next_created('patient')}/delete", lambda f: {}, None),
+    ('auth.login form', 'GET', lambda f: '/login', None, None),
+    ('auth.login', 'POST', lambda f: '/login', lambda f: {'username': 'bench', 'password': 'bench'}, None),
+    ('metrics', 'GET', lambda f: '/metrics', None, None),
+]
+
+# Need a finished report job from the earlier report scenarios
+REPORT_JOB_SCENARIOS = ('reports.job', 'reports.job_status', 'reports.download')
+
+
+def deep_cursor(session, path, pages):
+    """Follow 'next' links from the first page and return the cursor ``pages`` deep."""
+    cursor = None
+    for _ in range(pages):
+        _, _, body = session.request('GET', path + (f'?cursor={cursor}' if cursor else ''))
+        found = re.findall(r'cursor=([A-Za-z0-9_\-=%]+)', body.decode())
+        if not found:
+            break
+        cursor = found[-1]
+    return cursor or ''
+
+
+def run_scenario(sessions, fixture, scenario, requests):
+    name, method, path, form, headers = scenario
+    remaining = count()
+    results, failures = [], []
+
+    def work(session):
+        try:
+            while next(remaining) < requests:
+                url = path(fixture)
+                data = form(fixture) if form else None
+                start = time.perf_counter()
+                status, response_headers, _ = session.request(method, url, data=data, headers=headers)
+                elapsed = time.perf_counter() - start
+                results.append((elapsed, status, int(response_headers.get('X-Query-Count', 0))))
+        except Exception as e:
+            failures.append(e)
+
+    threads = [threading.Thread(target=work, args=(session,)) for session in sessions]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    if failures:
+        raise RuntimeError(f'{name} failed') from failures[0]
+
+    latencies = sorted(elapsed * 1000 for elapsed, _, _ in results)
+    queries = [query_count for _, _, query_count in results]
+    return {
+        'requests': len(results),
+        'errors': sum(status >= 400 for _, status, _ in results),
+        'statuses': sorted({status for _, status, _ in results}),
+        'throughput_rps': round(len(results) / wall, 1),
+        'p50_ms': round(percentile(latencies, 0.50), 2),
+        'p95_ms': round(percentile(latencies, 0.95), 2),
+        'p99_ms': round(percentile(latencies, 0.99), 2),
+        'queries_median': statistics.median(queries),
+        'queries_max': max(queries),
+    }
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))] if values else float('nan')
+
+
+def compare(results, baseline, tolerance, min_ms):
+    """Regression messages for scenarios that got slower, chattier or started failing."""
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        # A real slowdown moves the median too; a noisy tail alone does not
+        if all(current[key] > before[key] * (1 + tolerance) and current[key] - before[key] > min_ms
+               for key in ('p50_ms', 'p95_ms')):
+            regressions.append(f"{name}: p50 {before['p50_ms']:.1f}ms -> {current['p50_ms']:.1f}ms, "
+                               f"p95 {before['p95_ms']:.1f}ms -> {current['p95_ms']:.1f}ms")
+        if current['queries_median'] > before['queries_median']:
+            regressions.append(f"{name}: queries {before['queries_median']} -> {current['queries_median']}")
+        if current['errors'] and not before['errors']:
+            regressions.append(f"{name}: {current['errors']} errors, statuses {current['statuses']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patients', type=int, default=2000)
+    parser.add_argument('--visits', type=int, default=5, help='appointments and invoices per patient')
+    parser.add_argument('--requests', type=int, default=100, help='requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--http', action='store_true', help='go through a local threaded HTTP server')
+    parser.add_argument('--scenario', action='append', help='only run scenarios starting with this (repeatable)')
+    parser.add_argument('--report-workers', type=int, default=0,
+                        help='REPORT_WORKERS for the run; 0 renders reports inside the request')
+    parser.add_argument('--output', help='write the results as JSON here (default: stdout)')
+    parser.add_argument('--baseline', help='JSON from an earlier --output run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help='allowed p50 and p95 slowdown, as a fraction')
+    parser.add_argument('--min-ms', type=float, default=5, help='ignore slowdowns smaller than this')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)  # the routes log every create
+
+    scenarios = [scenario for scenario in SCENARIOS
+                 if not args.scenario or scenario[0].startswith(tuple(args.scenario))]
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'load.db')}",
+            'AUTO_CREATE_TABLES': True,
+            'EMAIL_OUTBOX_WORKER': 'off',
+            'REPORT_WORKERS': args.report_workers,
+            'REPORT_SPOOL_DIR': os.path.join(tmp, 'reports'),
+            'REPORT_CACHE_DIR': os.path.join(tmp, 'report_cache'),
+            'INVOICE_PDF_CACHE_DIR': os.path.join(tmp, 'invoice_pdfs'),
+            'WTF_CSRF_ENABLED': False,
+        })
+        with app.app_context():
+            started = time.perf_counter()
+            counts = seed(args.patients, args.visits, args.seed)
+            print(f"Seeded {', '.join(f'{n} {table}s' for table, n in counts.items())} "
+                  f"in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+            install_query_counter(app)
+
+        server = None
+        if args.http:
+            server = make_server('127.0.0.1', 0, app, threaded=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            sessions = [HttpSession(f'http://127.0.0.1:{server.port}') for _ in range(args.concurrency)]
+        else:
+            sessions = [TestClientSession(app) for _ in range(args.concurrency)]
+        for session in sessions:
+            session.request('POST', '/login', data={'username': 'bench', 'password': 'bench'})
+
+        fixture = Fixture(counts, rng)
+        for path in ('/patients/', '/appointments/', '/invoices/'):
+            fixture.cursors[path] = deep_cursor(sessions[0], path, 20)
+
+        results = {}
+        print(f"{'scenario':<34}{'req/s':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}{'errors':>8}",
+              file=sys.stderr)
+        for scenario in scenarios:
+            with app.app_context():
+                fixture.refresh()
+            if scenario[0] in REPORT_JOB_SCENARIOS and not fixture.report_jobs:
+                continue  # no finished report to look at (report scenarios filtered out)
+            result = run_scenario(sessions, fixture, scenario, args.requests)
+            results[scenario[0]] = result
+            print(f"{scenario[0]:<34}{result['throughput_rps']:>8.1f}{result['p50_ms']:>7.1f}ms"
+                  f"{result['p95_ms']:>7.1f}ms{result['p99_ms']:>7.1f}ms{result['queries_median']:>9g}"
+                  f"{result['errors']:>8}", file=sys.stderr)
+        if server:
+            server.shutdown()
+        with app.app_context():
+            db.engine.dispose()
+
+    output = {
+        'config': {key: getattr(args, key) for key in ('patients', 'visits', 'requests', 'concurrency', 'http',
+                                                       'report_workers', 'seed')},
+        'rows': counts,
+        'scenarios': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=2)
+    else:
+        print(json.dumps(output, indent=2))
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('config') != output['config']:
+            print(f"Warning: baseline was run with {baseline.get('config')}", file=sys.stderr)
+        regressions = compare(results, baseline['scenarios'], args.tolerance, args.min_ms)
+        for regression in regressions:
+            print(f'REGRESSION: {regression}', file=sys.stderr)
+        print(f'{len(results)} scenarios compared, {len(regressions)} regressions', file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
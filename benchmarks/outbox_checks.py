@@ -0,0 +1,278 @@
+"""Check the email outbox sender against a local aiosmtpd server.
+
+Requires aiosmtpd (pip install aiosmtpd). Covers:
+
+- connection reuse: a drain sends every batch over one SMTP session
+- retry and backoff: temporary rejections are requeued with a doubling
+  delay, sent once the server accepts them, and failed after MAX_ATTEMPTS
+- permanent failures: a 5xx recipient refusal fails at once, a 4xx one
+  is retried
+- lost connections: the message is requeued and the next batch reconnects
+- crash recovery: 'sending' rows whose lease expired are claimed again,
+  rows with a live lease are left alone
+- slow batches: each message's lease is renewed before it is sent, rows
+  recovered by another worker mid-batch are skipped, and a worker whose
+  message was reclaimed while sending leaves the new claim's status alone
+
+Exits with status 1 if any check fails.
+
+Usage:
+    python benchmarks/outbox_checks.py
+"""
+import os
+import socket
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiosmtpd.controller import Controller
+from app import create_app, db
+from app.models.email_outbox import EmailOutbox
+from app.utils.email_outbox import LEASE_TIMEOUT, MAX_ATTEMPTS, OutboxSender, drain_outbox, enqueue_email, retry_delay
+
+failures = []
+
+
+def check(condition, message):
+    print(f"{'ok  ' if condition else 'FAIL'}  {message}")
+    if not condition:
+        failures.append(message)
+
+
+class Server:
+    """SMTP stand-in whose replies depend on the recipient's local part.
+
+    reject@ is refused with 550 at RCPT, busy@ with 451; flaky@ gets 451
+    after DATA while ``flaky_failures`` lasts. Everything else is accepted.
+    """
+
+    def __init__(self):
+        self.connections = 0
+        self.delivered = []
+        self.flaky_failures = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.connections += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith('reject@'):
+            return '550 5.1.1 No such user'
+        if address.startswith('busy@'):
+            return '451 4.2.1 Mailbox busy, try again later'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        if any(rcpt.startswith('flaky@') for rcpt in envelope.rcpt_tos) and self.flaky_failures:
+            self.flaky_failures -= 1
+            return '451 4.3.0 Temporary failure, try again later'
+        self.delivered.extend(envelope.rcpt_tos)
+        return '250 OK'
+
+
+class Listener:
+    """Starts and stops ``handler`` on one port; aiosmtpd controllers cannot be restarted."""
+
+    def __init__(self, handler):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            self.port = sock.getsockname()[1]
+        self.handler = handler
+        self.controller = None
+
+    def start(self):
+        self.controller = Controller(self.handler, hostname='127.0.0.1', port=self.port)
+        self.controller.start()
+
+    def stop(self):
+        if self.controller is not None:
+            self.controller.stop()
+            self.controller = None
+
+
+def queue(recipient, count=1):
+    messages = [enqueue_email(recipient, 'Check', '<p>Check</p>', 'Check') for _ in range(count)]
+    db.session.commit()
+    return [message.id for message in messages]
+
+
+def reload(message_id):
+    db.session.expire_all()
+    return db.session.get(EmailOutbox, message_id)
+
+
+def make_due(message_id):
+    EmailOutbox.query.filter_by(id=message_id).update({'next_attempt_at': datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+
+
+def check_connection_reuse(app, server):
+    queue('patient@example.com', 45)
+    before = server.connections
+    claimed = drain_outbox(app, concurrency=1, batch_size=10)
+    check(claimed == 45 and EmailOutbox.query.filter_by(status='sent').count() == 45,
+          'a drain sends all 45 queued messages')
+    check(server.connections - before == 1, f'5 batches shared {server.connections - before} SMTP connection(s)')
+
+
+def check_retry_and_backoff(sender, server):
+    server.flaky_failures = 2
+    message_id, = queue('flaky@example.com')
+
+    for attempt in (1, 2):
+        sender.run_once()
+        message = reload(message_id)
+        delay = (message.next_attempt_at - message.claimed_at).total_seconds()
+        check(message.status == 'queued' and message.attempts == attempt and abs(delay - retry_delay(attempt)) < 1,
+              f'temporary failure {attempt} is requeued {delay:.0f}s later (expected {retry_delay(attempt)}s)')
+        check(sender.run_once() == 0, f'the message is not retried before its backoff after attempt {attempt}')
+        make_due(message_id)
+
+    sender.run_once()
+    message = reload(message_id)
+    check(message.status == 'sent' and message.attempts == 3 and message.last_error is None,
+          'the message is sent once the server accepts it')
+
+    server.flaky_failures = 1
+    message_id, = queue('flaky@example.com')
+    EmailOutbox.query.filter_by(id=message_id).update({'attempts': MAX_ATTEMPTS - 1})
+    db.session.commit()
+    sender.run_once()
+    message = reload(message_id)
+    check(message.status == 'failed' and message.attempts == MAX_ATTEMPTS,
+          f'a message failing its attempt {MAX_ATTEMPTS} is given up on')
+    server.flaky_failures = 0
+
+
+def check_recipient_refusals(sender, server):
+    rejected_id, = queue('reject@example.com')
+    busy_id, = queue('busy@example.com')
+    ok_id, = queue('after@example.com')
+    expected = server.connections + (sender.smtp is None)  # the batch opens at most one connection
+    sender.run_once()
+    rejected, busy = reload(rejected_id), reload(busy_id)
+    check(rejected.status == 'failed' and rejected.attempts == 1 and '550' in rejected.last_error,
+          'a 550 recipient refusal fails permanently on the first attempt')
+    check(busy.status == 'queued' and busy.next_attempt_at > datetime.utcnow() and '451' in busy.last_error,
+          'a 451 recipient refusal is retried later')
+    check(reload(ok_id).status == 'sent' and server.connections == expected,
+          'the next message in the batch goes out over the same connection')
+
+
+def check_lost_connection(sender, server, listener):
+    listener.stop()
+    message_id, = queue('patient@example.com')
+    sender.run_once()
+    message = reload(message_id)
+    check(message.status == 'queued' and message.attempts == 1 and sender.smtp is None,
+          'a message whose connection fails is requeued and the connection dropped')
+    listener.start()
+    make_due(message_id)
+    before = server.connections
+    sender.run_once()
+    check(reload(message_id).status == 'sent' and server.connections == before + 1,
+          'the next batch reconnects and sends it')
+
+
+def check_crash_recovery(sender, server):
+    stale_id, live_id = queue('stale@example.com')[0], queue('live@example.com')[0]
+    now = datetime.utcnow()
+    for message_id, claimed_at in ((stale_id, now - timedelta(seconds=LEASE_TIMEOUT + 5)),
+                                   (live_id, now - timedelta(seconds=10))):
+        EmailOutbox.query.filter_by(id=message_id).update(
+            {'status': 'sending', 'claim_token': 'crashed', 'claimed_at': claimed_at, 'attempts': 1})
+    db.session.commit()
+
+    sender.run_once()
+    stale, live = reload(stale_id), reload(live_id)
+    check(stale.status == 'sent' and stale.attempts == 2 and server.delivered.count('stale@example.com') == 1,
+          'a message orphaned in sending past its lease is claimed again and sent once')
+    check(live.status == 'sending' and live.claim_token == 'crashed' and 'live@example.com' not in server.delivered,
+          'a message with a live lease is left to its worker')
+
+
+def check_slow_batch(sender, server):
+    ids = [queue(f'lease{i}@example.com')[0] for i in range(3)]
+    rival = OutboxSender()
+    send = sender._send
+    state = {'stolen': None}
+
+    def slow_send(config, message):
+        if state['stolen'] is None:
+            # The batch has outlived its lease: only the message being sent was
+            # just renewed, so a rival worker recovers and sends the rest
+            expired = datetime.utcnow() - timedelta(seconds=LEASE_TIMEOUT + 5)
+            EmailOutbox.query.filter(EmailOutbox.id.in_(ids[1:])).update({'claimed_at': expired})
+            db.session.commit()
+            state['stolen'] = rival.run_once()
+        send(config, message)
+
+    sender._send = slow_send
+    try:
+        sender.run_once()
+    finally:
+        del sender._send
+        rival.close()
+    check(state['stolen'] == 2 and all(reload(message_id).status == 'sent' for message_id in ids),
+          'a rival worker recovers the unsent tail of a batch whose lease expired')
+    check(all(server.delivered.count(f'lease{i}@example.com') == 1 for i in range(3)),
+          'the slow worker skips the recovered messages instead of sending them again')
+
+    message_id, = queue('lease3@example.com')
+    state = {}
+
+    def reclaimed_send(config, message):
+        # Sending outlasts the lease and another worker claims the message meanwhile
+        EmailOutbox.query.filter_by(id=message_id).update({'claim_token': 'rival'})
+        db.session.commit()
+        send(config, message)
+
+    sender._send = reclaimed_send
+    try:
+        sender.run_once()
+    finally:
+        del sender._send
+    message = reload(message_id)
+    check(message.status == 'sending' and message.claim_token == 'rival',
+          "a worker whose message was reclaimed while sending leaves the new claim's status alone")
+
+
+def main():
+    server = Server()
+    listener = Listener(server)
+    listener.start()
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            app = create_app({
+                'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'check.db')}",
+                'AUTO_CREATE_TABLES': True,
+                'EMAIL_OUTBOX_WORKER': 'off',
+            })
+            os.environ.update({'SMTP_HOST': '127.0.0.1', 'SMTP_PORT': str(listener.port), 'SMTP_USE_SSL': '0',
+                               'GMAIL_USER': 'clinic@example.com', 'GMAIL_APP_PASSWORD': ''})
+            with app.app_context():
+                check_connection_reuse(app, server)
+                sender = OutboxSender()
+                try:
+                    check_retry_and_backoff(sender, server)
+                    check_recipient_refusals(sender, server)
+                    check_lost_connection(sender, server, listener)
+                    check_crash_recovery(sender, server)
+                    check_slow_batch(sender, server)
+                finally:
+                    sender.close()
+                db.session.remove()
+                db.engine.dispose()
+    finally:
+        listener.stop()
+
+    print(f'{len(failures)} checks failed' if failures else 'all checks passed')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
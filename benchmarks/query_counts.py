@@ -0,0 +1,144 @@
+"""Check that every list and detail page issues a fixed number of SQL queries.
+
+Each page is requested with a small and a large page size (and, for detail
+pages, for a record with a short and a long history). The query count must
+not change; any difference means a relationship is being lazy-loaded per row.
+Neither count may exceed the page's budget in BUDGETS either, so an extra
+query per page (a redundant eager load, say) fails the check too. Exits with
+status 1 on a regression.
+
+Usage:
+    python benchmarks/query_counts.py
+"""
+import argparse
+import os
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from app import create_app, db
+from app.models.user import User
+from app.models.patient import Patient
+from app.models.appointment import Appointment
+from app.models.invoice import Invoice
+from app.models.prescription import Prescription, Medication
+
+# Most queries each page may issue once per-process caches are warm. List
+# pages count their rows and fetch a page; prescriptions add one selectin
+# load for the medications.
+BUDGETS = {
+    '/dashboard': 2,
+    '/appointments/': 2,
+    '/invoices/': 2,
+    '/prescriptions': 3,
+    '/patients/': 2,
+    '/patients/{}': 5,
+    '/patients/{}?print=true': 4,
+    '/invoices/{}': 1,
+    '/prescriptions/{}': 2,
+    '/prescriptions/{}/edit': 2,
+    '/appointments/{}/edit': 1,
+}
+LIST_PAGES = ['/appointments/', '/invoices/', '/prescriptions', '/patients/']
+
+
+def seed(patients):
+    today = date.today()
+    for i in range(1, patients + 1):
+        # Patient 1 has a single record of each kind, the rest have many
+        visits = 1 if i == 1 else 30
+        patient = Patient(first_name=f'First{i}', last_name=f'Last{i}', date_of_birth=date(1980, 1, 1),
+                          phone='555-0100', email=f'p{i}@example.com')
+        db.session.add(patient)
+        db.session.flush()
+        for v in range(visits):
+            day = today - timedelta(days=v)
+            db.session.add(Appointment(patient_id=patient.id, date=day,
+                                       time=datetime.strptime('10:00', '%H:%M').time(),
+                                       status='completed', treatment_type='Checkup'))
+            db.session.add(Invoice(patient_id=patient.id, date=day, due_date=day + timedelta(days=30),
+                                   items=[], subtotal=100, total_amount=100, status='unpaid'))
+            prescription = Prescription(patient_id=patient.id, date=day, diagnosis='Caries')
+            db.session.add(prescription)
+            db.session.flush()
+            for m in range(3):
+                db.session.add(Medication(prescription_id=prescription.id, name=f'Drug {m}', dosage='1 tab'))
+    user = User(username='bench', email='bench@example.com')
+    user.set_password('bench')
+    db.session.add(user)
+    db.session.commit()
+
+
+def count_queries(client, url):
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert response.status_code == 200, f'{url} returned {response.status_code}'
+    return len(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patients', type=int, default=40)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'counts.db')}",
+            'AUTO_CREATE_TABLES': True,
+            'EMAIL_OUTBOX_WORKER': 'off',
+        })
+        with app.app_context():
+            seed(args.patients)
+            client = app.test_client()
+            client.post('/login', data={'username': 'bench', 'password': 'bench'})
+
+            short_patient = Patient.query.filter_by(first_name='First1').one()
+            long_patient = Patient.query.filter_by(first_name='First2').one()
+
+            def first_id(model, patient):
+                return model.query.filter_by(patient_id=patient.id).first().id
+
+            # (budget key, small page, large page)
+            checks = [('/dashboard', '/dashboard', '/dashboard')]
+            checks += [(url, f'{url}?per_page=5', f'{url}?per_page=50') for url in LIST_PAGES]
+            for path in ('/patients/{}', '/patients/{}?print=true'):
+                checks.append((path, path.format(short_patient.id), path.format(long_patient.id)))
+            for path, model in (('/invoices/{}', Invoice), ('/prescriptions/{}', Prescription),
+                                ('/prescriptions/{}/edit', Prescription), ('/appointments/{}/edit', Appointment)):
+                checks.append((path, path.format(first_id(model, short_patient)),
+                               path.format(first_id(model, long_patient))))
+
+            # Warm per-process caches (settings, dashboard stats) before counting
+            for _, small, large in checks:
+                client.get(small)
+                client.get(large)
+
+            failures = 0
+            print(f"{'page':<36}{'small':>8}{'large':>8}{'budget':>8}")
+            for key, small, large in checks:
+                small_count, large_count = count_queries(client, small), count_queries(client, large)
+                budget = BUDGETS[key]
+                if small_count != large_count:
+                    flag = '  <-- grows with page size'
+                elif large_count > budget:
+                    flag = '  <-- over budget'
+                else:
+                    flag = ''
+                failures += bool(flag)
+                print(f'{small:<36}{small_count:>8}{large_count:>8}{budget:>8}{flag}')
+            db.session.remove()
+            db.engine.dispose()
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
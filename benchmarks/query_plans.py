@@ -0,0 +1,189 @@
+"""Check that the queries behind each page are served by indexes.
+
+Requests every list page (plain, filtered and on a later cursor page), the
+detail pages, the dashboard, reports, search and the patient lookup, collects
+the clinic report's and a monthly statement run's datasets and sweeps overdue
+invoices, records the SQL all of this issues, and runs EXPLAIN QUERY PLAN on
+each statement with the parameters it was executed with. A full table scan,
+or an ORDER BY that sorts every row of a table instead of walking an index,
+is reported as a regression and the script exits with status 1.
+
+Scans that are intended (the one-row settings table, the receivables ledger
+with one row per due date, a primary key walk with a LIMIT) are listed in
+ALLOWED_SCANS.
+
+Usage:
+    python benchmarks/query_plans.py [--verbose]
+"""
+import argparse
+import html
+import os
+import re
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event
+from app import create_app, db
+from app.models.user import User
+from app.models.patient import Patient
+from app.models.appointment import Appointment
+from app.models.invoice import Invoice
+from app.models.prescription import Prescription, Medication
+from app.utils.receivables import sweep_overdue
+from app.utils.report_data import resolve_range
+from app.utils.report_pdf import collect_report_data
+from app.utils.statements import collect_statements
+
+today = date.today().isoformat()
+PAGES = [
+    '/dashboard',
+    '/appointments/', '/appointments/?filter_status=scheduled', f'/appointments/?filter_date={today}',
+    '/invoices/', '/invoices/?filter_status=pending', f'/invoices/?filter_date={today}',
+    '/prescriptions', f'/prescriptions?filter_date={today}',
+    '/patients/', '/patients/lookup?q=last1', '/patients/lookup?q=first1 last1',
+    '/reports', '/search?q=caries',
+]
+# Pages whose "next" link is followed to check the keyset seek predicate too
+CURSOR_PAGES = ['/appointments/', '/appointments/?filter_status=scheduled', '/invoices/',
+                '/invoices/?filter_status=pending', '/patients/']
+
+# (table, statement pattern) pairs that may scan the whole table
+ALLOWED_SCANS = [
+    ('settings', re.compile(r'')),
+    ('receivable_day', re.compile(r'')),
+    ('patient', re.compile(r'FROM patient ORDER BY patient\.id DESC\s+LIMIT')),
+]
+
+SCAN = re.compile(r'^SCAN (\w+)( USING .*)?$')
+
+
+def seed(patients):
+    day = date.today()
+    for i in range(1, patients + 1):
+        patient = Patient(first_name=f'First{i}', last_name=f'Last{i}', date_of_birth=date(1980, 1, 1),
+                          phone='555-0100', email=f'p{i}@example.com')
+        db.session.add(patient)
+        db.session.flush()
+        for v in range(3):
+            when = day - timedelta(days=v)
+            db.session.add(Appointment(patient_id=patient.id, date=when,
+                                       time=datetime.strptime(f'{9 + v}:00', '%H:%M').time(),
+                                       status='scheduled', treatment_type='Checkup'))
+            db.session.add(Invoice(patient_id=patient.id, date=when, due_date=when + timedelta(days=30),
+                                   items=[{'description': 'Checkup', 'quantity': 1, 'unit_price': 100.0, 'total': 100.0}],
+                                   subtotal=100, total_amount=100, status='pending'))
+            prescription = Prescription(patient_id=patient.id, date=when, diagnosis='Caries')
+            db.session.add(prescription)
+            db.session.flush()
+            db.session.add(Medication(prescription_id=prescription.id, name='Drug', dosage='1 tab'))
+    user = User(username='bench', email='bench@example.com')
+    user.set_password('bench')
+    db.session.add(user)
+    db.session.commit()
+
+
+def record(label, statements, call):
+    def listener(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'UPDATE')) and not executemany:
+            statements.setdefault(statement, (label, parameters))
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        return call()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+
+
+def capture(client, url, statements):
+    response = record(url, statements, lambda: client.get(url))
+    assert response.status_code == 200, f'{url} returned {response.status_code}'
+    return response
+
+
+def next_page(response):
+    match = re.search(r'href="([^"]*cursor=[^"]*)"[^>]*>\s*Next', response.get_data(as_text=True))
+    return html.unescape(match.group(1)) if match else None
+
+
+def problems(plan, statement, tables):
+    """Plan lines that read a whole table, or sort a whole table for ORDER BY."""
+    found = []
+    full_scans = []
+    for detail in plan:
+        match = SCAN.match(detail)
+        if not match or match.group(1) not in tables:
+            continue  # subquery and constant-row scans
+        full_scans.append(detail)
+        if match.group(2) is None and not any(table == match.group(1) and pattern.search(statement)
+                                              for table, pattern in ALLOWED_SCANS):
+            found.append(detail)
+    if full_scans:
+        found += [detail for detail in plan if detail.startswith('USE TEMP B-TREE FOR ORDER BY')]
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patients', type=int, default=60)
+    parser.add_argument('--verbose', action='store_true', help='print every plan, not just regressions')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'plans.db')}",
+            'AUTO_CREATE_TABLES': True,
+            'EMAIL_OUTBOX_WORKER': 'off',
+            'REPORT_WORKERS': 0,
+        })
+        with app.app_context():
+            seed(args.patients)
+            client = app.test_client()
+            client.post('/login', data={'username': 'bench', 'password': 'bench'})
+
+            statements = {}
+            for url in PAGES:
+                response = capture(client, url, statements)
+                if url in CURSOR_PAGES:
+                    later = next_page(response)
+                    assert later, f'{url} has no next page; seed more patients'
+                    capture(client, later, statements)
+            patient = Patient.query.filter_by(first_name='First2').one()
+            for path, model in (('/patients/{}', Patient), ('/invoices/{}', Invoice),
+                                ('/prescriptions/{}', Prescription), ('/appointments/{}/edit', Appointment)):
+                record_id = patient.id if model is Patient else \
+                    model.query.filter_by(patient_id=patient.id).first().id
+                capture(client, path.format(record_id), statements)
+            # The PDF report is rendered off the request, so query its dataset directly
+            with app.test_request_context():
+                record('report data', statements, lambda: collect_report_data(resolve_range(months=12)))
+            last_month = (date.today().replace(day=1) - timedelta(days=1)).strftime('%Y-%m')
+            record('statement data', statements,
+                   lambda: collect_statements(resolve_range(start=last_month, end=last_month)))
+            record('overdue sweep', statements, lambda: sweep_overdue(date.today() + timedelta(days=60)))
+
+            failures = 0
+            connection = db.engine.raw_connection()
+            try:
+                for statement, (url, parameters) in statements.items():
+                    rows = connection.cursor().execute(f'EXPLAIN QUERY PLAN {statement}', parameters).fetchall()
+                    plan = [row[-1] for row in rows]
+                    found = problems(plan, statement, db.metadata.tables)
+                    failures += bool(found)
+                    if found or args.verbose:
+                        print(f"{'REGRESSION' if found else 'ok'}  {url}")
+                        print(f"    {' '.join(statement.split())[:200]}")
+                        for detail in plan:
+                            print(f"      {'!' if detail in found else ' '} {detail}")
+            finally:
+                connection.close()
+            print(f'{len(statements)} statements checked, {failures} with table scans or unindexed sorts')
+            db.session.remove()
+            db.engine.dispose()
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Measure reminder throughput (messages per second) against a local SMTP sink.
+
+Requires aiosmtpd (pip install aiosmtpd).
+
+Usage:
+    python benchmarks/reminder_benchmark.py --patients 5000 --concurrency 1 2 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiosmtpd.controller import Controller
+from app import create_app, db
+from app.models.patient import Patient
+from app.models.appointment import Appointment
+from app.models.settings import Settings
+from app.utils.email_outbox import drain_outbox
+from app.utils.reminders import queue_reminders
+
+
+class Sink:
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return '250 OK'
+
+
+def seed(patients):
+    settings = Settings()
+    settings.clinic_name = 'Benchmark Dental'
+    settings.email_appointment_reminders = True
+    db.session.add(settings)
+    db.session.execute(Patient.__table__.insert(), [
+        {'id': i, 'first_name': f'First{i}', 'last_name': f'Last{i}',
+         'date_of_birth': date(1980, 1, 1), 'email': f'patient{i}@example.com'}
+        for i in range(1, patients + 1)
+    ])
+    tomorrow = date.today() + timedelta(days=1)
+    db.session.execute(Appointment.__table__.insert(), [
+        {'patient_id': i, 'date': tomorrow, 'time': datetime(2000, 1, 1, 9 + i % 8).time(),
+         'duration': 30, 'status': 'scheduled', 'treatment_type': 'Cleaning'}
+        for i in range(1, patients + 1)
+    ])
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patients', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--port', type=int, default=8025)
+    args = parser.parse_args()
+
+    sink = Sink()
+    controller = Controller(sink, hostname='127.0.0.1', port=args.port)
+    controller.start()
+    os.environ.update({'SMTP_HOST': '127.0.0.1', 'SMTP_PORT': str(args.port), 'SMTP_USE_SSL': '0',
+                       'GMAIL_USER': 'clinic@example.com', 'GMAIL_APP_PASSWORD': ''})
+    try:
+        for concurrency in args.concurrency:
+            with tempfile.TemporaryDirectory() as tmp:
+                app = create_app({
+                    'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                    'AUTO_CREATE_TABLES': True,
+                    'EMAIL_OUTBOX_WORKER': 'off',
+                })
+                with app.app_context():
+                    seed(args.patients)
+                    received_before = sink.received
+
+                    start = time.perf_counter()
+                    queued = queue_reminders()
+                    queue_time = time.perf_counter() - start
+                    drain_outbox(app, concurrency=concurrency)
+                    total_time = time.perf_counter() - start
+
+                    # A second run must find nothing to do
+                    start = time.perf_counter()
+                    requeued = queue_reminders()
+                    rerun_time = time.perf_counter() - start
+
+                    sent = sink.received - received_before
+                    print(f'concurrency={concurrency}: queued {queued} in {queue_time:.2f}s, '
+                          f'delivered {sent} in {total_time:.2f}s '
+                          f'({sent / total_time:.0f} msg/s); idempotent rerun queued {requeued} '
+                          f'in {rerun_time * 1000:.1f}ms')
+                    db.session.remove()
+                    db.engine.dispose()
+    finally:
+        controller.stop()
+
+
+if __name__ == '__main__':
+    main()
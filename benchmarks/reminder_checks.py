@@ -0,0 +1,149 @@
+"""Check appointment reminder bookkeeping against a temporary database.
+
+- A reminded appointment that is rescheduled through the edit page is
+  reminded again for its new slot; an edit that keeps the slot is not.
+- Overlapping 'flask reminders send' runs queue each reminder exactly once.
+
+Exits with status 1 if any check fails.
+
+Usage:
+    python benchmarks/reminder_checks.py [--patients 500] [--runs 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models.user import User
+from app.models.patient import Patient
+from app.models.appointment import Appointment
+from app.models.email_outbox import EmailOutbox
+from app.models.settings import Settings
+from app.utils.reminders import queue_reminders
+
+failures = []
+
+
+def check(condition, message):
+    print(f"{'ok  ' if condition else 'FAIL'}  {message}")
+    if not condition:
+        failures.append(message)
+
+
+def seed(patients, day):
+    settings = Settings()
+    settings.clinic_name = 'Check Dental'
+    settings.email_appointment_reminders = True
+    db.session.add(settings)
+    user = User(username='check', email='check@example.com')
+    user.set_password('check')
+    db.session.add(user)
+    db.session.execute(Patient.__table__.insert(), [
+        {'id': i, 'first_name': f'First{i}', 'last_name': f'Last{i}',
+         'date_of_birth': date(1980, 1, 1), 'email': f'patient{i}@example.com'}
+        for i in range(1, patients + 1)
+    ])
+    db.session.execute(Appointment.__table__.insert(), [
+        {'patient_id': i, 'date': day, 'time': datetime(2000, 1, 1, 9 + i % 8).time(),
+         'duration': 30, 'status': 'scheduled', 'treatment_type': 'Cleaning'}
+        for i in range(1, patients + 1)
+    ])
+    db.session.commit()
+
+
+def reminders_for(appointment_id):
+    return EmailOutbox.query.filter_by(category='appointment_reminder', appointment_id=appointment_id).count()
+
+
+def check_reschedule(app, day):
+    client = app.test_client()
+    client.post('/login', data={'username': 'check', 'password': 'check'})
+    appointment = Appointment.query.filter_by(patient_id=1).one()
+    check(queue_reminders(day) > 0 and reminders_for(appointment.id) == 1, 'appointment is reminded once')
+
+    form = {'date': day.isoformat(), 'time': appointment.time.strftime('%H:%M'), 'treatment_type': 'Cleaning',
+            'duration': '30', 'status': 'scheduled', 'notes': 'Bring X-rays'}
+    client.post(f'/appointments/{appointment.id}/edit', data=form)
+    db.session.expire_all()
+    check(db.session.get(Appointment, appointment.id).reminder_sent_at is not None,
+          'editing the notes keeps the reminder marker')
+    check(queue_reminders(day) == 0 and reminders_for(appointment.id) == 1, 'an unchanged slot is not reminded again')
+
+    new_day = day + timedelta(days=1)
+    client.post(f'/appointments/{appointment.id}/edit', data=dict(form, date=new_day.isoformat()))
+    db.session.expire_all()
+    check(db.session.get(Appointment, appointment.id).reminder_sent_at is None,
+          'rescheduling clears the reminder marker')
+    check(queue_reminders(new_day) == 1 and reminders_for(appointment.id) == 2,
+          'the rescheduled appointment is reminded for its new slot')
+
+    client.post(f'/appointments/{appointment.id}/edit', data=dict(form, date=new_day.isoformat(), time='17:45'))
+    db.session.expire_all()
+    check(db.session.get(Appointment, appointment.id).reminder_sent_at is None,
+          'moving to another time on the same day clears the reminder marker')
+    db.session.remove()
+
+
+def check_overlapping_runs(app, day, patients, runs):
+    queued = []
+    barrier = threading.Barrier(runs)
+
+    def run():
+        with app.app_context():
+            barrier.wait()
+            queued.append(queue_reminders(day))
+            db.session.remove()
+
+    threads = [threading.Thread(target=run) for _ in range(runs)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    per_appointment = Counter(appointment_id for appointment_id, in db.session.query(EmailOutbox.appointment_id)
+                              .filter(EmailOutbox.category == 'appointment_reminder'))
+    check(len(queued) == runs, f'{runs} overlapping runs finished without errors')
+    check(sum(queued) == patients, f'overlapping runs queued {sum(queued)} reminders in total, expected {patients}')
+    check(max(per_appointment.values(), default=0) == 1, 'no appointment was queued twice')
+    db.session.remove()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patients', type=int, default=500)
+    parser.add_argument('--runs', type=int, default=4, help='concurrent reminder runs')
+    args = parser.parse_args()
+
+    day = date.today() + timedelta(days=1)
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'check.db')}",
+            'AUTO_CREATE_TABLES': True,
+            'EMAIL_OUTBOX_WORKER': 'off',
+            'WTF_CSRF_ENABLED': False,
+        })
+        with app.app_context():
+            seed(args.patients, day)
+            check_reschedule(app, day)
+
+        # Every appointment moves to a fresh, unreminded day for the concurrency check
+        with app.app_context():
+            Appointment.query.update({'date': day + timedelta(days=7), 'reminder_sent_at': None},
+                                     synchronize_session=False)
+            EmailOutbox.query.delete()
+            db.session.commit()
+            check_overlapping_runs(app, day + timedelta(days=7), args.patients, args.runs)
+            db.engine.dispose()
+
+    print(f'{len(failures)} checks failed' if failures else 'all checks passed')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Compare clinic report data queries: per-month EXTRACT loop vs. GROUP BY over a date range.
+
+Usage:
+    python benchmarks/report_benchmark.py --invoices 1000000 --repeat 5
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import event, extract, func
+from app import create_app, db
+from app.models.patient import Patient
+from app.models.appointment import Appointment
+from app.models.invoice import Invoice
+from app.utils.report_data import resolve_range, monthly_revenue, report_summary
+
+CHUNK = 50000
+
+
+def seed(invoices, patients, appointments, rng):
+    today = date.today()
+    db.session.execute(Patient.__table__.insert(), [{
+        'id': i, 'first_name': f'First{i}', 'last_name': f'Last{i}',
+        'date_of_birth': date(1980, 1, 1),
+        'created_at': datetime.utcnow() - timedelta(days=rng.randrange(1500)),
+    } for i in range(1, patients + 1)])
+    db.session.execute(Appointment.__table__.insert(), [{
+        'id': i, 'patient_id': rng.randrange(1, patients + 1),
+        'date': today + timedelta(days=rng.randrange(-1500, 30)),
+        'time': datetime.strptime(f'{rng.randrange(9, 18)}:00', '%H:%M').time(),
+        'duration': 30, 'status': rng.choice(['scheduled', 'completed', 'cancelled']),
+        'created_at': datetime.utcnow(),
+    } for i in range(1, appointments + 1)])
+    for offset in range(0, invoices, CHUNK):
+        rows = []
+        for i in range(offset + 1, min(offset + CHUNK, invoices) + 1):
+            total = rng.randrange(50, 2000)
+            invoice_date = today - timedelta(days=rng.randrange(1800))
+            rows.append({
+                'id': i, 'patient_id': rng.randrange(1, patients + 1), 'date': invoice_date,
+                'due_date': invoice_date + timedelta(days=30), 'subtotal': total,
+                'total_amount': total, 'paid_amount': 0, 'status': 'unpaid',
+                'created_at': datetime.utcnow(),
+            })
+        db.session.execute(Invoice.__table__.insert(), rows)
+    db.session.commit()
+    db.session.execute(db.text('ANALYZE'))
+
+
+def legacy_report(months):
+    """The report queries as they were: separate counts and one EXTRACT SUM per month."""
+    thirty_days_ago = datetime.now() - timedelta(days=30)
+    Patient.query.count()
+    Appointment.query.count()
+    Invoice.query.count()
+    db.session.query(func.sum(Invoice.total_amount)).scalar()
+    Patient.query.filter(Patient.created_at >= thirty_days_ago).count()
+    Appointment.query.filter(Appointment.date >= thirty_days_ago).count()
+    db.session.query(func.sum(Invoice.total_amount)).filter(Invoice.date >= thirty_days_ago).scalar()
+    Appointment.query.filter(Appointment.date >= datetime.now()).count()
+    Appointment.query.filter(Appointment.status == 'completed').count()
+    Appointment.query.filter(Appointment.status == 'cancelled').count()
+    today = date.today()
+    for i in range(months - 1, -1, -1):
+        month_index = today.year * 12 + today.month - 1 - i
+        db.session.query(func.sum(Invoice.total_amount))\
+            .filter(extract('year', Invoice.date) == month_index // 12)\
+            .filter(extract('month', Invoice.date) == month_index % 12 + 1)\
+            .scalar()
+
+
+def current_report(months):
+    report_range = resolve_range(months)
+    report_summary(report_range)
+    monthly_revenue(report_range)
+
+
+def measure(func_, months, repeat):
+    statements = []
+    listener = lambda *args: statements.append(1)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    samples = []
+    try:
+        for _ in range(repeat):
+            statements.clear()
+            start = time.perf_counter()
+            func_(months)
+            samples.append(time.perf_counter() - start)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    samples.sort()
+    return len(statements), samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--invoices', type=int, default=1000000)
+    parser.add_argument('--patients', type=int, default=20000)
+    parser.add_argument('--appointments', type=int, default=200000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            'AUTO_CREATE_TABLES': True,
+            'EMAIL_OUTBOX_WORKER': 'off',
+        })
+        with app.app_context():
+            print(f'Seeding {args.invoices} invoices...')
+            start = time.perf_counter()
+            seed(args.invoices, args.patients, args.appointments, random.Random(args.seed))
+            print(f'Seeded in {time.perf_counter() - start:.1f}s')
+
+            print(f"{'months':>8}{'old queries':>13}{'old p50':>12}{'new queries':>13}{'new p50':>12}{'speedup':>10}")
+            for months in (6, 12, 24, 36):
+                old = measure(legacy_report, months, args.repeat)
+                new = measure(current_report, months, args.repeat)
+                print(f"{months:>8}{old[0]:>13}{old[1] * 1000:>10.0f}ms{new[0]:>13}{new[1] * 1000:>10.0f}ms"
+                      f"{old[1] / new[1]:>9.1f}x")
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Compare list-view search latency: LIKE scans vs. the FTS5 search index.
+
+Usage:
+    python benchmarks/search_benchmark.py --rows 100000 --repeat 20
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models.patient import Patient
+from app.models.appointment import Appointment
+from app.utils import search_index
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda',
+               'David', 'Elizabeth', 'Priya', 'Arjun', 'Wei', 'Fatima', 'Carlos', 'Sofia']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis',
+              'Sharma', 'Patel', 'Chen', 'Khan', 'Lopez', 'Rossi', 'Nguyen', 'Kowalski']
+TREATMENTS = ['Cleaning', 'Filling', 'Root canal', 'Extraction', 'Crown', 'Whitening',
+              'Checkup', 'Orthodontic review', 'Implant consultation', 'Scaling']
+
+
+def seed(rows, rng):
+    patients = []
+    for i in range(1, rows + 1):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        patients.append({
+            'id': i, 'first_name': first, 'last_name': f'{last}{i % 997}',
+            'date_of_birth': date(1950, 1, 1) + timedelta(days=rng.randrange(25000)),
+            'email': f'{first.lower()}.{last.lower()}{i}@example.com',
+            'phone': f'555-{rng.randrange(10000):04d}',
+            'created_at': datetime.utcnow(),
+        })
+    db.session.execute(Patient.__table__.insert(), patients)
+
+    appointments = []
+    for i in range(1, rows + 1):
+        appointments.append({
+            'id': i, 'patient_id': rng.randrange(1, rows + 1),
+            'date': date.today() - timedelta(days=rng.randrange(1500)),
+            'time': datetime.strptime(f'{rng.randrange(9, 18)}:00', '%H:%M').time(),
+            'duration': 30, 'status': 'completed',
+            'treatment_type': rng.choice(TREATMENTS),
+            'notes': f'Follow up in {rng.randrange(1, 12)} months',
+            'created_at': datetime.utcnow(),
+        })
+    db.session.execute(Appointment.__table__.insert(), appointments)
+    db.session.commit()
+
+
+def list_view_query(kind, term):
+    if kind == 'patient':
+        query = Patient.query.filter(search_index.search_filter('patient', term))
+        query = query.order_by(Patient.last_name, Patient.first_name)
+    else:
+        query = Appointment.query.join(Patient).filter(search_index.search_filter('appointment', term))
+        query = query.order_by(Appointment.date.desc(), Appointment.time.asc())
+    return query.paginate(page=1, per_page=10, error_out=False)
+
+
+def time_queries(terms, repeat):
+    timings = {}
+    for kind in ('patient', 'appointment'):
+        samples = []
+        for _ in range(repeat):
+            for term in terms:
+                start = time.perf_counter()
+                list_view_query(kind, term)
+                samples.append(time.perf_counter() - start)
+        samples.sort()
+        timings[kind] = (samples[len(samples) // 2], samples[int(len(samples) * 0.95)])
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000, help='patients and appointments to seed')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+                          'AUTO_CREATE_TABLES': True})
+        with app.app_context():
+            print(f'Seeding {args.rows} patients and appointments...')
+            seed(args.rows, random.Random(args.seed))
+            terms = ['smi', 'patel42', 'root', 'jennifer', 'james.brown']
+
+            # LIKE path: the index table does not exist yet
+            like = time_queries(terms, args.repeat)
+
+            start = time.perf_counter()
+            search_index.rebuild_index()
+            print(f'Index rebuild: {time.perf_counter() - start:.2f}s')
+            fts = time_queries(terms, args.repeat)
+
+            print(f"{'view':<12}{'LIKE p50':>12}{'LIKE p95':>12}{'FTS p50':>12}{'FTS p95':>12}{'speedup':>10}")
+            for kind in ('patient', 'appointment'):
+                print(f"{kind:<12}{like[kind][0] * 1000:>10.1f}ms{like[kind][1] * 1000:>10.1f}ms"
+                      f"{fts[kind][0] * 1000:>10.1f}ms{fts[kind][1] * 1000:>10.1f}ms"
+                      f"{like[kind][0] / fts[kind][0]:>9.1f}x")
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""Concurrent write throughput and read latency under each SQLite profile.
+
+Starts separate writer and reader processes against one database file, as
+several gunicorn workers would. Writers commit an appointment plus an
+invoice per operation; readers run the invoice list query and a whole-table
+invoice aggregate like the dashboard's. Each profile runs on a fresh copy of
+the same seeded database.
+
+Usage:
+    python benchmarks/sqlite_concurrency.py [--writers 4] [--readers 4] [--seconds 10]
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func
+from sqlalchemy.exc import OperationalError
+
+PROFILES = ('default', 'wal')
+
+
+def make_app(path, profile):
+    from app import create_app
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'AUTO_CREATE_TABLES': True,
+        'EMAIL_OUTBOX_WORKER': 'off',
+        'REPORT_WORKERS': 0,
+        'SQLITE_PROFILE': profile,
+    })
+
+
+def seed(path, patients, invoices_per_patient):
+    from app import db
+    from app.models.patient import Patient
+    from app.models.invoice import Invoice
+    app = make_app(path, 'default')
+    today = date.today()
+    with app.app_context():
+        db.session.execute(Patient.__table__.insert(), [
+            {'first_name': f'First{i}', 'last_name': f'Last{i}', 'date_of_birth': date(1980, 1, 1)}
+            for i in range(patients)
+        ])
+        db.session.execute(Invoice.__table__.insert(), [
+            {'patient_id': p + 1, 'date': today - timedelta(days=n), 'due_date': today,
+             'items': [], 'subtotal': 100, 'total_amount': 100, 'status': 'pending'}
+            for p in range(patients) for n in range(invoices_per_patient)
+        ])
+        db.session.commit()
+        db.engine.dispose()
+
+
+def writer(path, profile, seconds, barrier, results):
+    from app import db
+    from app.models.appointment import Appointment
+    from app.models.invoice import Invoice
+    app = make_app(path, profile)
+    latencies, errors = [], 0
+    with app.app_context():
+        barrier.wait()
+        stop = time.monotonic() + seconds
+        n = 0
+        while time.monotonic() < stop:
+            n += 1
+            start = time.perf_counter()
+            try:
+                db.session.add(Appointment(patient_id=n % 100 + 1, date=date.today(),
+                                           time=datetime.strptime('10:00', '%H:%M').time(), status='scheduled'))
+                db.session.add(Invoice(patient_id=n % 100 + 1, date=date.today(), due_date=date.today(),
+                                       items=[], subtotal=50, total_amount=50, status='pending'))
+                db.session.commit()
+                latencies.append(time.perf_counter() - start)
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+        db.engine.dispose()
+    results.put(('write', latencies, errors))
+
+
+def reader(path, profile, seconds, barrier, results):
+    from app import db
+    from app.models.invoice import Invoice
+    from app.models.patient import Patient
+    app = make_app(path, profile)
+    latencies, errors = [], 0
+    with app.app_context():
+        barrier.wait()
+        stop = time.monotonic() + seconds
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            try:
+                Invoice.query.join(Patient)\
+                    .order_by(Invoice.date.desc(), Invoice.id.desc())\
+                    .limit(20)\
+                    .all()
+                db.session.query(func.count(Invoice.id), func.sum(Invoice.total_amount)).one()
+                latencies.append(time.perf_counter() - start)
+            except OperationalError:
+                errors += 1
+            db.session.rollback()
+        db.engine.dispose()
+    results.put(('read', latencies, errors))
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000 if values else float('nan')
+
+
+def run(template, tmp, profile, args):
+    path = os.path.join(tmp, f'{profile}.db')
+    shutil.copyfile(template, path)
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(args.writers + args.readers)
+    results = context.Queue()
+    processes = [context.Process(target=writer, args=(path, profile, args.seconds, barrier, results))
+                 for _ in range(args.writers)]
+    processes += [context.Process(target=reader, args=(path, profile, args.seconds, barrier, results))
+                  for _ in range(args.readers)]
+    for process in processes:
+        process.start()
+    collected = {'write': ([], 0), 'read': ([], 0)}
+    for _ in processes:
+        kind, latencies, errors = results.get()
+        previous, previous_errors = collected[kind]
+        collected[kind] = (previous + latencies, previous_errors + errors)
+    for process in processes:
+        process.join()
+
+    writes, write_errors = collected['write']
+    reads, read_errors = collected['read']
+    print(f"{profile:<9}{len(writes) / args.seconds:>10.1f}{write_errors:>8}{percentile(writes, 0.95):>10.1f}"
+          f"{len(reads) / args.seconds:>10.1f}{read_errors:>8}"
+          f"{percentile(reads, 0.5):>9.1f}{percentile(reads, 0.95):>9.1f}{percentile(reads, 0.99):>9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--patients', type=int, default=2000)
+    parser.add_argument('--invoices', type=int, default=25, help='invoices per patient')
+    parser.add_argument('--profile', choices=PROFILES, action='append', help='default: all profiles')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        template = os.path.join(tmp, 'template.db')
+        seed(template, args.patients, args.invoices)
+        print(f'{args.writers} writers, {args.readers} readers, {args.seconds:g}s, '
+              f'{args.patients * args.invoices} invoices')
+        print(f"{'profile':<9}{'writes/s':>10}{'errors':>8}{'w p95ms':>10}"
+              f"{'reads/s':>10}{'errors':>8}{'r p50ms':>9}{'r p95ms':>9}{'r p99ms':>9}")
+        for profile in args.profile or PROFILES:
+            run(template, tmp, profile, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+"""Measure app startup: import time, create_app() and the first request.
+
+Each run starts a fresh interpreter under ``python -X importtime``, as a
+gunicorn worker boot would, imports the app, calls create_app() against a
+migrated database, then logs in and loads the dashboard. Exits with status 1
+if a run imports a module that should stay lazy (ReportLab, Alembic) or the
+median time to first response exceeds --max-ms.
+
+Usage:
+    python benchmarks/startup_benchmark.py [--runs 5] [--top 10] [--max-ms 1500]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Only needed once a report is generated or 'flask db' runs
+LAZY_MODULES = ('reportlab', 'alembic', 'flask_migrate')
+
+
+def config(path):
+    return {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'EMAIL_OUTBOX_WORKER': 'off',
+        'WTF_CSRF_ENABLED': False,
+    }
+
+
+def prepare(path):
+    from app import create_app, db
+    from app.models.user import User
+    app = create_app(dict(config(path), AUTO_CREATE_TABLES=True))
+    with app.app_context():
+        user = User(username='bench', email='bench@example.com')
+        user.set_password('bench')
+        db.session.add(user)
+        db.session.commit()
+        db.engine.dispose()
+
+
+def child(path):
+    """One cold start; prints the timings as JSON on stdout."""
+    start = time.perf_counter()
+    from app import create_app
+    imported = time.perf_counter()
+    app = create_app(config(path))
+    created = time.perf_counter()
+    client = app.test_client()
+    client.post('/login', data={'username': 'bench', 'password': 'bench'})
+    status = client.get('/dashboard').status_code
+    served = time.perf_counter()
+    print(json.dumps({
+        'import_ms': (imported - start) * 1000,
+        'create_ms': (created - imported) * 1000,
+        'first_request_ms': (served - created) * 1000,
+        'total_ms': (served - start) * 1000,
+        'status': status,
+        'lazy_loaded': sorted({name.partition('.')[0] for name in sys.modules} & set(LAZY_MODULES)),
+    }))
+
+
+def parse_importtime(stderr):
+    """Self time in ms per top-level package, from -X importtime output."""
+    totals = Counter()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        totals[name.strip().partition('.')[0]] += int(self_us) / 1000
+    return totals
+
+
+def run(path):
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', os.path.abspath(__file__), '--child', path],
+        cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode:
+        sys.exit(result.stderr)
+    return json.loads(result.stdout.splitlines()[-1]), parse_importtime(result.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='packages to list by import time')
+    parser.add_argument('--max-ms', type=float, default=1500,
+                        help='fail when the median time to first response is above this')
+    parser.add_argument('--child', metavar='DB', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args.child)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'startup.db')
+        prepare(path)
+        runs = [run(path) for _ in range(args.runs)]
+
+    timings = [timing for timing, _ in runs]
+    print(f"{'':<16}{'median':>10}{'min':>10}{'max':>10}")
+    for key, label in (('import_ms', 'import app'), ('create_ms', 'create_app()'),
+                       ('first_request_ms', 'first request'), ('total_ms', 'total')):
+        values = [timing[key] for timing in timings]
+        print(f"{label:<16}{statistics.median(values):>8.0f}ms{min(values):>8.0f}ms{max(values):>8.0f}ms")
+
+    packages = Counter()
+    for _, totals in runs:
+        packages.update(totals)
+    print(f'\nImport time by package (self time, mean of {args.runs} runs):')
+    for name, ms in packages.most_common(args.top):
+        print(f'{name:<24}{ms / args.runs:>8.1f}ms')
+
+    failures = []
+    loaded = sorted({name for timing in timings for name in timing['lazy_loaded']})
+    if loaded:
+        failures.append(f"imported at startup: {', '.join(loaded)}")
+    if any(timing['status'] != 200 for timing in timings):
+        failures.append(f"dashboard returned {[timing['status'] for timing in timings]}")
+    median = statistics.median(timing['total_ms'] for timing in timings)
+    if median > args.max_ms:
+        failures.append(f'median time to first response {median:.0f}ms is over {args.max_ms:.0f}ms')
+    for failure in failures:
+        print(f'REGRESSION: {failure}')
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Measure monthly statement throughput (statements per second, and per core).
+
+Seeds a clinic history with 'flask seed generate', queries one month's
+statements once, then renders them into a ZIP with each --workers count
+(0 renders in this process). Per-core throughput divides by the number of
+rendering processes, capped at the CPUs available.
+
+Usage:
+    python benchmarks/statement_benchmark.py --patients 10000 --workers 0 1 2 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db
+from app.models.settings import Settings
+from app.utils.report_data import resolve_range
+from app.utils.seed_data import seed_database
+from app.utils.statements import CHUNK_SIZE, collect_statements, write_statements
+
+
+def seed(patients, visits):
+    settings = Settings()
+    settings.clinic_name, settings.clinic_address = 'Benchmark Dental', '12 High Street\nSpringfield'
+    settings.clinic_phone, settings.clinic_email = '555-0100', 'clinic@example.com'
+    db.session.add(settings)
+    db.session.commit()
+    seed_database(patients, patients * visits, patients * visits, 0, years=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patients', type=int, default=5000)
+    parser.add_argument('--visits', type=int, default=5, help='appointments and invoices per patient')
+    parser.add_argument('--workers', type=int, nargs='+', default=[0, 1, os.cpu_count() or 1])
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    month = (date.today().replace(day=1) - timedelta(days=1)).strftime('%Y-%m')
+    cores = os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            'AUTO_CREATE_TABLES': True,
+            'EMAIL_OUTBOX_WORKER': 'off',
+        })
+        with app.app_context():
+            seed(args.patients, args.visits)
+            start = time.perf_counter()
+            statements = collect_statements(resolve_range(start=month, end=month))
+            invoices = sum(len(statement['invoices']) for statement in statements)
+            print(f'{month}: {len(statements)} statements, {invoices} invoices listed, '
+                  f'queried in {(time.perf_counter() - start) * 1000:.0f}ms ({cores} CPUs)')
+
+            for workers in args.workers:
+                output = os.path.join(tmp, f'statements-{workers}.zip')
+                start = time.perf_counter()
+                count = write_statements(output, statements, workers, args.chunk_size)
+                elapsed = time.perf_counter() - start
+                with zipfile.ZipFile(output) as archive:
+                    assert len(archive.namelist()) == count + 1
+                used = max(1, min(workers, cores))
+                print(f'workers={workers}: {count} statements in {elapsed:.2f}s, '
+                      f'{count / elapsed:.1f}/s, {count / elapsed / used:.1f}/s per core, '
+                      f'{os.path.getsize(output) / 1024 / 1024:.1f} MB')
+            db.session.remove()
+            db.engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,20 @@
+# gunicorn reads this file from the working directory automatically.
+import os
+import shutil
+
+# Workers (and the report processes they start) write Prometheus samples
+# here so /metrics can aggregate them; see app/utils/metrics.py.
+metrics_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR',
+                                    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'metrics'))
+
+from prometheus_client import multiprocess  # noqa: E402  (reads the variable above at import)
+
+
+def on_starting(server):
+    # Samples from a previous run would otherwise be added to the new totals
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+
+def child_exit(server, worker):
+    multiprocess.mark_process_dead(worker.pid)
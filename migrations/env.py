@@ -51,6 +51,14 @@ def get_metadata():
     return target_db.metadata
 
 
+# The FTS5 search index and its shadow tables are created by migration
+# a3f1c9d2e7b4, not by the models, so autogenerate must not try to drop them
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == 'table' and (name == 'search_index' or name.startswith('search_index_')):
+        return False
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -65,7 +73,8 @@ def run_migrations_offline():
     """
     url = config.get_main_option("sqlalchemy.url")
     context.configure(
-        url=url, target_metadata=get_metadata(), literal_binds=True
+        url=url, target_metadata=get_metadata(), literal_binds=True,
+        include_object=include_object
     )
 
     with context.begin_transaction():
@@ -100,6 +109,7 @@ def run_migrations_online():
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
+            include_object=include_object,
             **conf_args
         )
 
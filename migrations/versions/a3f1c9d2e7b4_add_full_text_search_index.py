@@ -0,0 +1,52 @@
+"""Add full-text search index
+
+Revision ID: a3f1c9d2e7b4
+Revises: 15d19425858b
+Create Date: 2026-10-17 09:12:41.508112
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f1c9d2e7b4'
+down_revision = '15d19425858b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 is SQLite-only; other databases keep using the LIKE search fallback
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+        "kind UNINDEXED, ref_id UNINDEXED, name, body, "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    )
+    op.execute(
+        "INSERT INTO search_index (kind, ref_id, name, body) "
+        "SELECT 'patient', id, coalesce(first_name, '') || ' ' || coalesce(last_name, ''), "
+        "coalesce(email, '') || ' ' || coalesce(phone, '') FROM patient"
+    )
+    op.execute(
+        "INSERT INTO search_index (kind, ref_id, name, body) "
+        "SELECT 'appointment', id, '', coalesce(treatment_type, '') || ' ' || coalesce(notes, '') FROM appointment"
+    )
+    op.execute(
+        "INSERT INTO search_index (kind, ref_id, name, body) "
+        "SELECT 'prescription', id, '', coalesce(diagnosis, '') || ' ' || coalesce(notes, '') FROM prescription"
+    )
+    op.execute(
+        "INSERT INTO search_index (kind, ref_id, name, body) "
+        "SELECT 'invoice', id, '', coalesce(notes, '') FROM invoice"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("DROP TABLE IF EXISTS search_index")
@@ -0,0 +1,103 @@
+"""Add invoice items
+
+Revision ID: b7e2d4f9a316
+Revises: 9c4d2f7e1a63
+Create Date: 2026-10-17 18:21:06.384120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2d4f9a316'
+down_revision = '9c4d2f7e1a63'
+branch_labels = None
+depends_on = None
+
+# Invoices copied per transaction by the backfill
+CHUNK_SIZE = 5000
+
+_INSERT_COLUMNS = 'invoice_id, position, description, quantity, unit_price, total, treatment_code'
+
+# One row per element of invoice.items for invoices with low <= id < high
+# that have no rows yet, as app.utils.invoice_items expands them at this
+# revision. Kept here so later changes to the app can't alter the backfill.
+EXPAND_ITEMS_SQL = {
+    'sqlite': (
+        f"INSERT INTO invoice_item ({_INSERT_COLUMNS}) "
+        "SELECT invoice.id, item.key, "
+        "coalesce(json_extract(item.value, '$.description'), ''), "
+        "coalesce(CAST(json_extract(item.value, '$.quantity') AS INTEGER), 1), "
+        "coalesce(CAST(json_extract(item.value, '$.unit_price') AS REAL), 0), "
+        "coalesce(CAST(json_extract(item.value, '$.total') AS REAL), "
+        "coalesce(CAST(json_extract(item.value, '$.quantity') AS INTEGER), 1) "
+        "* coalesce(CAST(json_extract(item.value, '$.unit_price') AS REAL), 0)), "
+        "json_extract(item.value, '$.treatment_code') "
+        "FROM invoice, json_each(CASE WHEN json_valid(invoice.items) THEN invoice.items END) AS item "
+        "WHERE invoice.id >= :low AND invoice.id < :high "
+        "AND typeof(item.key) = 'integer' AND item.type = 'object' "
+        "AND NOT EXISTS (SELECT 1 FROM invoice_item WHERE invoice_item.invoice_id = invoice.id) "
+        "ORDER BY invoice.id, item.key"
+    ),
+    'postgresql': (
+        f"INSERT INTO invoice_item ({_INSERT_COLUMNS}) "
+        "SELECT invoice.id, item.ordinality - 1, "
+        "coalesce(item.value->>'description', ''), "
+        "coalesce((item.value->>'quantity')::numeric::integer, 1), "
+        "coalesce((item.value->>'unit_price')::float, 0), "
+        "coalesce((item.value->>'total')::float, "
+        "coalesce((item.value->>'quantity')::numeric::integer, 1) * coalesce((item.value->>'unit_price')::float, 0)), "
+        "item.value->>'treatment_code' "
+        "FROM invoice CROSS JOIN LATERAL json_array_elements("
+        "CASE WHEN json_typeof(invoice.items::json) = 'array' THEN invoice.items::json END"
+        ") WITH ORDINALITY AS item(value, ordinality) "
+        "WHERE invoice.id >= :low AND invoice.id < :high "
+        "AND json_typeof(item.value) = 'object' "
+        "AND NOT EXISTS (SELECT 1 FROM invoice_item WHERE invoice_item.invoice_id = invoice.id) "
+        "ORDER BY invoice.id, item.ordinality"
+    ),
+}
+
+
+def upgrade():
+    # create_app() runs db.create_all() when AUTO_CREATE_TABLES is set, so the
+    # table may already exist; the backfill below still fills it
+    if 'invoice_item' not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table('invoice_item',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('invoice_id', sa.Integer(), nullable=False),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('description', sa.String(length=200), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('unit_price', sa.Float(), nullable=False),
+        sa.Column('total', sa.Float(), nullable=False),
+        sa.Column('treatment_code', sa.String(length=20), nullable=True),
+        sa.ForeignKeyConstraint(['invoice_id'], ['invoice.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('invoice_item', schema=None) as batch_op:
+            batch_op.create_index('ix_invoice_item_invoice_id_description',
+                                  ['invoice_id', 'description', 'quantity', 'total'], unique=False)
+
+    if op.get_context().as_sql:
+        return
+
+    # Backfill in id ranges, each committed on its own, so the app can keep
+    # writing invoices meanwhile; invoices saved by the new code already have
+    # rows and are skipped, which also lets an interrupted run resume
+    bind = op.get_bind()
+    statement = EXPAND_ITEMS_SQL.get(bind.dialect.name)
+    if statement is None:
+        return
+    last_id = bind.execute(sa.text('SELECT max(id) FROM invoice')).scalar() or 0
+    with op.get_context().autocommit_block():
+        for low in range(1, last_id + 1, CHUNK_SIZE):
+            bind.execute(sa.text(statement), {'low': low, 'high': low + CHUNK_SIZE})
+
+
+def downgrade():
+    with op.batch_alter_table('invoice_item', schema=None) as batch_op:
+        batch_op.drop_index('ix_invoice_item_invoice_id_description')
+
+    op.drop_table('invoice_item')
@@ -0,0 +1,68 @@
+"""Add receivables ledger
+
+Revision ID: c3a8f1d6e249
+Revises: b7e2d4f9a316
+Create Date: 2026-10-17 19:02:44.107358
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a8f1d6e249'
+down_revision = 'b7e2d4f9a316'
+branch_labels = None
+depends_on = None
+
+# Must match app.utils.receivables.OPEN_STATUSES at the time of this revision
+OPEN_STATUSES = "('unpaid', 'partially_paid')"
+
+
+def upgrade():
+    # create_app() runs db.create_all() when AUTO_CREATE_TABLES is set, so the
+    # tables may already exist; they are refilled below either way
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if 'receivable_day' not in tables:
+        op.create_table('receivable_day',
+        sa.Column('due_date', sa.Date(), nullable=False),
+        sa.Column('invoice_count', sa.Integer(), nullable=False),
+        sa.Column('billed', sa.Float(), nullable=False),
+        sa.Column('paid', sa.Float(), nullable=False),
+        sa.Column('open_count', sa.Integer(), nullable=False),
+        sa.Column('outstanding', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('due_date')
+        )
+    if 'patient_balance' not in tables:
+        op.create_table('patient_balance',
+        sa.Column('patient_id', sa.Integer(), nullable=False),
+        sa.Column('open_count', sa.Integer(), nullable=False),
+        sa.Column('outstanding', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['patient_id'], ['patient.id'], ),
+        sa.PrimaryKeyConstraint('patient_id')
+        )
+        with op.batch_alter_table('patient_balance', schema=None) as batch_op:
+            batch_op.create_index('ix_patient_balance_outstanding', ['outstanding'], unique=False)
+
+    op.execute("DELETE FROM receivable_day")
+    op.execute("DELETE FROM patient_balance")
+    op.execute(
+        "INSERT INTO receivable_day (due_date, invoice_count, billed, paid, open_count, outstanding) "
+        "SELECT due_date, count(id), coalesce(sum(total_amount), 0), coalesce(sum(coalesce(paid_amount, 0)), 0), "
+        f"coalesce(sum(CASE WHEN status IN {OPEN_STATUSES} THEN 1 ELSE 0 END), 0), "
+        f"coalesce(sum(CASE WHEN status IN {OPEN_STATUSES} THEN total_amount - coalesce(paid_amount, 0) ELSE 0 END), 0) "
+        "FROM invoice GROUP BY due_date"
+    )
+    op.execute(
+        "INSERT INTO patient_balance (patient_id, open_count, outstanding) "
+        "SELECT patient_id, count(id), coalesce(sum(total_amount - coalesce(paid_amount, 0)), 0) "
+        f"FROM invoice WHERE status IN {OPEN_STATUSES} GROUP BY patient_id"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('patient_balance', schema=None) as batch_op:
+        batch_op.drop_index('ix_patient_balance_outstanding')
+
+    op.drop_table('patient_balance')
+    op.drop_table('receivable_day')
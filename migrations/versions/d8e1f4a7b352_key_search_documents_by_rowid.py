@@ -0,0 +1,48 @@
+"""Key search documents by rowid
+
+Revision ID: d8e1f4a7b352
+Revises: c3a8f1d6e249
+Create Date: 2026-10-18 10:04:12.318604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8e1f4a7b352'
+down_revision = 'c3a8f1d6e249'
+branch_labels = None
+depends_on = None
+
+# (kind and source table, kind code, name SQL, body SQL). Document rowid is
+# ref_id * 4 + kind code, as in app.utils.search_index at this revision
+DOCUMENTS = (
+    ('patient', 0, "coalesce(first_name, '') || ' ' || coalesce(last_name, '')",
+     "coalesce(email, '') || ' ' || coalesce(phone, '')"),
+    ('appointment', 1, "''", "coalesce(treatment_type, '') || ' ' || coalesce(notes, '')"),
+    ('prescription', 2, "''", "coalesce(diagnosis, '') || ' ' || coalesce(notes, '')"),
+    ('invoice', 3, "''", "coalesce(notes, '')"),
+)
+
+
+def upgrade():
+    # FTS5 is SQLite-only; other databases keep using the LIKE search fallback
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite' or 'search_index' not in sa.inspect(bind).get_table_names():
+        return
+
+    # Documents written so far have arbitrary rowids; rewrite them all
+    op.execute("DELETE FROM search_index")
+    for kind, code, name_sql, body_sql in DOCUMENTS:
+        op.execute(
+            f"INSERT INTO search_index (rowid, kind, ref_id, name, body) "
+            f"SELECT id * 4 + {code}, '{kind}', id, {name_sql}, {body_sql} FROM {kind}"
+        )
+    op.execute("INSERT INTO search_index(search_index) VALUES ('optimize')")
+
+
+def downgrade():
+    # The earlier revision finds documents by kind and ref_id, which the
+    # rowid-keyed documents still carry
+    pass
@@ -0,0 +1,52 @@
+"""Add patient name keys
+
+Revision ID: e4b9c2f7a815
+Revises: d8e1f4a7b352
+Create Date: 2026-10-18 11:32:47.905126
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b9c2f7a815'
+down_revision = 'd8e1f4a7b352'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('patient', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('first_name_key', sa.String(length=100), nullable=True))
+        batch_op.add_column(sa.Column('last_name_key', sa.String(length=100), nullable=True))
+        batch_op.drop_index('ix_patient_lower_first_name')
+        batch_op.drop_index('ix_patient_lower_last_name_first_name')
+
+    # Keys are case-folded in Python, as app.models.patient.name_key does at
+    # this revision; SQLite's lower() would leave non-ASCII letters as they are
+    bind = op.get_bind()
+    rows = bind.execute(sa.text("SELECT id, first_name, last_name FROM patient")).fetchall()
+    if rows:
+        bind.execute(
+            sa.text("UPDATE patient SET first_name_key = :first, last_name_key = :last WHERE id = :id"),
+            [{'id': id, 'first': (first or '').casefold(), 'last': (last or '').casefold()}
+             for id, first, last in rows]
+        )
+
+    with op.batch_alter_table('patient', schema=None) as batch_op:
+        batch_op.create_index('ix_patient_last_name_key_first_name_key', ['last_name_key', 'first_name_key'], unique=False)
+        batch_op.create_index('ix_patient_first_name_key', ['first_name_key'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('patient', schema=None) as batch_op:
+        batch_op.drop_index('ix_patient_first_name_key')
+        batch_op.drop_index('ix_patient_last_name_key_first_name_key')
+        batch_op.drop_column('last_name_key')
+        batch_op.drop_column('first_name_key')
+
+    # Expression indexes can't be carried through the table rebuild above
+    op.create_index('ix_patient_lower_last_name_first_name', 'patient',
+                    [sa.text('lower(last_name)'), sa.text('lower(first_name)')], unique=False)
+    op.create_index('ix_patient_lower_first_name', 'patient', [sa.text('lower(first_name)')], unique=False)
@@ -1,3 +1,5 @@
+from flask_migrate import Migrate, stamp
+from sqlalchemy import inspect
 from app import create_app, db
 from app.models.user import User
 from app.models.settings import Settings
@@ -5,6 +7,19 @@ from app.models.settings import Settings
 def setup_database():
     app = create_app()
     with app.app_context():
+        # The migrations start from an existing schema, so a new database gets
+        # the current tables directly and is marked as fully migrated;
+        # 'flask db upgrade' takes it from there
+        if not inspect(db.engine).get_table_names():
+            db.create_all()
+            if db.engine.dialect.name == 'sqlite':
+                from app.utils.search_index import create_index
+                create_index()
+            db.session.commit()
+            Migrate(app, db)
+            stamp()
+            print('Database schema created.')
+
         # Create admin user if not exists
         admin = User.query.filter_by(username='admin').first()
         if not admin: